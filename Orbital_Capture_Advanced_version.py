@@ -1,20 +1,52 @@
+# First, so that startup timing covers the imports below
+from orbital_startup import StartupTimer, after_first_paint, strip_flags
+import numbers
+import os
 import sys
+import threading
 import numpy as np
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QGridLayout, 
                             QLabel, QPushButton, QVBoxLayout, QHBoxLayout, 
-                            QMessageBox, QComboBox, QSlider)
-from PyQt5.QtGui import QPainter, QColor, QPen, QBrush, QPainterPath, QFont, QRadialGradient
+                            QMessageBox, QComboBox, QSlider, QCheckBox, QListWidget, QShortcut)
+from PyQt5.QtGui import QPainter, QColor, QPen, QBrush, QPainterPath, QFont, QRadialGradient, QKeySequence
 from PyQt5.QtCore import Qt, QRect, QPoint, QSize, pyqtSignal, QTimer, QPointF
+from orbital_geometry import DEFAULT_GEOMETRY, DEFAULT_SPECIAL_POINTS, STANDARD_SIZES, get_geometry
+from orbital_layouts import special_point_masks
+from orbital_profile import enable_from_environment
+from orbital_trace import trace_span, tracer_from_environment
+from orbital_search import SearchEngine, Ponderer, Analyzer
+from orbital_cache import EVAL_CACHE_ENV, EvaluationCache
+from orbital_proof import ProofSolver
+from orbital_repetition import RepetitionTracker
+from orbital_replay import GameReplay
+from orbital_state import StateHistory
+
+# Error codes returned by EnhancedOrbitalCaptureGame.checked_move
+MOVE_BAD_COORDINATES = "bad_coordinates"      # Not integers or off the board
+MOVE_NOT_YOUR_PIECE = "not_your_piece"        # No piece of the side to move at the origin
+MOVE_OCCUPIED = "destination_occupied"
+MOVE_UNREACHABLE = "unreachable"              # The piece cannot move there under the current rules
+MOVE_NOT_ENOUGH_ENERGY = "not_enough_energy"  # Piece plus reserve energy cannot pay for it
+
+MOVE_ERROR_MESSAGES = {
+    MOVE_BAD_COORDINATES: "Position is not on the board",
+    MOVE_NOT_YOUR_PIECE: "No piece of the current player at that position",
+    MOVE_OCCUPIED: "Destination is occupied",
+    MOVE_UNREACHABLE: "That piece cannot move there",
+    MOVE_NOT_ENOUGH_ENERGY: "Not enough energy for this move",
+}
 
 class BoardWidget(QWidget):
     piece_clicked = pyqtSignal(int, int)  # Ring, spoke
     move_made = pyqtSignal(int, int, int, int)  # From ring, from spoke, to ring, to spoke
     
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, geometry=None):
         super().__init__(parent)
         self.setMinimumSize(500, 500)
-        self.board = np.zeros((4, 8), dtype=int)
-        self.piece_values = np.zeros((4, 8), dtype=int)  # Store piece energy values
+        self.tracer = None  # LatencyTracer while latency tracing is on
+        self.geometry = geometry or DEFAULT_GEOMETRY
+        self.board = np.zeros(self.geometry.shape, dtype=int)
+        self.piece_values = np.zeros(self.geometry.shape, dtype=int)  # Store piece energy values
         self.selected_piece = None
         self.valid_moves = []
         self.hover_position = None
@@ -55,29 +87,64 @@ class BoardWidget(QWidget):
 
     def reset_board(self):
         """Reset the board to initial state"""
-        self.board = np.zeros((4, 8), dtype=int)
-        self.piece_values = np.zeros((4, 8), dtype=int)
+        self.board = np.zeros(self.geometry.shape, dtype=int)
+        self.piece_values = np.zeros(self.geometry.shape, dtype=int)
         
         # Set up initial positions
-        # Player 1 on positions 0, 2, 4, 6 of outermost ring
-        for i in [0, 2, 4, 6]:
-            self.board[3][i] = 1
-            
-        # Player 2 on positions 1, 3, 5, 7 of outermost ring
-        for i in [1, 3, 5, 7]:
-            self.board[3][i] = 2
+        # Player 1 on even spokes and Player 2 on odd spokes of the outermost ring
+        for player, ring, spoke in self.geometry.starting_pieces():
+            self.board[ring][spoke] = player
             
         self.selected_piece = None
         self.valid_moves = []
         self.animation_positions = []
         self.update()
 
+    def set_geometry(self, geometry):
+        """Switch to a board with a different number of rings and spokes"""
+        self.geometry = geometry
+        self.hover_position = None
+        self.reset_board()
+
+    def zone_colors(self):
+        """Energy zone color for each ring, from the outermost ring inward"""
+        rings = self.geometry.rings
+        if rings == len(self.energy_zone_colors):
+            return self.energy_zone_colors
+        # Blend from the outer (green) to the inner (red) zone color; the zones
+        # overlap, so each one is fainter when there are more of them
+        first, last = self.energy_zone_colors[0], self.energy_zone_colors[-1]
+        alpha = first.alpha() * len(self.energy_zone_colors) // rings
+        colors = []
+        for ring_idx in range(rings):
+            t = ring_idx / (rings - 1)
+            colors.append(QColor(int(first.red() + t * (last.red() - first.red())),
+                                 int(first.green() + t * (last.green() - first.green())),
+                                 int(first.blue() + t * (last.blue() - first.blue())),
+                                 alpha))
+        return colors
+
+    def piece_scale(self):
+        """Shrink pieces and markers on boards with more rings than the standard one"""
+        return min(1.0, 4 / self.geometry.rings)
+
     def set_special_points(self, points):
         """Set the special points on the board"""
         self.special_points = points
         self.update()
 
     def paintEvent(self, event):
+        # Idle repaints (the flux animation runs every 50 ms) are not traced,
+        # only the paint that presents an interaction's result
+        if self.tracer is None or self.tracer.pending is None:
+            self.paint_board(event)
+            return
+        with self.tracer.span("paintEvent"):
+            self.paint_board(event)
+        self.tracer.frame_presented()
+
+    def paint_board(self, event):
+        """Draw the board, special points, pieces and animations"""
         painter = QPainter(self)
         painter.setRenderHint(QPainter.Antialiasing)
         
@@ -91,10 +158,14 @@ class BoardWidget(QWidget):
         # Draw the board background
         painter.fillRect(event.rect(), self.board_color)
         
+        rings = self.geometry.rings
+        ring_width = size // (2 * rings)
+        scale = self.piece_scale()
+        
         # Draw energy zones as colored rings
-        for ring_idx, color in enumerate(self.energy_zone_colors):
-            outer_radius = size // 2 - (ring_idx * size // 8)
-            inner_radius = outer_radius - size // 8
+        for ring_idx, color in enumerate(self.zone_colors()):
+            outer_radius = size // 2 - (ring_idx * size // (2 * rings))
+            inner_radius = outer_radius - ring_width
             
             # Create a radial gradient for each zone
             gradient = QRadialGradient(center_x, center_y, outer_radius)
@@ -111,7 +182,7 @@ class BoardWidget(QWidget):
         # Highlight the innermost circle with a special color
         painter.setBrush(QBrush(self.inner_circle_color))
         painter.setPen(Qt.NoPen)
-        innermost_radius = size // 8
+        innermost_radius = ring_width
         painter.drawEllipse(center_x - innermost_radius, center_y - innermost_radius, 
                            innermost_radius * 2, innermost_radius * 2)
         
@@ -119,14 +190,14 @@ class BoardWidget(QWidget):
         grid_pen = QPen(self.grid_color, 1.5)
         painter.setPen(grid_pen)
         
-        # Draw 4 concentric circles
-        radii = [size // 8, size // 4, 3 * size // 8, size // 2]
+        # Draw the concentric rings
+        radii = self.geometry.radii(size)
         for radius in radii:
             painter.drawEllipse(center_x - radius, center_y - radius, radius * 2, radius * 2)
         
-        # Draw 8 radial lines
-        for angle in range(0, 360, 45):
-            rad_angle = angle * np.pi / 180
+        # Draw the radial spokes
+        for spoke in range(self.geometry.spokes):
+            rad_angle = spoke * self.geometry.spoke_angle * np.pi / 180
             x = center_x + size // 2 * np.cos(rad_angle)
             y = center_y + size // 2 * np.sin(rad_angle)
             painter.drawLine(center_x, center_y, int(x), int(y))
@@ -152,7 +223,7 @@ class BoardWidget(QWidget):
             # Draw pulsing circle for special point
             painter.setPen(Qt.NoPen)
             painter.setBrush(QBrush(color.lighter(120)))
-            point_size = int(10 * size_mult)
+            point_size = int(10 * size_mult * scale)
             painter.drawEllipse(QPoint(x, y), point_size, point_size)
             
             # Draw outer glow
@@ -169,7 +240,7 @@ class BoardWidget(QWidget):
             painter.setBrush(QBrush(self.valid_move_color))
             for ring, spoke in self.valid_moves:
                 x, y = self.get_position_coordinates(ring, spoke, center_x, center_y, radii)
-                painter.drawEllipse(QPoint(x, y), 15, 15)
+                painter.drawEllipse(QPoint(x, y), int(15 * scale), int(15 * scale))
         
         # Draw hover highlight
         if self.hover_position is not None:
@@ -178,11 +249,11 @@ class BoardWidget(QWidget):
                 painter.setPen(Qt.NoPen)
                 painter.setBrush(QBrush(self.hover_color))
                 x, y = self.get_position_coordinates(ring, spoke, center_x, center_y, radii)
-                painter.drawEllipse(QPoint(x, y), 17, 17)
+                painter.drawEllipse(QPoint(x, y), int(17 * scale), int(17 * scale))
         
         # Draw pieces
-        for ring in range(4):
-            for spoke in range(8):
+        for ring in range(self.geometry.rings):
+            for spoke in range(self.geometry.spokes):
                 if self.board[ring, spoke] != 0:
                     x, y = self.get_position_coordinates(ring, spoke, center_x, center_y, radii)
                     
@@ -216,7 +287,7 @@ class BoardWidget(QWidget):
                     painter.setBrush(QBrush(gradient))
                     
                     # Draw the piece with size based on energy
-                    piece_size = 12 + min(energy, 8)
+                    piece_size = int((12 + min(energy, 8)) * scale)
                     painter.drawEllipse(QPoint(x, y), piece_size, piece_size)
                     
                     # Draw the energy value
@@ -276,7 +347,7 @@ class BoardWidget(QWidget):
             ring, spoke, 
             self.width() // 2, 
             self.height() // 2, 
-            [self.height() // 8, self.height() // 4, 3 * self.height() // 8, self.height() // 2]
+            self.geometry.radii(self.height())
         )
         
         self.animation_positions.append((x, y, 0, player))
@@ -285,7 +356,7 @@ class BoardWidget(QWidget):
     
     def get_position_coordinates(self, ring, spoke, center_x, center_y, radii):
         """Convert board position to screen coordinates"""
-        angle = spoke * 45
+        angle = spoke * self.geometry.spoke_angle
         rad_angle = angle * np.pi / 180
         radius = radii[ring]
         x = center_x + radius * np.cos(rad_angle)
@@ -299,7 +370,7 @@ class BoardWidget(QWidget):
         size = min(width, height) - 40
         center_x = width // 2
         center_y = height // 2
-        radii = [size // 8, size // 4, 3 * size // 8, size // 2]
+        radii = self.geometry.radii(size)
         
         # Calculate distance from center
         dx = x - center_x
@@ -309,7 +380,7 @@ class BoardWidget(QWidget):
         # Determine ring
         ring = None
         for i, radius in enumerate(radii):
-            if distance < radius + 15:
+            if distance < radius + 15 * self.piece_scale():
                 ring = i
                 break
         
@@ -320,27 +391,31 @@ class BoardWidget(QWidget):
         angle = np.arctan2(dy, dx)
         if angle < 0:
             angle += 2 * np.pi
-        spoke = int(np.round(angle / (np.pi / 4))) % 8
+        spokes = self.geometry.spokes
+        spoke = int(np.round(angle / (2 * np.pi / spokes))) % spokes
         
         return ring, spoke
     
     def mousePressEvent(self, event):
-        if event.button() == Qt.LeftButton:
-            position = self.get_board_position(event.x(), event.y())
-            if position:
-                ring, spoke = position
-                
-                # If there's already a selected piece and this is a valid move
-                if self.selected_piece and position in self.valid_moves:
-                    self.move_made.emit(self.selected_piece[0], self.selected_piece[1], ring, spoke)
-                    self.selected_piece = None
-                    self.valid_moves = []
-                
-                # Otherwise, select this piece if it belongs to the current player
-                elif self.board[ring, spoke] != 0:
-                    self.piece_clicked.emit(ring, spoke)
-                
-                self.update()
+        if self.tracer is not None:
+            self.tracer.begin_interaction("click", x=event.x(), y=event.y())
+        with trace_span(self.tracer, "mousePressEvent"):
+            if event.button() == Qt.LeftButton:
+                position = self.get_board_position(event.x(), event.y())
+                if position:
+                    ring, spoke = position
+                    
+                    # If there's already a selected piece and this is a valid move
+                    if self.selected_piece and position in self.valid_moves:
+                        self.move_made.emit(self.selected_piece[0], self.selected_piece[1], ring, spoke)
+                        self.selected_piece = None
+                        self.valid_moves = []
+                    
+                    # Otherwise, select this piece if it belongs to the current player
+                    elif self.board[ring, spoke] != 0:
+                        self.piece_clicked.emit(ring, spoke)
+                    
+                    self.update()
     
     def mouseMoveEvent(self, event):
         position = self.get_board_position(event.x(), event.y())
@@ -372,14 +447,15 @@ class BoardWidget(QWidget):
 
 
 class EnhancedOrbitalCaptureGame:
-    def __init__(self):
-        # Initialize the board: 4 rings × 8 spokes
+    def __init__(self, geometry=None):
+        # Initialize the board: rings × spokes (4 × 8 unless another geometry is given)
         # 0 = empty, 1 = player 1, 2 = player 2
-        self.board = np.zeros((4, 8), dtype=int)
-        self.piece_values = np.zeros((4, 8), dtype=int)  # Energy values for pieces
+        self.geometry = geometry or DEFAULT_GEOMETRY
+        self.board = np.zeros(self.geometry.shape, dtype=int)
+        self.piece_values = np.zeros(self.geometry.shape, dtype=int)  # Energy values for pieces
         self.current_player = 1
-        self.player1_pieces = 4
-        self.player2_pieces = 4
+        self.player1_pieces = self.geometry.pieces_per_player()
+        self.player2_pieces = self.geometry.pieces_per_player()
         self.player1_energy = 0
         self.player2_energy = 0
         
@@ -396,168 +472,261 @@ class EnhancedOrbitalCaptureGame:
         # Track pieces in the innermost ring
         self.player1_inner_pieces = 0
         self.player2_inner_pieces = 0
+
+        # Optional orbital_repetition.RepetitionTracker ending games that cycle
+        self.repetition = None
         
         # Initialize the board with starting positions
         self.reset_board()
     
     def reset_board(self):
         """Reset the board to initial state"""
-        self.board = np.zeros((4, 8), dtype=int)
-        self.piece_values = np.zeros((4, 8), dtype=int)
+        self.board = np.zeros(self.geometry.shape, dtype=int)
+        self.piece_values = np.zeros(self.geometry.shape, dtype=int)
         
         # Reset counters
-        self.player1_pieces = 4
-        self.player2_pieces = 4
+        self.player1_pieces = self.geometry.pieces_per_player()
+        self.player2_pieces = self.geometry.pieces_per_player()
         self.player1_energy = 0
         self.player2_energy = 0
         self.player1_inner_pieces = 0
         self.player2_inner_pieces = 0
         
         # Set up initial positions - alternating pattern on outer ring
-        for i in [0, 2, 4, 6]:
-            self.board[3][i] = 1  # Player 1
-            
-        for i in [1, 3, 5, 7]:
-            self.board[3][i] = 2  # Player 2
+        for player, ring, spoke in self.geometry.starting_pieces():
+            self.board[ring][spoke] = player
             
-        # Generate random special points (power, jump, shield)
-        # Create a mix of special point types
-        self.special_points = [
-            (0, 0, "power"),   # Center top - power point
-            (0, 4, "power"),   # Center bottom - power point
-            (1, 2, "jump"),    # Middle ring - jump point
-            (1, 6, "jump"),    # Middle ring - jump point
-            (2, 1, "shield"),  # Outer middle ring - shield point
-            (2, 5, "shield"),  # Outer middle ring - shield point
-        ]
+        # Special points (power, jump, shield); the layout is shared, not rebuilt
+        self.set_special_points(self.geometry.default_special_points())
         
         # Reset current player
         self.current_player = 1
+        self._legal = None
+
+    def set_special_points(self, points):
+        """Install a special point layout of (ring, spoke, type) tuples"""
+        self.special_points = tuple(tuple(point) for point in points)
+        self.special_masks = special_point_masks(self.special_points, self.geometry)
+
+    def copy(self):
+        """Return an independent copy of the game state (used by the search)"""
+        clone = EnhancedOrbitalCaptureGame.__new__(EnhancedOrbitalCaptureGame)
+        clone.__dict__.update(self.__dict__)
+        clone.board = self.board.copy()
+        clone.piece_values = self.piece_values.copy()
+        clone.repetition = None  # The game's history is not the copy's
+        return clone
+
+    def legal_moves(self):
+        """Legal moves for the side to move, cached until the position changes"""
+        return self._legal_cache()[1]
+
+    def legal_move_mask(self):
+        """Bitmask of the legal moves: bit from_cell * cells + to_cell"""
+        return self._legal_cache()[2]
+
+    def _legal_cache(self):
+        # Rule toggles change which moves exist, so they are part of the key
+        rules = (self.allow_jumps, self.allow_nimber)
+        legal = self.__dict__.get("_legal")
+        if legal is None or legal[0] != rules:
+            moves = self.get_all_valid_moves()
+            spokes = self.geometry.spokes
+            cells = self.geometry.cells
+            mask = 0
+            for from_ring, from_spoke, to_ring, to_spoke in moves:
+                mask |= 1 << ((from_ring * spokes + from_spoke) * cells + to_ring * spokes + to_spoke)
+            legal = self._legal = (rules, moves, mask)
+        return legal
+
+    def validate_move(self, from_ring, from_spoke, to_ring, to_spoke):
+        """Return None for a legal move, otherwise one of the MOVE_* error codes
+
+        Legal moves are a single bit test against legal_move_mask; the cause of
+        a rejection is only worked out for illegal moves.
+        """
+        rings, spokes = self.geometry.shape
+        for value, limit in ((from_ring, rings), (from_spoke, spokes), (to_ring, rings), (to_spoke, spokes)):
+            if (not isinstance(value, numbers.Integral) or isinstance(value, bool) or
+                    not 0 <= value < limit):
+                return MOVE_BAD_COORDINATES
+        bit = (from_ring * spokes + from_spoke) * self.geometry.cells + to_ring * spokes + to_spoke
+        if self.legal_move_mask() >> bit & 1:
+            return None
+
+        if self.board[from_ring][from_spoke] != self.current_player:
+            return MOVE_NOT_YOUR_PIECE
+        if self.board[to_ring][to_spoke] != 0:
+            return MOVE_OCCUPIED
+        if (to_ring, to_spoke) not in self.get_valid_moves(from_ring, from_spoke):
+            return MOVE_UNREACHABLE
+        return MOVE_NOT_ENOUGH_ENERGY
+
+    def checked_move(self, from_ring, from_spoke, to_ring, to_spoke):
+        """Play a move after checking it is legal; use this for moves from untrusted input
+
+        Illegal moves leave the game untouched and return
+        {"success": False, "code": MOVE_*, "error": message}.
+        """
+        code = self.validate_move(from_ring, from_spoke, to_ring, to_spoke)
+        if code is not None:
+            return {"success": False, "code": code, "error": MOVE_ERROR_MESSAGES[code]}
+        return self.move(int(from_ring), int(from_spoke), int(to_ring), int(to_spoke))
+
+    def generate_all_moves(self, captures_only=False, quiet_only=False):
+        """Every affordable move for the current player as packed integers
+
+        Moves are packed by orbital_geometry.pack_move (from cell, to cell and
+        move class) and come in the same order as get_all_valid_moves. With
+        captures_only only the moves that capture are returned, with
+        quiet_only only the others; each move is then played on a copy, so
+        these filters cost a move per candidate.
+        """
+        table = self.geometry.move_table(self.allow_jumps, self.allow_nimber)
+        cells = self.board.ravel().tolist()
+        values = self.piece_values.ravel().tolist()
+        player = self.current_player
+        reserve_energy = self.player1_energy if player == 1 else self.player2_energy
+
+        moves = []
+        for from_cell, owner in enumerate(cells):
+            if owner != player:
+                continue
+            piece_energy = values[from_cell]
+            available = piece_energy + reserve_energy
+            for to_cell, min_energy, cost, move in table[from_cell]:
+                if min_energy <= piece_energy and cost <= available and cells[to_cell] == 0:
+                    moves.append(move)
+
+        if captures_only or quiet_only:
+            moves = [move for move in moves if self.move_captures(move) != quiet_only]
+        return moves
+
+    def move_captures(self, move):
+        """True when a packed move captures, found by playing it on a copy
+
+        Unlike is_capture_move (a guess for move ordering) this counts move
+        costs, reserve energy, energy collection and special points.
+        """
+        child = self.copy()
+        return bool(child.move(*self.geometry.unpack_move(move))["captured"])
+
+    def get_all_valid_moves(self):
+        """Get every affordable move for the current player as (from_ring, from_spoke, to_ring, to_spoke)"""
+        unpack = self.geometry.unpack_move
+        return [unpack(move) for move in self.generate_all_moves()]
     
     def get_valid_moves(self, ring, spoke):
         """Get all valid moves for a piece at the given position"""
-        valid_moves = []
+        board = self.board
+        geometry = self.geometry
+        position = (ring, spoke)
         
         # Check if the position has a piece of the current player
-        if self.board[ring][spoke] != self.current_player:
+        if board[position] != self.current_player:
             return []
         
         # Get piece energy
-        piece_energy = self.piece_values[ring][spoke]
+        piece_energy = self.piece_values[position]
+
+        # Targets are collected in a dict so a square reachable in several
+        # ways is listed once, in the order it was first found
+        valid_moves = {}
         
         # Standard moves
         
         # 1. Move along the ring (clockwise and counterclockwise)
-        for offset in [-1, 1]:
-            next_spoke = (spoke + offset) % 8
-            if self.board[ring][next_spoke] == 0:
-                valid_moves.append((ring, next_spoke))
+        for target in geometry.ring_steps[position]:
+            if board[target] == 0:
+                valid_moves[target] = None
         
         # 2. Move inward (if not already at the innermost ring)
-        if ring > 0 and self.board[ring-1][spoke] == 0:
-            valid_moves.append((ring-1, spoke))
+        target = geometry.inward[position]
+        if target is not None and board[target] == 0:
+            valid_moves[target] = None
         
         # 3. Move outward if they have energy (new rule)
-        if ring < 3 and piece_energy >= 2 and self.board[ring+1][spoke] == 0:
-            valid_moves.append((ring+1, spoke))
+        target = geometry.outward[position]
+        if target is not None and piece_energy >= 2 and board[target] == 0:
+            valid_moves[target] = None
         
         # 4. Advanced moves based on energy
         if piece_energy >= 3:
             # Diagonal moves along adjacent spokes and rings
-            for r_offset in [-1, 0, 1]:
-                new_ring = ring + r_offset
-                if 0 <= new_ring <= 3:  # Valid ring
-                    for s_offset in [-1, 1]:
-                        new_spoke = (spoke + s_offset) % 8
-                        # Make sure it's not a standard move and space is empty
-                        if (new_ring, new_spoke) not in valid_moves and self.board[new_ring][new_spoke] == 0:
-                            valid_moves.append((new_ring, new_spoke))
+            for target in geometry.diagonals[position]:
+                if board[target] == 0:
+                    valid_moves[target] = None
         
         # 5. Jump moves with higher energy
         if self.allow_jumps and piece_energy >= 4:
             # Jump over one intersection
-            for offset in [-2, 2]:
-                new_spoke = (spoke + offset) % 8
-                if self.board[ring][new_spoke] == 0:
-                    valid_moves.append((ring, new_spoke))
+            for target in geometry.spoke_jumps[position]:
+                if board[target] == 0:
+                    valid_moves[target] = None
             
             # Jump two rings inward
-            if ring >= 2 and self.board[ring-2][spoke] == 0:
-                valid_moves.append((ring-2, spoke))
+            target = geometry.ring_jump[position]
+            if target is not None and board[target] == 0:
+                valid_moves[target] = None
         
         # 6. Special "nimber" moves (combinatorial game theory concept)
         # These moves create interacting subgames
         if self.allow_nimber and piece_energy >= 5:
             # Jump to any empty spot in the same ring
-            for new_spoke in range(8):
-                if new_spoke != spoke and self.board[ring][new_spoke] == 0:
-                    valid_moves.append((ring, new_spoke))
+            for target in geometry.ring_positions[ring]:
+                if target != position and board[target] == 0:
+                    valid_moves[target] = None
             
             # Jump to the opposite spoke in any ring
-            opposite_spoke = (spoke + 4) % 8
-            for new_ring in range(4):
-                if new_ring != ring and self.board[new_ring][opposite_spoke] == 0:
-                    valid_moves.append((new_ring, opposite_spoke))
+            for target in geometry.opposite_targets[position]:
+                if board[target] == 0:
+                    valid_moves[target] = None
         
-        return valid_moves
+        return list(valid_moves)
     
     def check_captures(self, ring, spoke):
         """Check and process captures after a move to (ring, spoke)"""
         opponent = 2 if self.current_player == 1 else 1
+        board = self.board
+        values = self.piece_values
+        geometry = self.geometry
         captured = []
         
         # Basic capture: surround opponent pieces
         # Check all opponent pieces
-        for check_ring in range(4):
-            for check_spoke in range(8):
-                # Skip if not opponent's piece
-                if self.board[check_ring][check_spoke] != opponent:
-                    continue
-                
-                # Check different capture patterns
-                
-                # 1. Classic three-point surround (two adjacent on same ring + one inner)
-                left_spoke = (check_spoke - 1) % 8
-                right_spoke = (check_spoke + 1) % 8
-                
-                # Adjacent same ring capture
-                adjacent_same_ring = (
-                    self.board[check_ring][left_spoke] == self.current_player and
-                    self.board[check_ring][right_spoke] == self.current_player
-                )
-                
-                # Inner position
-                inner_position = False
-                if check_ring > 0:
-                    inner_position = self.board[check_ring-1][check_spoke] == self.current_player
-                
-                # Basic three-point capture
-                if adjacent_same_ring and inner_position:
-                    captured.append((check_ring, check_spoke))
-                    continue
-                
-                # 2. Energy-based captures (higher energy can capture without surrounding)
-                # Calculate total energy surrounding the opponent piece
-                surrounding_energy = 0
-                
-                # Check all adjacent positions
-                for r_offset in [-1, 0, 1]:
-                    new_ring = check_ring + r_offset
-                    if 0 <= new_ring <= 3:  # Valid ring
-                        # Check adjacent spokes
-                        for s_offset in [-1, 0, 1]:
-                            if r_offset == 0 and s_offset == 0:
-                                continue  # Skip the piece itself
-                            
-                            new_spoke = (check_spoke + s_offset) % 8
-                            if self.board[new_ring][new_spoke] == self.current_player:
-                                surrounding_energy += self.piece_values[new_ring][new_spoke]
-                
-                # Energy-based capture: if surrounding energy > 2× opponent piece energy
-                opponent_energy = self.piece_values[check_ring][check_spoke]
-                if surrounding_energy >= opponent_energy * 2 and surrounding_energy >= 4:
-                    if (check_ring, check_spoke) not in captured:
-                        captured.append((check_ring, check_spoke))
+        for check_ring, check_spoke in zip(*np.nonzero(board == opponent)):
+            position = (int(check_ring), int(check_spoke))
+            
+            # Check different capture patterns
+            
+            # 1. Classic three-point surround (two adjacent on same ring + one inner)
+            left, right, inner = geometry.surround_points[position]
+            
+            # Adjacent same ring capture
+            adjacent_same_ring = (
+                board[left] == self.current_player and
+                board[right] == self.current_player
+            )
+            
+            # Inner position
+            inner_position = inner is not None and board[inner] == self.current_player
+            
+            # Basic three-point capture
+            if adjacent_same_ring and inner_position:
+                captured.append(position)
+                continue
+            
+            # 2. Energy-based captures (higher energy can capture without surrounding)
+            # Calculate total energy surrounding the opponent piece
+            surrounding_energy = 0
+            for neighbour in geometry.neighbours[position]:
+                if board[neighbour] == self.current_player:
+                    surrounding_energy += values[neighbour]
+            
+            # Energy-based capture: if surrounding energy > 2× opponent piece energy
+            opponent_energy = values[position]
+            if surrounding_energy >= opponent_energy * 2 and surrounding_energy >= 4:
+                captured.append(position)
         
         # Process captures
         for r, s in captured:
@@ -591,12 +760,7 @@ class EnhancedOrbitalCaptureGame:
     
     def handle_special_point(self, ring, spoke):
         """Handle landing on a special point"""
-        special_point = None
-        for r, s, point_type in self.special_points:
-            if r == ring and s == spoke:
-                special_point = point_type
-                break
-                
+        special_point = self.special_masks.point_type(ring, spoke)
         if not special_point:
             return None
         
@@ -631,8 +795,7 @@ class EnhancedOrbitalCaptureGame:
             return 0
             
         # Energy values by ring: inner rings worth more
-        ring_energy = [3, 2, 1, 0]
-        energy_gained = ring_energy[ring]
+        energy_gained = self.geometry.ring_energy[ring]
         
         # Add energy to the piece
         if energy_gained > 0:
@@ -640,25 +803,18 @@ class EnhancedOrbitalCaptureGame:
             
         return energy_gained
     
+    def calculate_move_cost(self, from_ring, from_spoke, to_ring, to_spoke):
+        """Calculate the energy cost of moving between two positions"""
+        # Moves longer than one step cost their distance; moving outward costs 2 more
+        return self.geometry.move_cost(from_ring, from_spoke, to_ring, to_spoke)
+
     def move(self, from_ring, from_spoke, to_ring, to_spoke):
-        """Move a piece from one position to another"""
+        """Move a piece from one position to another (no legality check, see checked_move)"""
+        self._legal = None
         # Calculate energy cost of the move
-        energy_cost = 0
+        energy_cost = self.calculate_move_cost(from_ring, from_spoke, to_ring, to_spoke)
         piece_energy = self.piece_values[from_ring][from_spoke]
-        
-        # Calculate basic distance
-        ring_distance = abs(to_ring - from_ring)
-        spoke_distance = min(abs(to_spoke - from_spoke), 8 - abs(to_spoke - from_spoke))
-        total_distance = ring_distance + spoke_distance
-        
-        # Special moves cost energy
-        if total_distance > 1:
-            energy_cost = total_distance
-            
-        # Moving outward costs extra energy
-        if to_ring > from_ring:
-            energy_cost += 2
-            
+
         # Check if piece has enough energy
         if piece_energy < energy_cost:
             # Check reserve energy
@@ -717,6 +873,12 @@ class EnhancedOrbitalCaptureGame:
         
         # Switch to the other player
         self.current_player = 2 if self.current_player == 1 else 1
+
+        # Repetitions and the move cap end a game that keeps cycling
+        repetition = self.__dict__.get("repetition")
+        if repetition is not None:
+            verdict = repetition.push(self)
+            victory = victory or verdict
         
         return {
             "success": True,
@@ -749,11 +911,64 @@ class EnhancedOrbitalCaptureGame:
         
         return None
 
+    def calculate_score(self):
+        """Ring-weighted piece counts for both players (inner rings are worth more)"""
+        values = self.geometry.rings - np.arange(self.geometry.rings)[:, None]
+        return {player: int((values * (self.board == player)).sum()) for player in (1, 2)}
+
+
+# Timing hooks are only installed when ORBITAL_PROFILE is set (see orbital_profile)
+enable_from_environment(EnhancedOrbitalCaptureGame)
+
 
 class GameWindow(QMainWindow):
-    def __init__(self):
+    ai_move_ready = pyqtSignal(int, object)  # Game number, SearchResult from the AI worker thread
+    analysis_ready = pyqtSignal(int, object)  # Position number, list of SearchResult lines
+
+    def __init__(self, tracer=None):
         super().__init__()
         self.game = EnhancedOrbitalCaptureGame()
+
+        # Input-to-render latency tracing (off unless a tracer is given or ORBITAL_TRACE is set)
+        self.tracer = tracer or tracer_from_environment()
+
+        # Computer opponent (plays Player 2) and its pondering helper; the
+        # evaluation cache is saved between runs when ORBITAL_EVAL_CACHE is set
+        self.eval_cache = EvaluationCache(path=os.environ.get(EVAL_CACHE_ENV))
+        self.engine = SearchEngine(eval_cache=self.eval_cache)
+        # Tries to prove forced wins in threshold races before the alpha-beta search
+        self.proof_solver = ProofSolver()
+        self.ponderer = Ponderer(self.engine)
+        self.ai_player = None
+        self.ai_thinking = False
+        self.ai_thread = None
+        self.game_number = 0  # Lets stale AI results from a previous game be ignored
+        self.ai_depths = [2, 3, 4, 6]  # Search depth per difficulty level
+        # Proof solver (max nodes, max plies) per difficulty level; Easy does not look for forced wins
+        self.proof_budgets = [None, (2000, 5), (10000, 7), (20000, 11)]
+        self.ai_time_limit = 3.0
+        self.ai_move_ready.connect(self.on_ai_move_ready)
+
+        # Multi-PV analysis of the current position (own engine, kept between moves)
+        self.analyzer = Analyzer(SearchEngine(eval_cache=EvaluationCache()), lines=3)
+        self.analysis_position = 0  # Lets lines for an earlier position be ignored
+        self.analysis_lines = []
+        self.analysis_ready.connect(self.on_analysis_ready)
+
+        # Moves of the current game with periodic snapshots, for the replay scrubber
+        self.replay = GameReplay(self.game)
+
+        # Undo/redo: packed positions in a ring buffer, plus the undone moves
+        # so that redo can extend the replay again
+        self.history = StateHistory(self.game)
+        self.redo_moves = []
+
+        # Threefold repetition ends the game as a draw; the engine sees the
+        # same history, so it avoids (or aims for) repeating positions
+        self.repetition = RepetitionTracker(game=self.game)
+        self.game.repetition = self.repetition
+        self.engine.repetition = self.repetition
+
         self.initialize_ui()
         
     def initialize_ui(self):
@@ -767,9 +982,22 @@ class GameWindow(QMainWindow):
         
         # Create game board
         self.board_widget = BoardWidget()
+        self.board_widget.tracer = self.tracer
         self.board_widget.piece_clicked.connect(self.on_piece_clicked)
         self.board_widget.move_made.connect(self.on_move_made)
         main_layout.addWidget(self.board_widget)
+
+        # Replay scrubber: drag back through the game, the right end is the live position
+        replay_widget = QWidget()
+        replay_layout = QHBoxLayout(replay_widget)
+        replay_layout.addWidget(QLabel("Replay:"))
+        self.replay_slider = QSlider(Qt.Horizontal)
+        self.replay_slider.setRange(0, 0)
+        self.replay_slider.valueChanged.connect(self.on_replay_scrubbed)
+        replay_layout.addWidget(self.replay_slider)
+        self.replay_label = QLabel("Ply 0 / 0")
+        replay_layout.addWidget(self.replay_label)
+        main_layout.addWidget(replay_widget)
         
         # Create info panel
         info_panel = QWidget()
@@ -805,6 +1033,19 @@ class GameWindow(QMainWindow):
         reset_button = QPushButton("New Game")
         reset_button.clicked.connect(self.reset_game)
         game_info_layout.addWidget(reset_button)
+
+        # Undo and redo (Ctrl+Z, Ctrl+Y)
+        undo_widget = QWidget()
+        undo_layout = QHBoxLayout(undo_widget)
+        self.undo_button = QPushButton("Undo")
+        self.undo_button.clicked.connect(self.undo_move)
+        undo_layout.addWidget(self.undo_button)
+        self.redo_button = QPushButton("Redo")
+        self.redo_button.clicked.connect(self.redo_move)
+        undo_layout.addWidget(self.redo_button)
+        game_info_layout.addWidget(undo_widget)
+        QShortcut(QKeySequence.Undo, self, activated=self.undo_move)
+        QShortcut(QKeySequence.Redo, self, activated=self.redo_move)
         
         # Game mode selection
         mode_widget = QWidget()
@@ -817,6 +1058,20 @@ class GameWindow(QMainWindow):
         self.difficulty_combo.setCurrentIndex(1)  # Default to Medium
         self.difficulty_combo.currentIndexChanged.connect(self.update_game_settings)
         mode_layout.addWidget(self.difficulty_combo)
+
+        # Opponent selection
+        mode_layout.addWidget(QLabel("Opponent:"))
+        self.opponent_combo = QComboBox()
+        self.opponent_combo.addItems(["Human", "Computer"])
+        self.opponent_combo.currentIndexChanged.connect(self.update_game_settings)
+        mode_layout.addWidget(self.opponent_combo)
+
+        # Board size (rings × spokes)
+        mode_layout.addWidget(QLabel("Board:"))
+        self.board_combo = QComboBox()
+        self.board_combo.addItems([f"{rings} × {spokes}" for rings, spokes in STANDARD_SIZES])
+        self.board_combo.currentIndexChanged.connect(self.update_board_size)
+        mode_layout.addWidget(self.board_combo)
         
         game_info_layout.addWidget(mode_widget)
         info_layout.addWidget(game_info_widget)
@@ -875,6 +1130,18 @@ class GameWindow(QMainWindow):
         win_layout.addWidget(energy_widget)
         
         settings_layout.addWidget(win_widget)
+
+        # Analysis panel: best lines for the side to move, refined as the search deepens
+        analysis_widget = QWidget()
+        analysis_layout = QVBoxLayout(analysis_widget)
+        self.analysis_checkbox = QCheckBox("Analysis")
+        self.analysis_checkbox.toggled.connect(self.refresh_analysis)
+        analysis_layout.addWidget(self.analysis_checkbox)
+        self.analysis_list = QListWidget()
+        self.analysis_list.setMaximumHeight(80)
+        self.analysis_list.currentRowChanged.connect(self.on_analysis_line_selected)
+        analysis_layout.addWidget(self.analysis_list)
+        settings_layout.addWidget(analysis_widget)
         
         main_layout.addWidget(settings_panel)
         
@@ -882,6 +1149,7 @@ class GameWindow(QMainWindow):
         self.setCentralWidget(central_widget)
         
         # Initialize the board display
+        self.sync_replay_slider()
         self.update_display()
     
     def update_game_settings(self):
@@ -911,28 +1179,140 @@ class GameWindow(QMainWindow):
             self.game.allow_jumps = True
             self.game.allow_nimber = True
             # Additional complexity for expert mode could be added here
+
+        # Rule changes invalidate anything searched so far, including a
+        # computer move searched under the old rules; it is searched again
+        self.cancel_ai_move()
+        self.engine.tt.clear()
+        self.proof_solver.clear()
+        self.analyzer.stop()
+        self.analyzer.engine.tt.clear()
+        self.ai_player = 2 if self.opponent_combo.currentIndex() == 1 else None
+        if self.ai_player == self.game.current_player:
+            self.start_ai_move(None)
+        elif self.analysis_checkbox.isChecked():
+            self.refresh_analysis()
     
+    def refresh_analysis(self):
+        """(Re)start the analysis for the current position, or stop it"""
+        self.analysis_position += 1
+        self.analyzer.stop()
+        self.analysis_lines = []
+        self.analysis_list.clear()
+        if not self.analysis_checkbox.isChecked():
+            return
+        if self.ai_thinking or self.ai_player == self.game.current_player:
+            self.analysis_list.addItem("Paused while the computer moves")
+            return
+        self.ponderer.stop()  # The analysis takes over the spare time
+        position = self.analysis_position
+        self.analyzer.start(self.game, lambda lines: self.analysis_ready.emit(position, lines))
+
+    def on_analysis_ready(self, position, lines):
+        """Show a new set of analysis lines, keeping the selected row"""
+        if position != self.analysis_position:
+            return
+        row = self.analysis_list.currentRow()
+        self.analysis_lines = lines
+        self.analysis_list.blockSignals(True)
+        self.analysis_list.clear()
+        for line in lines:
+            pv = " ".join(f"{fr},{fs}>{tr},{ts}" for fr, fs, tr, ts in line.pv)
+            self.analysis_list.addItem(f"{line.score / 100:+.2f}  d{line.depth}  {pv}")
+        self.analysis_list.blockSignals(False)
+        if 0 <= row < len(lines):
+            self.analysis_list.setCurrentRow(row)
+            self.on_analysis_line_selected(row)
+
+    def on_analysis_line_selected(self, row):
+        """Highlight the first move of a line with the selection overlays"""
+        if not 0 <= row < len(self.analysis_lines) or self.ai_thinking:
+            return
+        from_ring, from_spoke, to_ring, to_spoke = self.analysis_lines[row].best_move
+        self.board_widget.set_selected_piece(from_ring, from_spoke, [(to_ring, to_spoke)])
+        self.status_label.setText(f"Analysis line {row + 1}: {self.analysis_list.item(row).text()}")
+
+    def update_board_size(self):
+        """Start a new game on the selected board size"""
+        geometry = get_geometry(*STANDARD_SIZES[self.board_combo.currentIndex()])
+        self.cancel_ai_move()
+        self.game = EnhancedOrbitalCaptureGame(geometry)
+        self.board_widget.set_geometry(geometry)
+        self.inner_slider.setMaximum(geometry.pieces_per_player())
+        self.update_game_settings()
+        self.reset_game()
+
+    def reviewing(self):
+        """True while the replay scrubber shows an earlier position"""
+        return self.replay_slider.value() < len(self.replay)
+
+    def sync_replay_slider(self):
+        """Extend the scrubber to the latest move and jump to the live position"""
+        self.undo_button.setEnabled(self.history.can_undo())
+        self.redo_button.setEnabled(self.history.can_redo())
+        self.replay_slider.blockSignals(True)
+        self.replay_slider.setRange(0, len(self.replay))
+        self.replay_slider.setValue(len(self.replay))
+        self.replay_slider.blockSignals(False)
+        self.replay_label.setText(f"Ply {len(self.replay)} / {len(self.replay)}")
+
+    def on_replay_scrubbed(self, ply):
+        """Show the position at a ply; moves are disabled until the slider is back at the end"""
+        self.replay_label.setText(f"Ply {ply} / {len(self.replay)}")
+        self.board_widget.clear_selection()
+        if ply == len(self.replay):
+            self.show_position(self.game)
+            self.status_label.setText("")
+            return
+        with trace_span(self.tracer, "replay_seek", ply=ply):
+            self.show_position(self.replay.position(ply))
+        self.status_label.setText(f"Reviewing ply {ply} of {len(self.replay)}; "
+                                  "move the slider to the end to continue playing")
+
     def on_piece_clicked(self, ring, spoke):
         """Handle piece selection"""
-        # Check if it's the current player's piece
-        if self.game.board[ring][spoke] == self.game.current_player:
-            valid_moves = self.game.get_valid_moves(ring, spoke)
-            self.board_widget.set_selected_piece(ring, spoke, valid_moves)
-            
-            # Show piece information
-            piece_energy = self.game.piece_values[ring][spoke]
-            self.status_label.setText(f"Piece selected: Energy = {piece_energy}")
-        else:
-            self.board_widget.clear_selection()
-            self.status_label.setText("")
+        if self.ai_thinking or self.reviewing():
+            return
+
+        with trace_span(self.tracer, "piece_clicked", ring=ring, spoke=spoke):
+            # Check if it's the current player's piece
+            if self.game.board[ring][spoke] == self.game.current_player:
+                with trace_span(self.tracer, "get_valid_moves"):
+                    valid_moves = self.game.get_valid_moves(ring, spoke)
+                self.board_widget.set_selected_piece(ring, spoke, valid_moves)
+                
+                # Show piece information
+                piece_energy = self.game.piece_values[ring][spoke]
+                self.status_label.setText(f"Piece selected: Energy = {piece_energy}")
+            else:
+                self.board_widget.clear_selection()
+                self.status_label.setText("")
     
     def on_move_made(self, from_ring, from_spoke, to_ring, to_spoke):
         """Handle moves on the board"""
-        result = self.game.move(from_ring, from_spoke, to_ring, to_spoke)
+        if self.ai_thinking or self.reviewing():
+            return
+
+        with trace_span(self.tracer, "move_made"):
+            result = self.apply_move(from_ring, from_spoke, to_ring, to_spoke)
+
+        # Let the computer answer, reusing what it searched while pondering
+        if result and self.ai_player == self.game.current_player:
+            self.start_ai_move((from_ring, from_spoke, to_ring, to_spoke))
+
+    def apply_move(self, from_ring, from_spoke, to_ring, to_spoke):
+        """Play a move and update the display; returns None if the game ended"""
+        with trace_span(self.tracer, "move"):
+            result = self.game.checked_move(from_ring, from_spoke, to_ring, to_spoke)
         
         if "error" in result:
             QMessageBox.warning(self, "Invalid Move", result["error"])
-            return
+            return None
+
+        self.replay.append((from_ring, from_spoke, to_ring, to_spoke), self.game)
+        self.sync_replay_slider()
+        self.history.push(self.game)
+        self.redo_moves = []
         
         # Update the board display
         self.update_display()
@@ -959,36 +1339,159 @@ class GameWindow(QMainWindow):
         if result["victory"]:
             winner = result["victory"]["winner"]
             reason = result["victory"]["reason"]
-            QMessageBox.information(self, "Game Over", 
-                                   f"Player {winner} wins!\n{reason}")
+            outcome = "Draw!" if winner is None else f"Player {winner} wins!"
+            QMessageBox.information(self, "Game Over", f"{outcome}\n{reason}")
             self.reset_game()
+            return None
+
+        return result
+
+    def start_ai_move(self, last_move):
+        """Compute the computer's move on a worker thread"""
+        self.ai_thinking = True
+        if self.analysis_checkbox.isChecked():
+            self.refresh_analysis()  # Shows the analysis as paused
+        self.board_widget.clear_selection()
+        self.status_label.setText(self.status_label.text() + " | Computer is thinking...")
+        game = self.game.copy()
+        game_number = self.game_number
+        difficulty = self.difficulty_combo.currentIndex()
+        depth = self.ai_depths[difficulty]
+        budget = self.proof_budgets[difficulty]
+        self.engine.proof_solver = self.proof_solver if budget else None
+        if budget:
+            self.proof_solver.max_nodes, self.proof_solver.max_depth = budget
+
+        def worker():
+            if last_move is None:
+                result = self.engine.search(game, depth, self.ai_time_limit)
+            else:
+                result = self.ponderer.on_opponent_move(last_move, game, depth, self.ai_time_limit)
+            self.ai_move_ready.emit(game_number, result)
+
+        # Stopping the ponderer sets the engine's stop event, so it goes
+        # first; prepare() then lets a cancel_ai_move() before the worker
+        # starts searching still stop it
+        self.ponderer.stop()
+        self.engine.prepare()
+        self.ai_thread = threading.Thread(target=worker, daemon=True)
+        self.ai_thread.start()
+
+    def cancel_ai_move(self):
+        """Stop pondering and the computer's search, wait for them, and drop any move still on its way"""
+        self.ponderer.stop()
+        self.engine.stop()
+        if self.ai_thread is not None:
+            self.ai_thread.join()
+            self.ai_thread = None
+        self.game_number += 1
+        self.ai_thinking = False
+
+    def undo_move(self):
+        """Take back the last move (and the computer's reply before it, when playing the computer)"""
+        self.restore_history(self.history.undo)
+
+    def redo_move(self):
+        """Play an undone move again"""
+        self.restore_history(self.history.redo)
+
+    def restore_history(self, step):
+        """Apply history.undo or history.redo, skipping the computer's turns"""
+        # Any search in progress is for a position that is about to change
+        self.cancel_ai_move()
+
+        moved = False
+        while step(self.game):
+            moved = True
+            if step == self.history.undo:
+                self.redo_moves.append(self.replay.moves[-1])
+                self.replay.truncate(len(self.replay) - 1)
+                self.repetition.pop()
+            else:
+                self.replay.append(self.redo_moves.pop(), self.game)
+                self.repetition.push(self.game)
+            if self.ai_player != self.game.current_player:
+                break
+        if not moved:
+            return
+        self.sync_replay_slider()
+        self.board_widget.clear_selection()
+        self.update_display()
+        self.status_label.setText(f"Back at ply {len(self.replay)}" if step == self.history.undo
+                                  else f"Forward to ply {len(self.replay)}")
+        if self.ai_player == self.game.current_player:
+            self.start_ai_move(None)
+
+    def on_ai_move_ready(self, game_number, search_result):
+        """Play the computer's move and start pondering on the human's time"""
+        if game_number != self.game_number:
+            return
+        self.ai_thinking = False
+        if self.ai_player != self.game.current_player or search_result.best_move is None:
+            return
+
+        if self.tracer is not None:
+            self.tracer.begin_interaction("ai_move")
+        result = self.apply_move(*search_result.best_move)
+        if result and self.ai_player is not None and not self.analysis_checkbox.isChecked():
+            # Ponder the predicted reply from the principal variation
+            expected_move = search_result.pv[1] if len(search_result.pv) > 1 else None
+            self.ponderer.start(self.game, expected_move)
     
     def update_display(self):
         """Update the game display based on current state"""
+        with trace_span(self.tracer, "update_display"):
+            self.refresh_labels()
+
+    def refresh_labels(self):
+        """Copy the game state into the board widget and info labels"""
+        self.show_position(self.game)
+        if self.analysis_checkbox.isChecked():
+            self.refresh_analysis()
+    
+    def show_position(self, game):
+        """Draw a position (the live game or one from the replay) with its info labels"""
         # Update board
-        self.board_widget.update_board(self.game.board, self.game.piece_values)
-        self.board_widget.set_special_points(self.game.special_points)
+        self.board_widget.update_board(game.board, game.piece_values)
+        self.board_widget.set_special_points(game.special_points)
         
         # Update player info
-        self.player1_pieces_label.setText(f"Pieces: {self.game.player1_pieces}")
-        self.player2_pieces_label.setText(f"Pieces: {self.game.player2_pieces}")
+        self.player1_pieces_label.setText(f"Pieces: {game.player1_pieces}")
+        self.player2_pieces_label.setText(f"Pieces: {game.player2_pieces}")
         
-        self.player1_energy_label.setText(f"Energy: {self.game.player1_energy}")
-        self.player2_energy_label.setText(f"Energy: {self.game.player2_energy}")
+        self.player1_energy_label.setText(f"Energy: {game.player1_energy}")
+        self.player2_energy_label.setText(f"Energy: {game.player2_energy}")
         
-        self.player1_inner_label.setText(f"Inner Circle: {self.game.player1_inner_pieces}")
-        self.player2_inner_label.setText(f"Inner Circle: {self.game.player2_inner_pieces}")
+        self.player1_inner_label.setText(f"Inner Circle: {game.player1_inner_pieces}")
+        self.player2_inner_label.setText(f"Inner Circle: {game.player2_inner_pieces}")
         
         # Update turn indicator
-        self.turn_label.setText(f"Current Turn: Player {self.game.current_player}")
-    
+        self.turn_label.setText(f"Current Turn: Player {game.current_player}")
+
     def reset_game(self):
         """Reset the game to initial state"""
+        self.cancel_ai_move()
         self.game.reset_board()
+        self.replay = GameReplay(self.game)
+        self.sync_replay_slider()
+        self.history.reset(self.game)
+        self.redo_moves = []
+        self.repetition.reset(self.game)
+        self.game.repetition = self.repetition
         self.board_widget.reset_board()
         self.update_display()
         self.status_label.setText("Game reset. Player 1 starts.")
 
+    def closeEvent(self, event):
+        """Stop background search before closing"""
+        self.cancel_ai_move()
+        self.analyzer.stop()
+        if self.eval_cache.path:
+            self.eval_cache.save()
+        if self.tracer is not None and self.tracer.path:
+            self.tracer.write()
+        super().closeEvent(event)
+
 
 class RulesDialog(QMessageBox):
     def __init__(self, parent=None):
@@ -1041,13 +1544,27 @@ class RulesDialog(QMessageBox):
 
 
 def main():
-    app = QApplication(sys.argv)
+    # --startup-timing prints how long each startup phase took
+    startup = StartupTimer()
+    startup.mark("imports")
+    app = QApplication(strip_flags(sys.argv))
+    startup.mark("application")
     window = GameWindow()
-    
-    # Show rules dialog on first launch
-    rules = RulesDialog(window)
-    rules.exec_()
-    
+    startup.mark("window")
+
+    def on_first_paint():
+        startup.mark("first_paint")
+        # Show rules dialog on first launch, once the board is already on screen
+        rules = RulesDialog(window)
+        startup.mark("rules_dialog")
+        if startup.enabled:
+            print(startup.report(), file=sys.stderr)
+        if startup.quit_after_startup:
+            app.quit()
+        else:
+            rules.exec_()
+
+    after_first_paint(app, on_first_paint)
     window.show()
     sys.exit(app.exec_())
 
@@ -1,3 +1,5 @@
+# First, so that startup timing covers the imports below
+from orbital_startup import StartupTimer, after_first_paint, strip_flags
 import sys
 import numpy as np
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QGridLayout, 
@@ -5,6 +7,20 @@ from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QGridLayout,
                             QMessageBox)
 from PyQt5.QtGui import QPainter, QColor, QPen, QBrush, QPainterPath, QFont
 from PyQt5.QtCore import Qt, QRect, QPoint, QSize, pyqtSignal, QTimer
+from orbital_repetition import RepetitionTracker
+
+# Error codes returned by OrbitalCaptureGame.checked_move
+MOVE_BAD_COORDINATES = "bad_coordinates"  # Not integers or off the board
+MOVE_NOT_YOUR_PIECE = "not_your_piece"    # No piece of the side to move at the origin
+MOVE_OCCUPIED = "destination_occupied"
+MOVE_UNREACHABLE = "unreachable"          # Not one step along the ring or one ring inward
+
+MOVE_ERROR_MESSAGES = {
+    MOVE_BAD_COORDINATES: "Position is not on the board",
+    MOVE_NOT_YOUR_PIECE: "No piece of the current player at that position",
+    MOVE_OCCUPIED: "Destination is occupied",
+    MOVE_UNREACHABLE: "That piece cannot move there",
+}
 
 class BoardWidget(QWidget):
     piece_clicked = pyqtSignal(int, int)  # Ring, spoke
@@ -230,6 +246,9 @@ class OrbitalCaptureGame:
         self.player2_inner_pieces = 0
         # Set threshold for inner circle win condition (can be adjusted)
         self.inner_circle_threshold = 3
+
+        # Optional orbital_repetition.RepetitionTracker ending games that cycle
+        self.repetition = None
         
         # Set up initial positions
         # Player 1 on positions 1, 3, 5, 7 of outermost ring
@@ -260,6 +279,55 @@ class OrbitalCaptureGame:
         
         return valid_moves
     
+    def generate_all_moves(self, player=None):
+        """Yield every legal move of a player (default: the side to move) as a packed integer
+
+        A move is from_cell | to_cell << 8 | move_class << 16, with cells
+        numbered ring * 8 + spoke and move_class 0 for a step along the ring
+        or 1 for a step inward. Being a generator, callers that only need to
+        know whether a move exists stop at the first one.
+        """
+        if player is None:
+            player = self.current_player
+        cells = self.board.ravel().tolist()
+        for from_cell, owner in enumerate(cells):
+            if owner != player:
+                continue
+            ring, spoke = divmod(from_cell, 8)
+            for offset in (-1, 1):
+                to_cell = ring * 8 + (spoke + offset) % 8
+                if cells[to_cell] == 0:
+                    yield from_cell | to_cell << 8
+            if ring > 0 and cells[from_cell - 8] == 0:
+                yield from_cell | (from_cell - 8) << 8 | 1 << 16
+
+    def validate_move(self, from_ring, from_spoke, to_ring, to_spoke):
+        """Return None for a legal move, otherwise one of the MOVE_* error codes"""
+        for value, limit in ((from_ring, 4), (from_spoke, 8), (to_ring, 4), (to_spoke, 8)):
+            if not isinstance(value, (int, np.integer)) or isinstance(value, bool) or not 0 <= value < limit:
+                return MOVE_BAD_COORDINATES
+        if self.board[from_ring][from_spoke] != self.current_player:
+            return MOVE_NOT_YOUR_PIECE
+        if self.board[to_ring][to_spoke] != 0:
+            return MOVE_OCCUPIED
+        along_ring = to_ring == from_ring and (to_spoke - from_spoke) % 8 in (1, 7)
+        inward = to_ring == from_ring - 1 and to_spoke == from_spoke
+        if not (along_ring or inward):
+            return MOVE_UNREACHABLE
+        return None
+
+    def checked_move(self, from_ring, from_spoke, to_ring, to_spoke):
+        """Play a move after checking it is legal; use this for moves from untrusted input
+
+        Illegal moves leave the game untouched and return
+        {"success": False, "code": MOVE_*, "error": message}, as in the
+        advanced version.
+        """
+        code = self.validate_move(from_ring, from_spoke, to_ring, to_spoke)
+        if code is not None:
+            return {"success": False, "code": code, "error": MOVE_ERROR_MESSAGES[code]}
+        return self.move(int(from_ring), int(from_spoke), int(to_ring), int(to_spoke))
+
     def check_captures(self, ring, spoke):
         """Check and process captures after a move to (ring, spoke)"""
         opponent = 2 if self.current_player == 1 else 1
@@ -342,19 +410,28 @@ class OrbitalCaptureGame:
         
         # Combine win conditions
         if inner_circle_win:
-            return {
+            result = {
+                "success": True,
                 "captured": captured, 
                 "game_over": True, 
                 "winner": winner, 
                 "reason": f"Player {winner} reached {self.inner_circle_threshold} pieces in the innermost circle first"
             }
-        
-        return {
-            "captured": captured, 
-            "game_over": game_over, 
-            "winner": winner_standard, 
-            "reason": reason_standard
-        }
+        else:
+            result = {
+                "success": True,
+                "captured": captured, 
+                "game_over": game_over, 
+                "winner": winner_standard, 
+                "reason": reason_standard
+            }
+
+        # Repetitions and the move cap end a game that keeps cycling
+        if self.repetition is not None:
+            verdict = self.repetition.push(self)
+            if verdict and not result["game_over"]:
+                result.update(game_over=True, **verdict)
+        return result
     
     def check_inner_circle_win(self):
         """Check if either player has reached the threshold for pieces in the innermost ring"""
@@ -372,39 +449,9 @@ class OrbitalCaptureGame:
         if self.player2_pieces < 3:
             return True, 1, "Player 2 has fewer than 3 pieces remaining"
         
-        # Check if current player has any legal moves
-        player1_has_moves = False
-        player2_has_moves = False
-        
-        # Check for player 1's moves
-        for ring in range(4):
-            for spoke in range(8):
-                if self.board[ring][spoke] == 1:
-                    # Temporarily set current player to check moves
-                    original_player = self.current_player
-                    self.current_player = 1
-                    moves = self.get_valid_moves(ring, spoke)
-                    self.current_player = original_player
-                    if moves:
-                        player1_has_moves = True
-                        break
-            if player1_has_moves:
-                break
-        
-        # Check for player 2's moves
-        for ring in range(4):
-            for spoke in range(8):
-                if self.board[ring][spoke] == 2:
-                    # Temporarily set current player to check moves
-                    original_player = self.current_player
-                    self.current_player = 2
-                    moves = self.get_valid_moves(ring, spoke)
-                    self.current_player = original_player
-                    if moves:
-                        player2_has_moves = True
-                        break
-            if player2_has_moves:
-                break
+        # Check if each player has any legal moves (stops at the first one found)
+        player1_has_moves = next(self.generate_all_moves(1), None) is not None
+        player2_has_moves = next(self.generate_all_moves(2), None) is not None
         
         # Check for stalemate (neither player can move)
         if not player1_has_moves and not player2_has_moves:
@@ -487,6 +534,7 @@ class OrbitalCaptureWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.game = OrbitalCaptureGame()
+        self.game.repetition = RepetitionTracker(game=self.game)
         self.init_ui()
     
     def init_ui(self):
@@ -583,7 +631,10 @@ class OrbitalCaptureWindow(QMainWindow):
     
     def on_move_made(self, from_ring, from_spoke, to_ring, to_spoke):
         # Make the move in the game logic
-        result = self.game.move(from_ring, from_spoke, to_ring, to_spoke)
+        result = self.game.checked_move(from_ring, from_spoke, to_ring, to_spoke)
+        if not result["success"]:
+            self.board_widget.clear_selection()
+            return
         
         # Update the board display
         self.board_widget.update_board(self.game.board)
@@ -623,13 +674,14 @@ class OrbitalCaptureWindow(QMainWindow):
         
         msg_box = QMessageBox()
         msg_box.setWindowTitle("Game Over")
-        msg_box.setText(f"Player {winner} wins!")
+        msg_box.setText("Draw!" if winner is None else f"Player {winner} wins!")
         msg_box.setInformativeText(f"Reason: {reason}\n\nFinal scores:\nPlayer 1: {scores[1]}\nPlayer 2: {scores[2]}\n\nInner circle pieces:\nPlayer 1: {self.game.player1_inner_pieces}\nPlayer 2: {self.game.player2_inner_pieces}")
         msg_box.setStandardButtons(QMessageBox.Ok)
         msg_box.exec_()
     
     def reset_game(self):
         self.game = OrbitalCaptureGame()
+        self.game.repetition = RepetitionTracker(game=self.game)
         self.board_widget.reset_board()
         self.update_status_display()
         self.statusBar().showMessage("New game started", 3000)
@@ -637,6 +689,7 @@ class OrbitalCaptureWindow(QMainWindow):
     def setup_test_board(self):
         """Set up the test board for the stalemate condition"""
         self.game.set_test_board()
+        self.game.repetition.reset(self.game)
         self.board_widget.update_board(self.game.board)
         self.update_status_display()
         self.statusBar().showMessage("Test board set up with stalemate condition", 3000)
@@ -693,8 +746,22 @@ class OrbitalCaptureWindow(QMainWindow):
 
 
 def main():
-    app = QApplication(sys.argv)
+    # --startup-timing prints how long each startup phase took
+    startup = StartupTimer()
+    startup.mark("imports")
+    app = QApplication(strip_flags(sys.argv))
+    startup.mark("application")
     window = OrbitalCaptureWindow()
+    startup.mark("window")
+
+    def on_first_paint():
+        startup.mark("first_paint")
+        if startup.enabled:
+            print(startup.report(), file=sys.stderr)
+        if startup.quit_after_startup:
+            app.quit()
+
+    after_first_paint(app, on_first_paint)
     window.show()
     sys.exit(app.exec_())
 
@@ -0,0 +1,146 @@
+import json
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from orbital_eval import DEFAULT_WEIGHTS, evaluate_position
+from orbital_search import position_hash
+
+# Folded into the position key so rule toggles that change the legal moves
+# never share an entry (the Zobrist key only covers the position itself)
+_RULE_KEYS = [int(value) for value in np.random.default_rng(20240607).integers(1, 2 ** 63, size=4, dtype=np.uint64)]
+
+CACHE_FORMAT = 1
+
+# ORBITAL_EVAL_CACHE=<file.npz> gives the GUI engine a cache kept between runs
+EVAL_CACHE_ENV = "ORBITAL_EVAL_CACHE"
+
+
+def cache_key(game, key=None):
+    """Cache key of a game: its Zobrist key combined with the move rules"""
+    if key is None:
+        key = position_hash(game)
+    return key ^ _RULE_KEYS[2 * bool(game.allow_jumps) + bool(game.allow_nimber)]
+
+
+class EvaluationCache:
+    """Bounded LRU cache of static evaluations and legal-move lists
+
+    Unlike the transposition table this holds no search results, only facts
+    about a position that never change: its evaluate_position score and its
+    packed legal moves. Entries are keyed by cache_key, so the start
+    position and common openings hit on every game; with a path the cache
+    is loaded on creation and written back by save().
+
+    Piece energies and reserves above 63 share Zobrist keys, so positions
+    that differ only there also share an entry.
+    """
+
+    def __init__(self, capacity=1 << 16, path=None, weights=None):
+        self.capacity = capacity
+        self.path = path
+        self.weights = weights or DEFAULT_WEIGHTS
+        self.entries = OrderedDict()  # key -> [score or None, moves or None], least recent first
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _entry(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self.entries[key] = [None, None]
+            if len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        else:
+            self.entries.move_to_end(key)
+        return entry
+
+    def evaluate(self, game, key=None):
+        """evaluate_position(game), computed once per position"""
+        entry = self._entry(cache_key(game, key))
+        if entry[0] is None:
+            self.misses += 1
+            entry[0] = evaluate_position(game, self.weights)
+        else:
+            self.hits += 1
+        return entry[0]
+
+    def legal_moves(self, game, key=None):
+        """game.generate_all_moves(), computed once per position (do not modify the list)"""
+        entry = self._entry(cache_key(game, key))
+        if entry[1] is None:
+            self.misses += 1
+            entry[1] = game.generate_all_moves()
+        else:
+            self.hits += 1
+        return entry[1]
+
+    def clear(self):
+        self.entries.clear()
+
+    def statistics(self):
+        lookups = max(1, self.hits + self.misses)
+        return {
+            "entries": len(self.entries),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups,
+        }
+
+    def save(self, path=None):
+        """Write the cache as a .npz file, least recently used entries first"""
+        path = path or self.path
+        count = len(self.entries)
+        keys = np.empty(count, dtype=np.uint64)
+        scores = np.zeros(count, dtype=np.int64)
+        has_score = np.zeros(count, dtype=bool)
+        offsets = np.full(count + 1, 0, dtype=np.int64)
+        moves = []
+        for index, (key, (score, move_list)) in enumerate(self.entries.items()):
+            keys[index] = key
+            if score is not None:
+                scores[index] = score
+                has_score[index] = True
+            # A move list of None is stored with offset -1 as its end marker
+            if move_list is None:
+                offsets[index + 1] = -1
+            else:
+                moves.extend(move_list)
+                offsets[index + 1] = len(moves)
+        with open(path, "wb") as output:
+            np.savez_compressed(output, keys=keys, scores=scores, has_score=has_score, offsets=offsets,
+                                moves=np.array(moves, dtype=np.int32),
+                                meta=np.array(json.dumps({"format": CACHE_FORMAT, "weights": self.weights})))
+
+    def load(self, path=None):
+        """Add the entries of a saved cache; scores saved with other weights are ignored"""
+        with np.load(path or self.path) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta.get("format") != CACHE_FORMAT:
+                return
+            same_weights = meta.get("weights") == self.weights
+            keys = data["keys"].tolist()
+            scores = data["scores"].tolist()
+            has_score = data["has_score"].tolist()
+            offsets = data["offsets"].tolist()
+            moves = data["moves"].tolist()
+        start = 0
+        for index, key in enumerate(keys):
+            end = offsets[index + 1]
+            move_list = None
+            if end >= 0:
+                move_list = moves[start:end]
+                start = end
+            score = scores[index] if has_score[index] and same_weights else None
+            entry = self._entry(key)
+            entry[0] = score if score is not None else entry[0]
+            entry[1] = move_list if move_list is not None else entry[1]
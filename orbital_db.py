@@ -0,0 +1,334 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from orbital_geometry import DEFAULT_GEOMETRY, get_geometry
+
+# Rule flags stored per position (bit values of the "rules" column)
+RULE_ALLOW_JUMPS = 1
+RULE_ALLOW_NIMBER = 2
+RULE_ENERGY_COLLECTION = 4
+
+# Outcome column: result for the side to move in that position
+OUTCOME_WIN = 1
+OUTCOME_DRAW = 0
+OUTCOME_LOSS = -1
+
+# Format 3: earlier recordings stored every row of a game with the game's
+# final board (a view of the live board instead of a copy), so they are refused
+DB_FORMAT = 3
+
+
+def column_layout(geometry):
+    """Column name -> (dtype, values per row) for a board geometry"""
+    return {
+        "occupancy": (np.uint8, (geometry.cells + 3) // 4),  # 2 bits per intersection
+        "energy": (np.uint8, geometry.cells),                # Piece energies, capped at 255
+        "reserves": (np.uint16, 2),                          # Player 1, player 2
+        "inner": (np.uint8, 2),                              # Inner-circle pieces, player 1, player 2
+        "side_to_move": (np.uint8, 1),
+        "rules": (np.uint8, 1),
+        "score": (np.int32, 1),                              # Search score, side to move's view
+        "outcome": (np.int8, 1),                             # OUTCOME_* for the side to move
+        "move": (np.uint8, 2),                               # Search's best move: from cell, to cell
+        "game": (np.uint32, 1),
+        "ply": (np.uint16, 1),
+    }
+
+
+def pack_occupancy(occupancy):
+    """Pack (N, cells) occupancy values 0-2 into (N, ceil(cells / 4)) bytes"""
+    occupancy = np.asarray(occupancy, dtype=np.uint8)
+    bits = np.stack([occupancy & 1, occupancy >> 1], axis=2).reshape(len(occupancy), -1)
+    return np.packbits(bits, axis=1, bitorder="little")
+
+
+def unpack_occupancy(packed, geometry):
+    """Inverse of pack_occupancy, shaped (N, rings, spokes)"""
+    bits = np.unpackbits(np.asarray(packed), axis=1, bitorder="little")[:, :2 * geometry.cells]
+    bits = bits.reshape(len(bits), geometry.cells, 2)
+    return (bits[:, :, 0] + 2 * bits[:, :, 1]).reshape((len(bits),) + geometry.shape)
+
+
+class PositionWriter:
+    """Buffers positions in column arrays and appends them to disk in large batches
+
+    Every column is a flat binary file of fixed-width rows, so an append is
+    one write per column however many rows it carries, and readers can map
+    the files straight into NumPy arrays. The row count in meta.json is only
+    advanced after the column data is written.
+    """
+
+    def __init__(self, directory, geometry=DEFAULT_GEOMETRY, batch_rows=65536):
+        self.directory = directory
+        self.geometry = geometry
+        self.batch_rows = batch_rows
+        self.layout = column_layout(geometry)
+        os.makedirs(directory, exist_ok=True)
+
+        meta_path = os.path.join(directory, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as meta_file:
+                meta = json.load(meta_file)
+            if meta.get("format") != DB_FORMAT:
+                raise ValueError(f"{directory} is not a position database this version can read")
+            if tuple(meta["board"]) != geometry.shape:
+                raise ValueError(f"{directory} holds {meta['board']} positions, not {list(geometry.shape)}")
+            self.rows = meta["rows"]
+            self.games = meta["games"]
+            # Drop any partial append left behind by a crash
+            for name, (dtype, width) in self.layout.items():
+                path = self.column_path(name)
+                if os.path.exists(path):
+                    os.truncate(path, self.rows * width * np.dtype(dtype).itemsize)
+        else:
+            self.rows = 0
+            self.games = 0
+            self.write_meta()
+        self.pending = []  # Column dictionaries waiting to be flushed
+        self.pending_rows = 0
+
+    def column_path(self, name):
+        return os.path.join(self.directory, f"{name}.bin")
+
+    def write_meta(self):
+        meta = {"format": DB_FORMAT, "board": list(self.geometry.shape), "rows": self.rows,
+                "games": self.games, "columns": {name: [np.dtype(dtype).str, width]
+                                                 for name, (dtype, width) in self.layout.items()}}
+        temporary = os.path.join(self.directory, "meta.json.tmp")
+        with open(temporary, "w") as meta_file:
+            json.dump(meta, meta_file, indent=2)
+        os.replace(temporary, os.path.join(self.directory, "meta.json"))
+
+    def append(self, columns):
+        """Queue a batch of rows given as {column: array with one row per position}"""
+        count = len(columns["score"])
+        if count == 0:
+            return
+        self.pending.append(columns)
+        self.pending_rows += count
+        self.games += len(np.unique(columns["game"]))
+        if self.pending_rows >= self.batch_rows:
+            self.flush()
+
+    def flush(self):
+        """Write all queued rows: one append per column file"""
+        if not self.pending:
+            return
+        for name, (dtype, width) in self.layout.items():
+            data = np.concatenate([np.asarray(batch[name], dtype=dtype).reshape(-1, width)
+                                   for batch in self.pending])
+            with open(self.column_path(name), "ab") as column_file:
+                column_file.write(data.tobytes())
+        self.rows += self.pending_rows
+        self.pending = []
+        self.pending_rows = 0
+        self.write_meta()
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class PositionDatabase:
+    """Read side of a position store: every column memory-mapped as an (rows, width) array"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json")) as meta_file:
+            self.meta = json.load(meta_file)
+        if self.meta.get("format") != DB_FORMAT:
+            raise ValueError(f"{directory} is not a position database this version can read")
+        self.geometry = get_geometry(*self.meta["board"])
+        self.rows = self.meta["rows"]
+        self._template = None  # New game copied by game()
+        self.columns = {}
+        for name, (dtype, width) in column_layout(self.geometry).items():
+            if self.rows:
+                self.columns[name] = np.memmap(os.path.join(directory, f"{name}.bin"), dtype=dtype,
+                                               mode="r", shape=(self.rows, width))
+            else:
+                self.columns[name] = np.zeros((0, width), dtype=dtype)
+
+    def __len__(self):
+        return self.rows
+
+    def rows_at(self, indices):
+        """Column values for the given row indices (flattened where a column is one value wide)"""
+        indices = np.asarray(indices)
+        return {name: column[indices][:, 0] if column.shape[1] == 1 else column[indices]
+                for name, column in self.columns.items()}
+
+    def sample(self, count, seed=None):
+        """Random rows, sampled with replacement"""
+        rng = np.random.default_rng(seed)
+        return self.rows_at(rng.integers(0, self.rows, size=count))
+
+    def game(self, index):
+        """Rebuild the game at a row
+
+        The database does not store thresholds or the special point layout,
+        so the game has the defaults of a new game; the rule flags and all
+        of the position come from the row.
+        """
+        from Orbital_Capture_Advanced_version import EnhancedOrbitalCaptureGame
+
+        if self._template is None:
+            self._template = EnhancedOrbitalCaptureGame(self.geometry)
+        game = self._template.copy()
+        row = self.rows_at([index])
+        game.board = unpack_occupancy(row["occupancy"], self.geometry)[0].astype(int)
+        game.piece_values = row["energy"][0].reshape(self.geometry.shape).astype(int)
+        game.player1_energy, game.player2_energy = (int(value) for value in row["reserves"][0])
+        game.player1_inner_pieces, game.player2_inner_pieces = (int(value) for value in row["inner"][0])
+        game.current_player = int(row["side_to_move"][0])
+        rules = int(row["rules"][0])
+        game.allow_jumps = bool(rules & RULE_ALLOW_JUMPS)
+        game.allow_nimber = bool(rules & RULE_ALLOW_NIMBER)
+        game.energy_collection = bool(rules & RULE_ENERGY_COLLECTION)
+        game.player1_pieces = int((game.board == 1).sum())
+        game.player2_pieces = int((game.board == 2).sum())
+        game._legal = None
+        return game
+
+    def evaluation_arrays(self, rows):
+        """Arrays for orbital_eval.evaluate_batch from rows_at/sample output"""
+        count = len(rows["score"])
+        occupancy = unpack_occupancy(rows["occupancy"], self.geometry).astype(np.int8)
+        energy = rows["energy"].reshape((count,) + self.geometry.shape).astype(np.int32)
+        return (occupancy, energy, rows["reserves"].astype(np.int32),
+                rows["inner"].astype(np.int32), rows["side_to_move"].astype(np.int8))
+
+    def summary(self):
+        outcome = self.columns["outcome"][:, 0]
+        return {
+            "rows": self.rows,
+            "games": self.meta["games"],
+            "board": self.meta["board"],
+            "wins": int((outcome == OUTCOME_WIN).sum()),
+            "losses": int((outcome == OUTCOME_LOSS).sum()),
+            "draws": int((outcome == OUTCOME_DRAW).sum()),
+            "bytes_per_row": sum(column.shape[1] * column.dtype.itemsize for column in self.columns.values()),
+        }
+
+
+def play_selfplay_games(first_game, games, shape=(4, 8), depth=2, random_plies=4, max_moves=150,
+                        seed=0, settings=None):
+    """Play self-play games and return their positions as a column dictionary
+
+    Both sides use the alpha-beta engine; the first random_plies moves are
+    random so games differ. Every position gets the engine's score and best
+    move and, once the game ends, its outcome for the side to move.
+    """
+    from Orbital_Capture_Advanced_version import EnhancedOrbitalCaptureGame
+    from orbital_search import SearchEngine
+
+    geometry = get_geometry(*shape)
+    engine = SearchEngine(tt_size_bits=16)
+    rng = random.Random(seed)
+    cells = geometry.cells
+    records = {name: [] for name in ("occupancy", "energy", "reserves", "inner", "side_to_move",
+                                     "rules", "score", "outcome", "move", "game", "ply")}
+
+    for game_id in range(first_game, first_game + games):
+        game = EnhancedOrbitalCaptureGame(geometry)
+        for name, value in (settings or {}).items():
+            setattr(game, name, value)
+        rules = (RULE_ALLOW_JUMPS * bool(game.allow_jumps) + RULE_ALLOW_NIMBER * bool(game.allow_nimber) +
+                 RULE_ENERGY_COLLECTION * bool(game.energy_collection))
+        engine.tt.clear()
+        sides = []
+        winner = None
+        for ply in range(max_moves):
+            moves = game.get_all_valid_moves()
+            if not moves:
+                winner = 2 if game.current_player == 1 else 1
+                break
+            result = engine.search(game, depth)
+            # move() changes the board in place, so keep a copy rather than a view
+            records["occupancy"].append(game.board.reshape(cells).copy())
+            records["energy"].append(np.minimum(game.piece_values.reshape(cells), 255))
+            records["reserves"].append((game.player1_energy, game.player2_energy))
+            records["inner"].append((game.player1_inner_pieces, game.player2_inner_pieces))
+            records["side_to_move"].append(game.current_player)
+            records["rules"].append(rules)
+            records["score"].append(result.score)
+            from_ring, from_spoke, to_ring, to_spoke = result.best_move
+            records["move"].append((geometry.cell(from_ring, from_spoke), geometry.cell(to_ring, to_spoke)))
+            records["game"].append(game_id)
+            records["ply"].append(ply)
+            sides.append(game.current_player)
+
+            move = rng.choice(moves) if ply < random_plies else result.best_move
+            victory = game.move(*move)["victory"]
+            if victory:
+                winner = victory["winner"]
+                break
+        for side in sides:
+            if winner is None:
+                records["outcome"].append(OUTCOME_DRAW)
+            else:
+                records["outcome"].append(OUTCOME_WIN if side == winner else OUTCOME_LOSS)
+
+    columns = {name: np.array(values) for name, values in records.items()}
+    if len(columns["score"]):
+        columns["occupancy"] = pack_occupancy(columns["occupancy"])
+    return columns
+
+
+def record_selfplay(directory, games, shape=(4, 8), depth=2, workers=None, games_per_task=10,
+                    seed=0, **options):
+    """Play games in a process pool and append their positions to a database"""
+    geometry = get_geometry(*shape)
+    with PositionWriter(directory, geometry) as writer:
+        first_game = writer.games
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(play_selfplay_games, first_game + start,
+                                       min(games_per_task, games - start), shape, depth,
+                                       seed=seed + start, **options)
+                       for start in range(0, games, games_per_task)]
+            for future in futures:
+                writer.append(future.result())
+    return writer.rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Self-play position database")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = commands.add_parser("record", help="Play self-play games and store their positions")
+    record_parser.add_argument("directory")
+    record_parser.add_argument("--games", type=int, default=100)
+    record_parser.add_argument("--depth", type=int, default=2)
+    record_parser.add_argument("--random-plies", type=int, default=4)
+    record_parser.add_argument("--max-moves", type=int, default=150)
+    record_parser.add_argument("--board", type=int, nargs=2, default=[4, 8], metavar=("RINGS", "SPOKES"))
+    record_parser.add_argument("--workers", type=int, default=None)
+    record_parser.add_argument("--seed", type=int, default=0)
+
+    info_parser = commands.add_parser("info", help="Summarise a database")
+    info_parser.add_argument("directory")
+
+    args = parser.parse_args()
+    if args.command == "record":
+        start = time.perf_counter()
+        rows = record_selfplay(args.directory, args.games, tuple(args.board), args.depth, args.workers,
+                               seed=args.seed, random_plies=args.random_plies, max_moves=args.max_moves)
+        print(f"{rows} positions stored ({time.perf_counter() - start:.1f}s)")
+    json.dump(PositionDatabase(args.directory).summary(), sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
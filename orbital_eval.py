@@ -0,0 +1,147 @@
+import numpy as np
+
+# Weights for each evaluation feature (player 1 minus player 2)
+DEFAULT_WEIGHTS = {
+    "material": 100,      # Pieces on the board
+    "placement": 10,      # Ring-weighted placement, inner rings worth more
+    "piece_energy": 3,    # Energy carried by pieces
+    "reserve_energy": 15,  # Energy held in the player's reserve
+    "inner_pieces": 60,   # Pieces counted in the inner circle
+    "mobility": 4,        # Simple ring and inward moves available
+    "capture_threats": 25,  # Opponent pieces under capture threat
+}
+
+# Ring values as in calculate_inner_ring_score: inner rings are worth more
+RING_VALUES = np.array([4, 3, 2, 1])
+
+
+def ring_values(rings):
+    """Ring values for a board with the given number of rings (rings, ..., 1)"""
+    if rings == len(RING_VALUES):
+        return RING_VALUES
+    return np.arange(rings, 0, -1)
+
+
+def stack_positions(games):
+    """Convert a list of games into the arrays used by evaluate_batch"""
+    count = len(games)
+    shape = games[0].board.shape if count else (4, 8)
+    occupancy = np.empty((count,) + shape, dtype=np.int8)
+    energy = np.empty((count,) + shape, dtype=np.int32)
+    reserves = np.empty((count, 2), dtype=np.int32)
+    inner_counts = np.empty((count, 2), dtype=np.int32)
+    side_to_move = np.empty(count, dtype=np.int8)
+    for i, game in enumerate(games):
+        occupancy[i] = game.board
+        energy[i] = game.piece_values
+        reserves[i] = (game.player1_energy, game.player2_energy)
+        inner_counts[i] = (game.player1_inner_pieces, game.player2_inner_pieces)
+        side_to_move[i] = game.current_player
+    return occupancy, energy, reserves, inner_counts, side_to_move
+
+
+def _neighbour_sum(values):
+    """Sum of the 8 neighbours of every cell (spokes wrap, rings do not)"""
+    ring_sum = values + np.roll(values, 1, axis=2) + np.roll(values, -1, axis=2)
+    total = ring_sum.copy()
+    total[:, 1:] += ring_sum[:, :-1]
+    total[:, :-1] += ring_sum[:, 1:]
+    return total - values
+
+
+def _player_features(mine, theirs, energy, empty):
+    """Feature planes for one player; every result has shape (N,)"""
+    features = {}
+    features["material"] = mine.sum(axis=(1, 2))
+    features["placement"] = (mine * ring_values(mine.shape[1])[None, :, None]).sum(axis=(1, 2))
+    features["piece_energy"] = (energy * mine).sum(axis=(1, 2))
+
+    # Mobility: moves along the ring in both directions and one ring inward
+    along_ring = (mine & np.roll(empty, 1, axis=2)).sum(axis=(1, 2))
+    along_ring += (mine & np.roll(empty, -1, axis=2)).sum(axis=(1, 2))
+    inward = (mine[:, 1:] & empty[:, :-1]).sum(axis=(1, 2))
+    features["mobility"] = along_ring + inward
+
+    # Capture threats on opponent pieces: two of the three surround points held
+    # with the third empty, or enough surrounding energy for an energy capture
+    left = np.roll(mine, 1, axis=2)
+    right = np.roll(mine, -1, axis=2)
+    inner = np.zeros_like(mine)
+    inner[:, 1:] = mine[:, :-1]
+    left_empty = np.roll(empty, 1, axis=2)
+    right_empty = np.roll(empty, -1, axis=2)
+    inner_empty = np.zeros_like(empty)
+    inner_empty[:, 1:] = empty[:, :-1]
+    held = left.astype(np.int8) + right + inner
+    open_point = (left_empty | right_empty | inner_empty)
+    surround_threat = theirs & (held == 2) & open_point
+    surrounding_energy = _neighbour_sum(energy * mine)
+    energy_threat = theirs & (surrounding_energy >= np.maximum(4, 2 * energy))
+    features["capture_threats"] = (surround_threat | energy_threat).sum(axis=(1, 2))
+    return features
+
+
+def evaluate_batch(occupancy, energy, reserves, inner_counts, side_to_move=None, weights=None):
+    """Evaluate N positions in one vectorized pass
+
+    occupancy and energy have shape (N, rings, spokes); reserves and inner_counts have
+    shape (N, 2) with player 1 and player 2 columns. Scores are returned from
+    the side to move's point of view (player 1's when side_to_move is None).
+    """
+    weights = weights or DEFAULT_WEIGHTS
+    occupancy = np.asarray(occupancy)
+    energy = np.asarray(energy, dtype=np.int64)
+    reserves = np.asarray(reserves, dtype=np.int64)
+    inner_counts = np.asarray(inner_counts, dtype=np.int64)
+
+    empty = occupancy == 0
+    player1 = occupancy == 1
+    player2 = occupancy == 2
+    features1 = _player_features(player1, player2, energy, empty)
+    features2 = _player_features(player2, player1, energy, empty)
+
+    scores = np.zeros(len(occupancy), dtype=np.int64)
+    for name, values in features1.items():
+        scores += weights[name] * (values - features2[name])
+    scores += weights["reserve_energy"] * (reserves[:, 0] - reserves[:, 1])
+    scores += weights["inner_pieces"] * (inner_counts[:, 0] - inner_counts[:, 1])
+
+    if side_to_move is not None:
+        scores = np.where(np.asarray(side_to_move) == 1, scores, -scores)
+    return scores
+
+
+def evaluate_games(games, weights=None):
+    """Evaluate a list of games, each from its own side to move's point of view"""
+    if not games:
+        return np.zeros(0, dtype=np.int64)
+    return evaluate_batch(*stack_positions(games), weights=weights)
+
+
+def evaluate_position(game, weights=None):
+    """Cheap single-position evaluation used at alpha-beta leaves
+
+    NumPy's per-call overhead makes evaluate_batch slow for one position, so
+    this scores the material, placement, energy and inner-circle terms with
+    the same weights and leaves mobility and capture threats to the batch API.
+    """
+    weights = weights or DEFAULT_WEIGHTS
+    player = game.current_player
+    opponent = 2 if player == 1 else 1
+
+    mine = game.board == player
+    theirs = game.board == opponent
+    values = ring_values(mine.shape[0])[:, None]
+
+    score = weights["material"] * (int(mine.sum()) - int(theirs.sum()))
+    score += weights["placement"] * (int((mine * values).sum()) - int((theirs * values).sum()))
+    score += weights["piece_energy"] * (int(game.piece_values[mine].sum()) - int(game.piece_values[theirs].sum()))
+
+    reserve_difference = game.player1_energy - game.player2_energy
+    inner_difference = game.player1_inner_pieces - game.player2_inner_pieces
+    if player == 2:
+        reserve_difference = -reserve_difference
+        inner_difference = -inner_difference
+    score += weights["reserve_energy"] * reserve_difference
+    score += weights["inner_pieces"] * inner_difference
+    return score
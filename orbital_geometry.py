@@ -0,0 +1,281 @@
+import time
+
+# Default special point layout (ring, spoke, type), shared by every game
+DEFAULT_SPECIAL_POINTS = (
+    (0, 0, "power"),   # Center top - power point
+    (0, 4, "power"),   # Center bottom - power point
+    (1, 2, "jump"),    # Middle ring - jump point
+    (1, 6, "jump"),    # Middle ring - jump point
+    (2, 1, "shield"),  # Outer middle ring - shield point
+    (2, 5, "shield"),  # Outer middle ring - shield point
+)
+
+# Move classes stored in packed moves, in the order get_valid_moves tries them
+RING_MOVE = 0      # One step along the ring
+INWARD_MOVE = 1    # One ring inward
+OUTWARD_MOVE = 2   # One ring outward (energy 2+)
+DIAGONAL_MOVE = 3  # To an adjacent spoke on a neighbouring ring (energy 3+)
+JUMP_MOVE = 4      # Two spokes along the ring or two rings inward (energy 4+)
+NIMBER_MOVE = 5    # To the opposite spoke on another ring (energy 5+)
+MOVE_CLASS_NAMES = ["ring", "inward", "outward", "diagonal", "jump", "nimber"]
+
+
+def pack_move(from_cell, to_cell, move_class):
+    """Pack a move into an int: from cell in bits 0-7, to cell in 8-15, class in 16-18"""
+    return from_cell | to_cell << 8 | move_class << 16
+
+
+def move_cells(move):
+    """Return (from_cell, to_cell, move_class) of a packed move"""
+    return move & 0xFF, move >> 8 & 0xFF, move >> 16
+
+
+class BoardGeometry:
+    """Shape of an orbital board: concentric rings crossed by radial spokes
+
+    Ring 0 is the inner circle and ring rings-1 the outermost ring. All
+    neighbour relations the rules need are precomputed once per geometry so
+    move generation and capture checks are table lookups on any board size.
+    Cells are addressed either as (ring, spoke) or by the flat index
+    ring * spokes + spoke.
+    """
+
+    def __init__(self, rings=4, spokes=8):
+        if rings < 2 or spokes < 4 or spokes % 2:
+            raise ValueError("A board needs at least 2 rings and an even number (4+) of spokes")
+        if rings * spokes > 256:
+            raise ValueError("Packed moves address at most 256 intersections")
+        self.rings = rings
+        self.spokes = spokes
+        self.cells = rings * spokes
+        self.shape = (rings, spokes)
+
+        # Energy collected by landing on each ring: inner rings give more
+        # (3, 2, 1, 0 on the standard board)
+        self.ring_energy = [rings - 1 - ring for ring in range(rings)]
+        # Positional value of each ring as in calculate_inner_ring_score (4, 3, 2, 1)
+        self.ring_values = [rings - ring for ring in range(rings)]
+        self.spoke_angle = 360 / spokes
+        self.opposite_offset = spokes // 2
+
+        self._build_tables()
+        self._special_points = None
+        self._move_tables = {}
+
+    def __repr__(self):
+        return f"BoardGeometry(rings={self.rings}, spokes={self.spokes})"
+
+    def __eq__(self, other):
+        return isinstance(other, BoardGeometry) and self.shape == other.shape
+
+    def __hash__(self):
+        return hash(self.shape)
+
+    def __reduce__(self):
+        # Tables are rebuilt rather than pickled (keeps process pools cheap)
+        return (get_geometry, self.shape)
+
+    def cell(self, ring, spoke):
+        return ring * self.spokes + spoke
+
+    def position(self, cell):
+        return divmod(cell, self.spokes)
+
+    def unpack_move(self, move):
+        """Return a packed move as (from_ring, from_spoke, to_ring, to_spoke)"""
+        return self.cell_positions[move & 0xFF] + self.cell_positions[move >> 8 & 0xFF]
+
+    def spoke_distance(self, spoke_a, spoke_b):
+        """Shortest distance between two spokes around the ring"""
+        distance = abs(spoke_a - spoke_b) % self.spokes
+        return min(distance, self.spokes - distance)
+
+    def _build_tables(self):
+        rings = self.rings
+        spokes = self.spokes
+
+        def wrap(spoke):
+            return spoke % spokes
+
+        # Per position move targets, in the order get_valid_moves tries them
+        self.ring_steps = {}
+        self.inward = {}
+        self.outward = {}
+        self.diagonals = {}
+        self.spoke_jumps = {}
+        self.ring_jump = {}
+        self.opposite_targets = {}
+        # Capture neighbourhoods
+        self.surround_points = {}
+        self.neighbours = {}
+
+        for ring in range(rings):
+            for spoke in range(spokes):
+                position = (ring, spoke)
+                self.ring_steps[position] = tuple((ring, wrap(spoke + offset)) for offset in (-1, 1))
+                self.inward[position] = (ring - 1, spoke) if ring > 0 else None
+                self.outward[position] = (ring + 1, spoke) if ring < rings - 1 else None
+                self.diagonals[position] = tuple(
+                    (ring + r_offset, wrap(spoke + s_offset))
+                    for r_offset in (-1, 0, 1) if 0 <= ring + r_offset < rings
+                    for s_offset in (-1, 1))
+                self.spoke_jumps[position] = tuple((ring, wrap(spoke + offset)) for offset in (-2, 2))
+                self.ring_jump[position] = (ring - 2, spoke) if ring >= 2 else None
+                opposite = wrap(spoke + self.opposite_offset)
+                self.opposite_targets[position] = tuple(
+                    (new_ring, opposite) for new_ring in range(rings) if new_ring != ring)
+
+                inner = (ring - 1, spoke) if ring > 0 else None
+                self.surround_points[position] = ((ring, wrap(spoke - 1)), (ring, wrap(spoke + 1)), inner)
+                self.neighbours[position] = tuple(
+                    (ring + r_offset, wrap(spoke + s_offset))
+                    for r_offset in (-1, 0, 1) if 0 <= ring + r_offset < rings
+                    for s_offset in (-1, 0, 1) if r_offset or s_offset)
+
+        self.ring_positions = [tuple((ring, spoke) for spoke in range(spokes)) for ring in range(rings)]
+        self.cell_positions = [(ring, spoke) for ring in range(rings) for spoke in range(spokes)]
+
+    def move_table(self, allow_jumps=True, allow_nimber=True):
+        """Per-cell move targets for whole-side move generation
+
+        Entry from_cell lists (to_cell, min_energy, cost, packed_move) in the
+        order get_valid_moves tries them. A target reachable in several ways
+        keeps its first (cheapest to unlock) class, so the list matches the
+        deduplicated targets of get_valid_moves for any piece energy.
+        """
+        key = (bool(allow_jumps), bool(allow_nimber))
+        table = self._move_tables.get(key)
+        if table is not None:
+            return table
+
+        table = []
+        for ring, spoke in self.cell_positions:
+            position = (ring, spoke)
+            candidates = [(target, RING_MOVE, 0) for target in self.ring_steps[position]]
+            candidates.append((self.inward[position], INWARD_MOVE, 0))
+            candidates.append((self.outward[position], OUTWARD_MOVE, 2))
+            candidates += [(target, DIAGONAL_MOVE, 3) for target in self.diagonals[position]]
+            if allow_jumps:
+                candidates += [(target, JUMP_MOVE, 4) for target in self.spoke_jumps[position]]
+                candidates.append((self.ring_jump[position], JUMP_MOVE, 4))
+            if allow_nimber:
+                candidates += [(target, NIMBER_MOVE, 5) for target in
+                               self.ring_positions[ring] + self.opposite_targets[position]]
+
+            from_cell = self.cell(ring, spoke)
+            entries = []
+            seen = set()
+            for target, move_class, min_energy in candidates:
+                if target is None or target in seen or target == position:
+                    continue
+                seen.add(target)
+                to_cell = self.cell(*target)
+                entries.append((to_cell, min_energy, self.move_cost(ring, spoke, *target),
+                                pack_move(from_cell, to_cell, move_class)))
+            table.append(tuple(entries))
+
+        self._move_tables[key] = table
+        return table
+
+    def move_cost(self, from_ring, from_spoke, to_ring, to_spoke):
+        """Energy cost of a move, as in calculate_move_cost"""
+        ring_distance = abs(to_ring - from_ring)
+        total_distance = ring_distance + self.spoke_distance(to_spoke, from_spoke)
+        energy_cost = total_distance if total_distance > 1 else 0
+        if to_ring > from_ring:
+            energy_cost += 2
+        return energy_cost
+
+    def starting_pieces(self):
+        """Starting intersections (player, ring, spoke): alternating on the outer ring"""
+        outer = self.rings - 1
+        return [(1 if spoke % 2 == 0 else 2, outer, spoke) for spoke in range(self.spokes)]
+
+    def pieces_per_player(self):
+        return self.spokes // 2
+
+    def default_special_points(self):
+        """The default power/jump/shield layout scaled to this board"""
+        if self._special_points is None:
+            if self.shape == (4, 8):
+                self._special_points = DEFAULT_SPECIAL_POINTS
+            else:
+                quarter = self.spokes // 4
+                eighth = max(1, self.spokes // 8)
+                half = self.spokes // 2
+                points = [(0, 0, "power"), (0, half, "power"),
+                          (1, quarter, "jump"), (1, quarter + half, "jump")]
+                if self.rings > 3:
+                    points += [(2, eighth, "shield"), (2, eighth + half, "shield")]
+                self._special_points = tuple(points)
+        return self._special_points
+
+    def radii(self, size):
+        """Screen radius of each ring for a board drawn size pixels across"""
+        return [(ring + 1) * size // (2 * self.rings) for ring in range(self.rings)]
+
+
+_geometries = {}
+
+
+def get_geometry(rings=4, spokes=8):
+    """Return the shared BoardGeometry for a board size"""
+    geometry = _geometries.get((rings, spokes))
+    if geometry is None:
+        geometry = _geometries[(rings, spokes)] = BoardGeometry(rings, spokes)
+    return geometry
+
+
+DEFAULT_GEOMETRY = get_geometry(4, 8)
+
+# Board sizes offered by the GUI and used by the benchmark
+STANDARD_SIZES = [(4, 8), (6, 12), (8, 16)]
+
+
+def benchmark_board_sizes(sizes=STANDARD_SIZES, positions=200, seed=0):
+    """Measure move generation and capture checks per second on each board size"""
+    import random
+    from Orbital_Capture_Advanced_version import EnhancedOrbitalCaptureGame
+
+    rng = random.Random(seed)
+    report = []
+    for rings, spokes in sizes:
+        geometry = get_geometry(rings, spokes)
+
+        # Collect positions from random playouts
+        games = []
+        while len(games) < positions:
+            game = EnhancedOrbitalCaptureGame(geometry)
+            for _ in range(rng.randint(0, 6 * rings)):
+                moves = game.get_all_valid_moves()
+                if not moves or game.move(*rng.choice(moves))["victory"]:
+                    break
+            games.append(game)
+
+        start = time.perf_counter()
+        move_count = 0
+        for game in games:
+            move_count += len(game.generate_all_moves())
+        movegen_time = time.perf_counter() - start
+
+        probes = [game.copy() for game in games]
+        start = time.perf_counter()
+        for probe in probes:
+            probe.check_captures(0, 0)
+        capture_time = time.perf_counter() - start
+
+        report.append({
+            "board": f"{rings}x{spokes}",
+            "positions_per_second_movegen": positions / movegen_time,
+            "moves_per_second": move_count / movegen_time,
+            "average_moves": move_count / positions,
+            "capture_checks_per_second": positions / capture_time,
+        })
+    return report
+
+
+if __name__ == "__main__":
+    for row in benchmark_board_sizes():
+        print(f"{row['board']:>6}: {row['positions_per_second_movegen']:10.0f} positions/s move generation "
+              f"({row['moves_per_second']:.0f} moves/s, {row['average_moves']:.1f} per position), "
+              f"{row['capture_checks_per_second']:10.0f} capture checks/s")
@@ -0,0 +1,268 @@
+import argparse
+import math
+import os
+import random
+import time
+
+from orbital_geometry import DEFAULT_GEOMETRY, get_geometry
+
+# Special point kinds, in the order handle_special_point checks them
+SPECIAL_TYPES = ("power", "jump", "shield")
+
+# Points of each kind in a generated layout (the default layout has two of each)
+DEFAULT_COUNTS = {"power": 2, "jump": 2, "shield": 2}
+
+
+class SpecialPointMasks:
+    """Per-type bitmasks of a special point layout
+
+    Bit ring * spokes + spoke is set in the mask of the point's type, so the
+    type at an intersection is found with a couple of integer ANDs however
+    many special points the layout has.
+    """
+
+    __slots__ = ("points", "spokes", "occupied", "masks")
+
+    def __init__(self, points, geometry=DEFAULT_GEOMETRY):
+        self.points = points
+        self.spokes = geometry.spokes
+        self.occupied = 0
+        by_type = {}
+        for ring, spoke, point_type in points:
+            bit = 1 << geometry.cell(ring, spoke)
+            by_type[point_type] = by_type.get(point_type, 0) | bit
+            self.occupied |= bit
+        self.masks = tuple(by_type.items())
+
+    def point_type(self, ring, spoke):
+        """Type of the special point at an intersection, or None"""
+        bit = 1 << (ring * self.spokes + spoke)
+        if not self.occupied & bit:
+            return None
+        for point_type, mask in self.masks:
+            if mask & bit:
+                return point_type
+        return None
+
+
+_masks = {}
+
+
+def special_point_masks(points, geometry=DEFAULT_GEOMETRY):
+    """Return the shared SpecialPointMasks for a layout on a board"""
+    key = (geometry.shape, points)
+    masks = _masks.get(key)
+    if masks is None:
+        masks = _masks[key] = SpecialPointMasks(points, geometry)
+    return masks
+
+
+def generate_layout(seed, geometry=DEFAULT_GEOMETRY, counts=None, symmetric=True,
+                    spaced=True, rings=None):
+    """Generate a random special point layout from a seed
+
+    Constraints:
+    - points only go on the given rings (every ring but the starting ring by default)
+    - symmetric layouts mirror every point to the opposite spoke, as the
+      default layout does, so neither side starts closer to a bonus
+    - spaced layouts keep special points off each other's neighbouring intersections
+
+    Returns a tuple of (ring, spoke, type) sorted like the default layout, or
+    raises ValueError when the constraints cannot be met.
+    """
+    counts = counts or DEFAULT_COUNTS
+    rings = list(rings) if rings is not None else list(range(geometry.rings - 1))
+    rng = random.Random(seed)
+
+    for _ in range(100):
+        taken = set()
+        blocked = set()
+        points = []
+        for point_type in SPECIAL_TYPES:
+            count = counts.get(point_type, 0)
+            if symmetric and count % 2:
+                raise ValueError(f"Symmetric layouts need an even number of {point_type} points")
+            placed = 0
+            candidates = [(ring, spoke) for ring in rings for spoke in range(geometry.spokes)]
+            rng.shuffle(candidates)
+            for ring, spoke in candidates:
+                if placed == count:
+                    break
+                group = [(ring, spoke)]
+                if symmetric:
+                    group.append((ring, (spoke + geometry.opposite_offset) % geometry.spokes))
+                if any(position in taken or position in blocked for position in group):
+                    continue
+                if symmetric and spaced and group[1] in geometry.neighbours[group[0]]:
+                    continue
+                for position in group:
+                    taken.add(position)
+                    if spaced:
+                        blocked.update(geometry.neighbours[position])
+                    points.append((position[0], position[1], point_type))
+                placed += len(group)
+            if placed < count:
+                break
+        else:
+            return tuple(sorted(points, key=lambda point: (SPECIAL_TYPES.index(point[2]), point[0], point[1])))
+    raise ValueError("Could not place the special points under these constraints")
+
+
+def generate_layouts(count, seed=0, geometry=DEFAULT_GEOMETRY, **constraints):
+    """Generate count distinct layouts; layout i comes from seed + i (duplicates are skipped)"""
+    layouts = []
+    seen = set()
+    layout_seed = seed
+    while len(layouts) < count:
+        layout = generate_layout(layout_seed, geometry, **constraints)
+        if layout not in seen:
+            seen.add(layout)
+            layouts.append((layout_seed, layout))
+        layout_seed += 1
+        if layout_seed - seed > 100 * count:
+            break  # The constraints allow fewer distinct layouts than requested
+    return layouts
+
+
+def _choose_greedy(game, moves, rng):
+    """Pick the move with the best static evaluation (ties broken randomly)"""
+    from orbital_eval import evaluate_position
+
+    best_score = None
+    best_moves = []
+    for move in moves:
+        child = game.copy()
+        result = child.move(*move)
+        if result.get("victory"):
+            return move
+        score = -evaluate_position(child)
+        if best_score is None or score > best_score:
+            best_score = score
+            best_moves = [move]
+        elif score == best_score:
+            best_moves.append(move)
+    return rng.choice(best_moves)
+
+
+def play_games(points, shape=(4, 8), games=100, seed=0, max_moves=200, policy="random", settings=None):
+    """Play games on one layout and return {"player1": wins, "player2": wins, "draws": n}
+
+    Runs in the worker processes of evaluate_layouts. A side without a legal
+    move loses, and games longer than max_moves count as draws.
+    """
+    from Orbital_Capture_Advanced_version import EnhancedOrbitalCaptureGame
+
+    rng = random.Random(seed)
+    geometry = get_geometry(*shape)
+    game = EnhancedOrbitalCaptureGame(geometry)
+    for name, value in (settings or {}).items():
+        setattr(game, name, value)
+    results = {"player1": 0, "player2": 0, "draws": 0}
+    for _ in range(games):
+        game.reset_board()
+        game.set_special_points(points)
+        winner = None
+        for _ in range(max_moves):
+            moves = game.get_all_valid_moves()
+            if not moves:
+                winner = 2 if game.current_player == 1 else 1
+                break
+            if policy == "greedy":
+                move = _choose_greedy(game, moves, rng)
+            else:
+                move = rng.choice(moves)
+            victory = game.move(*move)["victory"]
+            if victory:
+                winner = victory["winner"]
+                break
+        if winner == 1:
+            results["player1"] += 1
+        elif winner == 2:
+            results["player2"] += 1
+        else:
+            results["draws"] += 1
+    return results
+
+
+def evaluate_layouts(layouts, geometry=DEFAULT_GEOMETRY, games=1000, seed=0, max_moves=200,
+                     policy="random", settings=None, workers=None, chunk_size=250):
+    """Play games on every layout in a process pool and rank them by fairness
+
+    layouts is a list of (layout_seed, points) pairs as returned by
+    generate_layouts. Each entry of the result reports the win counts, the
+    first-player bias (player 1 win rate minus player 2 win rate) with its
+    standard error, and results are sorted with the fairest layout first.
+    """
+    tasks = []
+    for index, (layout_seed, points) in enumerate(layouts):
+        for start in range(0, games, chunk_size):
+            tasks.append((index, points, min(chunk_size, games - start), seed + index * games + start))
+
+    # Imported here: the game module needs this one at startup, the pool only ranking does
+    from concurrent.futures import ProcessPoolExecutor
+
+    totals = [{"player1": 0, "player2": 0, "draws": 0} for _ in layouts]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [(index, executor.submit(play_games, points, geometry.shape, count, task_seed,
+                                           max_moves, policy, settings))
+                   for index, points, count, task_seed in tasks]
+        for index, future in futures:
+            for name, value in future.result().items():
+                totals[index][name] += value
+
+    report = []
+    for (layout_seed, points), total in zip(layouts, totals):
+        played = max(1, sum(total.values()))
+        player1_rate = total["player1"] / played
+        player2_rate = total["player2"] / played
+        bias = player1_rate - player2_rate
+        # Standard error of the difference of two multinomial proportions
+        variance = (player1_rate + player2_rate - bias * bias) / played
+        report.append({
+            "seed": layout_seed,
+            "points": points,
+            "games": played,
+            "player1_wins": total["player1"],
+            "player2_wins": total["player2"],
+            "draws": total["draws"],
+            "first_player_bias": bias,
+            "standard_error": math.sqrt(max(0.0, variance)),
+        })
+    report.sort(key=lambda row: abs(row["first_player_bias"]))
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate special point layouts and rank them by fairness")
+    parser.add_argument("--layouts", type=int, default=20, help="Candidate layouts to generate")
+    parser.add_argument("--games", type=int, default=1000, help="Games per layout")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--board", type=int, nargs=2, default=[4, 8], metavar=("RINGS", "SPOKES"))
+    parser.add_argument("--policy", choices=["random", "greedy"], default="random",
+                        help="How both sides pick moves")
+    parser.add_argument("--max-moves", type=int, default=200)
+    parser.add_argument("--asymmetric", action="store_true", help="Do not mirror points to the opposite spoke")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--top", type=int, default=10, help="Layouts to print")
+    args = parser.parse_args(argv)
+
+    geometry = get_geometry(*args.board)
+    layouts = generate_layouts(args.layouts, args.seed, geometry, symmetric=not args.asymmetric)
+    # The default layout is always included as a reference
+    layouts.insert(0, ("default", geometry.default_special_points()))
+
+    start = time.perf_counter()
+    report = evaluate_layouts(layouts, geometry, args.games, args.seed, args.max_moves,
+                              args.policy, workers=args.workers)
+    elapsed = time.perf_counter() - start
+    total_games = sum(row["games"] for row in report)
+    print(f"{total_games} games on {len(layouts)} layouts in {elapsed:.1f}s "
+          f"({total_games / elapsed:.0f} games/s, {args.workers} workers)")
+    for rank, row in enumerate(report[:args.top], 1):
+        print(f"{rank:3}. seed {row['seed']!s:>7}: bias {row['first_player_bias']:+.3f} "
+              f"± {row['standard_error']:.3f}  (P1 {row['player1_wins']}, P2 {row['player2_wins']}, "
+              f"draws {row['draws']})  {' '.join(f'{t[0]}{r}.{s}' for r, s, t in row['points'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+import argparse
+import json
+import random
+import time
+
+import numpy as np
+
+from orbital_eval import stack_positions
+from orbital_geometry import DEFAULT_GEOMETRY, get_geometry
+
+MODEL_FORMAT = 1
+
+# Search scores are value * VALUE_SCALE, well inside the WIN_SCORE range
+VALUE_SCALE = 1000
+
+# Scalar features after the four board planes: reserves and inner pieces, mine then theirs
+SCALAR_FEATURES = 4
+
+
+def position_features(occupancy, energy, reserves, inner_counts, side_to_move):
+    """Model input rows for the arrays of orbital_eval.stack_positions
+
+    Everything is seen from the side to move: planes of its pieces, the
+    opponent's pieces and both sides' piece energies, then scaled reserves
+    and inner-circle counts. Returns float32 of shape (N, 4 * cells + 4).
+    """
+    count = len(occupancy)
+    occupancy = np.asarray(occupancy).reshape(count, -1)
+    energy = np.minimum(np.asarray(energy).reshape(count, -1), 16) / 16
+    side_to_move = np.asarray(side_to_move).reshape(count, 1)
+    mine = occupancy == side_to_move
+    theirs = (occupancy != 0) & ~mine
+    reserves = np.asarray(reserves, dtype=np.float32)
+    inner_counts = np.asarray(inner_counts, dtype=np.float32)
+    player2 = side_to_move[:, 0] == 2
+    my_reserve = np.where(player2, reserves[:, 1], reserves[:, 0])
+    their_reserve = np.where(player2, reserves[:, 0], reserves[:, 1])
+    my_inner = np.where(player2, inner_counts[:, 1], inner_counts[:, 0])
+    their_inner = np.where(player2, inner_counts[:, 0], inner_counts[:, 1])
+    scalars = np.stack([np.minimum(my_reserve, 128) / 32, np.minimum(their_reserve, 128) / 32,
+                        my_inner / 4, their_inner / 4], axis=1)
+    return np.concatenate([mine, theirs, energy * mine, energy * theirs, scalars], axis=1).astype(np.float32)
+
+
+class ValueModel:
+    """Value and policy model in plain NumPy: linear, or one ReLU hidden layer
+
+    One output layer produces every head at once: column 0 is the value
+    (tanh, from the side to move's view) and the next two groups of `cells`
+    columns are logits for the from and to cells of the best move. A linear
+    model scores a whole batch with a single matrix multiply.
+    """
+
+    def __init__(self, geometry=DEFAULT_GEOMETRY, hidden=0, seed=0):
+        self.geometry = geometry
+        self.hidden = hidden
+        inputs = 4 * geometry.cells + SCALAR_FEATURES
+        outputs = 1 + 2 * geometry.cells
+        rng = np.random.default_rng(seed)
+        self.params = {}
+        if hidden:
+            self.params["w1"] = (rng.standard_normal((inputs, hidden)) * np.sqrt(2 / inputs)).astype(np.float32)
+            self.params["b1"] = np.zeros(hidden, dtype=np.float32)
+            inputs = hidden
+        self.params["w"] = (rng.standard_normal((inputs, outputs)) * np.sqrt(1 / inputs)).astype(np.float32)
+        self.params["b"] = np.zeros(outputs, dtype=np.float32)
+
+    def forward(self, features):
+        """Raw outputs and the last hidden activations (the features for a linear model)"""
+        hidden = features
+        if self.hidden:
+            hidden = np.maximum(features @ self.params["w1"] + self.params["b1"], 0)
+        return hidden @ self.params["w"] + self.params["b"], hidden
+
+    def predict(self, features):
+        """Values in [-1, 1] and (from_logits, to_logits) for a batch of feature rows"""
+        outputs, _ = self.forward(features)
+        cells = self.geometry.cells
+        return np.tanh(outputs[:, 0]), (outputs[:, 1:1 + cells], outputs[:, 1 + cells:])
+
+    def evaluate_games(self, games):
+        """Values of a list of games, each from its own side to move's view"""
+        if not games:
+            return np.zeros(0, dtype=np.float32)
+        return self.predict(position_features(*stack_positions(games)))[0]
+
+    def scores(self, games):
+        """Search scores of a list of games, each for its own side to move"""
+        return [int(value * VALUE_SCALE) for value in self.evaluate_games(games)]
+
+    def evaluate(self, game):
+        """Search score of one game for the side to move"""
+        return self.scores([game])[0]
+
+    def save(self, path):
+        meta = {"format": MODEL_FORMAT, "board": list(self.geometry.shape), "hidden": self.hidden}
+        with open(path, "wb") as output:
+            np.savez(output, meta=np.array(json.dumps(meta)), **self.params)
+
+
+def load_model(path):
+    """Load a ValueModel written by ValueModel.save"""
+    with np.load(path) as data:
+        meta = json.loads(str(data["meta"]))
+        if meta.get("format") != MODEL_FORMAT:
+            raise ValueError(f"{path} is not a model this version can read")
+        model = ValueModel(get_geometry(*meta["board"]), meta["hidden"])
+        for name in model.params:
+            model.params[name] = data[name].astype(np.float32)
+    return model
+
+
+class Trainer:
+    """Adam training of a ValueModel on rows of an orbital_db.PositionDatabase
+
+    The value target mixes the game outcome with the squashed search score
+    (outcome_weight sets the mix); the policy heads learn the from and to
+    cells of the search's best move with cross-entropy.
+    """
+
+    def __init__(self, model, learning_rate=1e-3, outcome_weight=0.5, policy_weight=0.5,
+                 weight_decay=1e-5):
+        self.model = model
+        self.learning_rate = learning_rate
+        self.outcome_weight = outcome_weight
+        self.policy_weight = policy_weight
+        self.weight_decay = weight_decay
+        self.moments = {name: (np.zeros_like(value), np.zeros_like(value))
+                        for name, value in model.params.items()}
+        self.steps = 0
+
+    def batch(self, database, indices):
+        """Features and targets for some database rows"""
+        rows = database.rows_at(np.sort(indices))
+        features = position_features(*database.evaluation_arrays(rows))
+        targets = (self.outcome_weight * rows["outcome"] +
+                   (1 - self.outcome_weight) * np.tanh(rows["score"] / VALUE_SCALE)).astype(np.float32)
+        return features, targets, rows["move"][:, 0].astype(np.int64), rows["move"][:, 1].astype(np.int64)
+
+    def losses(self, features, targets, from_cells, to_cells):
+        """Value mean squared error and policy cross-entropy, without updating"""
+        values, (from_logits, to_logits) = self.model.predict(features)
+        return (float(np.mean((values - targets) ** 2)),
+                float(np.mean(_cross_entropy(from_logits, from_cells) + _cross_entropy(to_logits, to_cells))))
+
+    def step(self, features, targets, from_cells, to_cells):
+        """One Adam update on a batch"""
+        model = self.model
+        params = model.params
+        cells = model.geometry.cells
+        count = len(features)
+        outputs, hidden = model.forward(features)
+
+        gradient = np.empty_like(outputs)
+        values = np.tanh(outputs[:, 0])
+        gradient[:, 0] = 2 * (values - targets) * (1 - values * values) / count
+        for start, cells_target in ((1, from_cells), (1 + cells, to_cells)):
+            probabilities = _softmax(outputs[:, start:start + cells])
+            probabilities[np.arange(count), cells_target] -= 1
+            gradient[:, start:start + cells] = self.policy_weight * probabilities / count
+
+        grads = {"w": hidden.T @ gradient, "b": gradient.sum(axis=0)}
+        if model.hidden:
+            back = (gradient @ params["w"].T) * (hidden > 0)
+            grads["w1"] = features.T @ back
+            grads["b1"] = back.sum(axis=0)
+
+        self.steps += 1
+        beta1, beta2 = 0.9, 0.999
+        for name, grad in grads.items():
+            grad = grad + self.weight_decay * params[name]
+            first, second = self.moments[name]
+            first *= beta1
+            first += (1 - beta1) * grad
+            second *= beta2
+            second += (1 - beta2) * grad * grad
+            corrected_first = first / (1 - beta1 ** self.steps)
+            corrected_second = second / (1 - beta2 ** self.steps)
+            params[name] -= (self.learning_rate * corrected_first /
+                             (np.sqrt(corrected_second) + 1e-8)).astype(np.float32)
+
+
+def _softmax(logits):
+    exponentials = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return exponentials / exponentials.sum(axis=1, keepdims=True)
+
+
+def _cross_entropy(logits, targets):
+    shifted = logits - logits.max(axis=1, keepdims=True)
+    log_sum = np.log(np.exp(shifted).sum(axis=1))
+    return log_sum - shifted[np.arange(len(logits)), targets]
+
+
+def train(database, hidden=0, epochs=10, batch_size=256, learning_rate=1e-3, validation_fraction=0.1,
+          seed=0, callback=None, **options):
+    """Train a model on a position database; games are split between training and validation"""
+    rng = np.random.default_rng(seed)
+    model = ValueModel(database.geometry, hidden, seed)
+    trainer = Trainer(model, learning_rate, **options)
+
+    games = np.asarray(database.columns["game"][:, 0])
+    validation_games = rng.random(games.max() + 1 if len(games) else 0) < validation_fraction
+    validation = np.flatnonzero(validation_games[games])
+    training = np.flatnonzero(~validation_games[games])
+    validation_batch = trainer.batch(database, validation[:4096]) if len(validation) else None
+
+    for epoch in range(epochs):
+        order = rng.permutation(training)
+        for start in range(0, len(order), batch_size):
+            trainer.step(*trainer.batch(database, order[start:start + batch_size]))
+        if callback is not None:
+            report = {"epoch": epoch + 1}
+            if validation_batch is not None:
+                report["value_mse"], report["policy_loss"] = trainer.losses(*validation_batch)
+            callback(report)
+    return model
+
+
+def benchmark(model, positions=512, playouts_per_position=1, max_moves=100, seed=0):
+    """Microseconds per position: one batched model call versus random playouts"""
+    from Orbital_Capture_Advanced_version import EnhancedOrbitalCaptureGame
+
+    rng = random.Random(seed)
+    games = []
+    game = EnhancedOrbitalCaptureGame(model.geometry)
+    while len(games) < positions:
+        moves = game.get_all_valid_moves()
+        if not moves or game.move(*rng.choice(moves))["victory"]:
+            game = EnhancedOrbitalCaptureGame(model.geometry)
+            continue
+        games.append(game.copy())
+
+    start = time.perf_counter()
+    model.evaluate_games(games)
+    model_us = (time.perf_counter() - start) * 1e6 / positions
+
+    sample = games[:max(1, positions // 8)]
+    start = time.perf_counter()
+    for position in sample:
+        for _ in range(playouts_per_position):
+            playout = position.copy()
+            for _ in range(max_moves):
+                moves = playout.get_all_valid_moves()
+                if not moves or playout.move(*rng.choice(moves))["victory"]:
+                    break
+    playout_us = (time.perf_counter() - start) * 1e6 / len(sample)
+    return {"model_us_per_position": model_us, "playout_us_per_position": playout_us,
+            "speedup": playout_us / model_us}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train or benchmark the NumPy value/policy model")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    train_parser = commands.add_parser("train", help="Train on an orbital_db position database")
+    train_parser.add_argument("database")
+    train_parser.add_argument("output", help="Model file (.npz)")
+    train_parser.add_argument("--hidden", type=int, default=0, help="Hidden units; 0 trains a linear model")
+    train_parser.add_argument("--epochs", type=int, default=10)
+    train_parser.add_argument("--batch-size", type=int, default=256)
+    train_parser.add_argument("--learning-rate", type=float, default=1e-3)
+    train_parser.add_argument("--outcome-weight", type=float, default=0.5,
+                              help="Share of the game outcome in the value target (the rest is the search score)")
+    train_parser.add_argument("--seed", type=int, default=0)
+
+    bench_parser = commands.add_parser("bench", help="Compare batched model calls with random playouts")
+    bench_parser.add_argument("model", nargs="?", help="Model file; an untrained linear model by default")
+    bench_parser.add_argument("--positions", type=int, default=512)
+
+    args = parser.parse_args(argv)
+    if args.command == "train":
+        from orbital_db import PositionDatabase
+
+        database = PositionDatabase(args.database)
+        start = time.perf_counter()
+
+        def report(entry):
+            losses = "  ".join(f"{name} {value:.4f}" for name, value in entry.items() if name != "epoch")
+            print(f"epoch {entry['epoch']:3}  {losses}  ({time.perf_counter() - start:.1f}s)", flush=True)
+
+        model = train(database, args.hidden, args.epochs, args.batch_size, args.learning_rate,
+                      seed=args.seed, callback=report, outcome_weight=args.outcome_weight)
+        model.save(args.output)
+        print(f"Saved {args.output}")
+    else:
+        model = load_model(args.model) if args.model else ValueModel()
+        result = benchmark(model, args.positions)
+        print(f"model {result['model_us_per_position']:.1f} us/position, random playout "
+              f"{result['playout_us_per_position']:.0f} us/position ({result['speedup']:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
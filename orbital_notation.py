@@ -0,0 +1,283 @@
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from Orbital_Capture_Advanced_version import EnhancedOrbitalCaptureGame
+from orbital_geometry import get_geometry
+
+# One-line position notation, fields separated by single spaces:
+#
+#   board side reserves inner rules thresholds layout
+#
+# board       rings from the centre outwards, separated by "/"; in each ring,
+#             spoke by spoke, "x" is a player 1 piece, "o" a player 2 piece,
+#             "." an empty intersection and a number a run of empty ones.
+#             "[n]" after a piece or "." gives its energy (0 when left out)
+# side        1 or 2, the player to move
+# reserves    player 1 and player 2 reserve energy, "12,3"
+# inner       player 1 and player 2 inner-circle counts, "1,0"
+# rules       "j" jumps, "n" nimber moves, "e" energy collection, "-" for none
+# thresholds  inner-circle and energy win thresholds, "3,12"
+# layout      "default", "-" for no special points, or points as
+#             <type initial><ring>.<spoke> joined by ",", e.g. "p0.0,p0.4,j1.2"
+#
+# The start position of the standard board is
+#   8/8/8/xoxoxoxo 1 0,0 0,0 jne 3,12 default
+
+PIECE_CHARACTERS = {1: "x", 2: "o"}
+PIECE_PLAYERS = {"x": 1, "o": 2, ".": 0}
+POINT_TYPES = {"p": "power", "j": "jump", "s": "shield"}
+RULE_FLAGS = (("j", "allow_jumps"), ("n", "allow_nimber"), ("e", "energy_collection"))
+
+_CELL_PATTERN = re.compile(r"(\d+)|([xo.])(?:\[(\d+)\])?")
+
+# Largest energy, reserve, count or threshold accepted; anything bigger is
+# a typo or hostile input, and would overflow the game's integer arrays
+MAX_NUMBER = 10 ** 9
+# Largest run of empty intersections (no board has more than 256, see orbital_geometry)
+MAX_RUN = 256
+
+_templates = {}
+
+
+def to_notation(game):
+    """Serialize a complete game state to one line of text"""
+    geometry = game.geometry
+    board = game.board.tolist()
+    energy = game.piece_values.tolist()
+    rings = []
+    for ring in range(geometry.rings):
+        parts = []
+        empty = 0
+        for spoke in range(geometry.spokes):
+            player = board[ring][spoke]
+            value = energy[ring][spoke]
+            if player == 0 and value == 0:
+                empty += 1
+                continue
+            if empty:
+                parts.append(str(empty))
+                empty = 0
+            parts.append(PIECE_CHARACTERS.get(player, "."))
+            if value:
+                parts.append(f"[{value}]")
+        if empty:
+            parts.append(str(empty))
+        rings.append("".join(parts))
+
+    rules = "".join(flag for flag, name in RULE_FLAGS if getattr(game, name)) or "-"
+    points = tuple(tuple(point) for point in game.special_points)
+    if points == geometry.default_special_points():
+        layout = "default"
+    elif not points:
+        layout = "-"
+    else:
+        layout = ",".join(f"{kind[0]}{ring}.{spoke}" for ring, spoke, kind in points)
+    return (f"{'/'.join(rings)} {game.current_player} {game.player1_energy},{game.player2_energy} "
+            f"{game.player1_inner_pieces},{game.player2_inner_pieces} {rules} "
+            f"{game.inner_circle_threshold},{game.energy_threshold} {layout}")
+
+
+def _number(text, field, limit=MAX_NUMBER):
+    value = int(text)
+    if value > limit:
+        raise ValueError(f"{field} value {text} is larger than {limit}")
+    return value
+
+
+def _pair(text, field):
+    first, separator, second = text.partition(",")
+    if not separator or not first.isdigit() or not second.isdigit():
+        raise ValueError(f"Bad {field} field {text!r}: expected two numbers like 3,12")
+    return _number(first, field), _number(second, field)
+
+
+def from_notation(text, game=None):
+    """Parse a notation line into a game (a new EnhancedOrbitalCaptureGame unless one is given)"""
+    fields = text.split()
+    if len(fields) != 7:
+        raise ValueError(f"Expected 7 fields, got {len(fields)}")
+    board_text, side, reserves, inner, rules, thresholds, layout = fields
+
+    cells = []
+    for ring_text in board_text.split("/"):
+        ring = []
+        position = 0
+        while position < len(ring_text):
+            match = _CELL_PATTERN.match(ring_text, position)
+            if match is None:
+                raise ValueError(f"Bad board text at {ring_text[position:]!r}")
+            run, piece, value = match.groups()
+            if run:
+                ring.extend([(0, 0)] * _number(run, "Empty run", MAX_RUN))
+            else:
+                ring.append((PIECE_PLAYERS[piece], _number(value or "0", "Energy")))
+            if len(ring) > MAX_RUN:
+                raise ValueError(f"A ring has more than {MAX_RUN} intersections")
+            position = match.end()
+        cells.append(ring)
+    spokes = len(cells[0])
+    if not spokes:
+        raise ValueError("The board has no intersections")
+    if any(len(ring) != spokes for ring in cells):
+        raise ValueError("Every ring must have the same number of spokes")
+    geometry = get_geometry(len(cells), spokes)
+
+    if side not in ("1", "2"):
+        raise ValueError(f"Bad side to move {side!r}")
+    unknown = set(rules) - {flag for flag, _ in RULE_FLAGS} - {"-"}
+    if unknown:
+        raise ValueError(f"Unknown rule flags {''.join(sorted(unknown))!r}")
+
+    if layout == "default":
+        points = geometry.default_special_points()
+    elif layout == "-":
+        points = ()
+    else:
+        points = []
+        for point in layout.split(","):
+            ring, dot, spoke = point[1:].partition(".")
+            if point[:1] not in POINT_TYPES or not dot or not ring.isdigit() or not spoke.isdigit():
+                raise ValueError(f"Bad special point {point!r}")
+            if int(ring) >= geometry.rings or int(spoke) >= geometry.spokes:
+                raise ValueError(f"Special point {point!r} is off the board")
+            points.append((int(ring), int(spoke), POINT_TYPES[point[0]]))
+
+    if game is None:
+        # Copying a fresh game per board shape is cheaper than constructing one
+        template = _templates.get(geometry.shape)
+        if template is None:
+            template = _templates[geometry.shape] = EnhancedOrbitalCaptureGame(geometry)
+        game = template.copy()
+    elif game.geometry != geometry:
+        game.geometry = geometry
+    game.board = np.array([[player for player, _ in ring] for ring in cells], dtype=int)
+    game.piece_values = np.array([[value for _, value in ring] for ring in cells], dtype=int)
+    game.current_player = int(side)
+    game.player1_energy, game.player2_energy = _pair(reserves, "reserves")
+    game.player1_inner_pieces, game.player2_inner_pieces = _pair(inner, "inner")
+    game.inner_circle_threshold, game.energy_threshold = _pair(thresholds, "thresholds")
+    game.player1_pieces = int((game.board == 1).sum())
+    game.player2_pieces = int((game.board == 2).sum())
+    for flag, name in RULE_FLAGS:
+        setattr(game, name, flag in rules)
+    game.set_special_points(points)
+    game._legal = None
+    return game
+
+
+_worker_engine = None
+
+
+def analyze_line(line_number, text, depth, time_limit):
+    """Analyze one notation line (runs in the worker processes of analyze_stream)"""
+    global _worker_engine
+    from orbital_search import SearchEngine
+
+    if _worker_engine is None:
+        _worker_engine = SearchEngine(tt_size_bits=16)
+    try:
+        game = from_notation(text)
+    except ValueError as error:
+        return {"line": line_number, "position": text, "error": str(error)}
+    _worker_engine.tt.clear()
+    try:
+        result = _worker_engine.search(game, depth, time_limit)
+    except Exception as error:
+        # One bad position must not end the whole stream
+        return {"line": line_number, "position": text, "error": f"{type(error).__name__}: {error}"}
+    return {"line": line_number, "position": text,
+            "best_move": list(result.best_move) if result.best_move else None,
+            "score": result.score, "depth": result.depth, "pv": [list(move) for move in result.pv],
+            "nodes": result.nodes, "time": round(result.elapsed, 4)}
+
+
+def analyze_stream(lines, output, depth=4, time_limit=None, workers=None, ordered=False):
+    """Analyze notation lines in a process pool, writing a JSON line per position as it finishes
+
+    Lines are read lazily and at most a few tasks per worker are in flight,
+    so arbitrarily long inputs (or a pipe) use constant memory. Blank lines
+    and lines starting with "#" are skipped. With ordered the results come
+    out in input order. Returns the number of positions analyzed.
+    """
+    workers = workers or os.cpu_count()
+    max_pending = 4 * workers
+    pending = set()
+    submitted = deque()  # Line numbers in input order, for ordered output
+    finished = {}
+    written = 0
+
+    def collect(done):
+        nonlocal written
+        for future in done:
+            result = future.result()
+            if ordered:
+                finished[result["line"]] = result
+            else:
+                output.write(json.dumps(result) + "\n")
+                written += 1
+        while submitted and submitted[0] in finished:
+            output.write(json.dumps(finished.pop(submitted.popleft())) + "\n")
+            written += 1
+        output.flush()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for line_number, line in enumerate(lines, 1):
+            text = line.strip()
+            if not text or text.startswith("#"):
+                continue
+            pending.add(executor.submit(analyze_line, line_number, text, depth, time_limit))
+            if ordered:
+                submitted.append(line_number)
+            if len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Position notation tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    analyze_parser = commands.add_parser("analyze", help="Analyze a stream of positions, one per line")
+    analyze_parser.add_argument("input", nargs="?", default="-", help="File of notation lines, - for stdin")
+    analyze_parser.add_argument("--output", "-o", help="JSON lines output file (stdout by default)")
+    analyze_parser.add_argument("--depth", type=int, default=4)
+    analyze_parser.add_argument("--time", type=float, help="Seconds per position")
+    analyze_parser.add_argument("--workers", type=int, default=os.cpu_count())
+    analyze_parser.add_argument("--ordered", action="store_true", help="Write results in input order")
+
+    commands.add_parser("start", help="Print the start position").add_argument(
+        "--board", type=int, nargs=2, default=[4, 8], metavar=("RINGS", "SPOKES"))
+
+    args = parser.parse_args(argv)
+    if args.command == "start":
+        print(to_notation(EnhancedOrbitalCaptureGame(get_geometry(*args.board))))
+        return
+
+    source = sys.stdin if args.input == "-" else open(args.input)
+    output = open(args.output, "w") if args.output else sys.stdout
+    start = time.perf_counter()
+    try:
+        count = analyze_stream(source, output, args.depth, args.time, args.workers, args.ordered)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+    elapsed = time.perf_counter() - start
+    print(f"{count} positions in {elapsed:.1f}s ({count / max(elapsed, 1e-9):.1f}/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
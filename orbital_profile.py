@@ -0,0 +1,242 @@
+import argparse
+import atexit
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+# Engine methods timed while profiling is on
+HOOKED_METHODS = [
+    "get_valid_moves",
+    "generate_all_moves",
+    "get_all_valid_moves",
+    "check_captures",
+    "handle_special_point",
+    "apply_energy_from_position",
+    "move",
+    "check_victory",
+]
+
+# Methods whose result is a list of moves; their average length is reported
+MOVE_GENERATORS = {"get_valid_moves", "generate_all_moves", "get_all_valid_moves"}
+
+# ORBITAL_PROFILE=<file> profiles the whole process and writes the report at
+# exit: collapsed stacks for a .folded/.txt file, JSON otherwise
+PROFILE_ENV = "ORBITAL_PROFILE"
+
+
+class MethodStats:
+    __slots__ = ("calls", "total_ns", "max_ns", "moves", "samples", "seen")
+
+    def __init__(self):
+        self.calls = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.moves = 0
+        self.samples = []  # Reservoir of call durations for the percentiles
+        self.seen = 0
+
+
+class Profiler:
+    """Call counts, timings and flame-graph stacks for the hooked methods
+
+    Timing wrappers are only installed while a profiler is active; when
+    profiling is off the game class holds its original methods and pays
+    nothing. Durations of each method are kept in a bounded reservoir
+    sample, so percentiles stay cheap on long self-play jobs.
+    """
+
+    def __init__(self, max_samples=100000, seed=0):
+        self.max_samples = max_samples
+        self.stats = {}
+        self.stacks = {}  # Tuple of method names -> self time in ns
+        self.local = threading.local()
+        self.rng = random.Random(seed)
+        self.started = time.perf_counter()
+
+    def wrap(self, name, function):
+        """Return a timing wrapper for one method"""
+        stats = self.stats.setdefault(name, MethodStats())
+        counts_moves = name in MOVE_GENERATORS
+        local = self.local
+        stacks = self.stacks
+        perf_counter_ns = time.perf_counter_ns
+
+        def timed(*args, **kwargs):
+            frames = local.__dict__.get("frames")
+            if frames is None:
+                frames = local.frames = []
+            frame = [name, 0]  # Method name, time spent in hooked callees
+            frames.append(frame)
+            start = perf_counter_ns()
+            try:
+                result = function(*args, **kwargs)
+            finally:
+                elapsed = perf_counter_ns() - start
+                frames.pop()
+                if frames:
+                    frames[-1][1] += elapsed
+                path = tuple(entry[0] for entry in frames) + (name,)
+                stacks[path] = stacks.get(path, 0) + elapsed - frame[1]
+                self.record(stats, elapsed)
+            if counts_moves:
+                stats.moves += len(result)
+            return result
+
+        timed.__name__ = function.__name__
+        timed.__doc__ = function.__doc__
+        timed.__wrapped__ = function
+        return timed
+
+    def record(self, stats, elapsed):
+        stats.calls += 1
+        stats.total_ns += elapsed
+        if elapsed > stats.max_ns:
+            stats.max_ns = elapsed
+        stats.seen += 1
+        if len(stats.samples) < self.max_samples:
+            stats.samples.append(elapsed)
+        else:
+            index = self.rng.randrange(stats.seen)
+            if index < self.max_samples:
+                stats.samples[index] = elapsed
+
+    def report(self):
+        """Per-method statistics as a dictionary (times in microseconds)"""
+        methods = {}
+        for name, stats in self.stats.items():
+            if not stats.calls:
+                continue
+            samples = sorted(stats.samples)
+
+            def percentile(fraction):
+                return samples[min(len(samples) - 1, int(fraction * len(samples)))] / 1000
+
+            entry = {
+                "calls": stats.calls,
+                "total_ms": stats.total_ns / 1e6,
+                "mean_us": stats.total_ns / stats.calls / 1000,
+                "p50_us": percentile(0.5),
+                "p90_us": percentile(0.9),
+                "p99_us": percentile(0.99),
+                "max_us": stats.max_ns / 1000,
+            }
+            if name in MOVE_GENERATORS:
+                entry["moves_per_call"] = stats.moves / stats.calls
+            methods[name] = entry
+        return {"wall_time_s": time.perf_counter() - self.started, "methods": methods}
+
+    def collapsed_stacks(self):
+        """Lines of "caller;callee self_time_us", the input format of flamegraph.pl and speedscope"""
+        return [f"{';'.join(path)} {max(1, ns // 1000)}" for path, ns in sorted(self.stacks.items())]
+
+    def write(self, path):
+        """Write the report: collapsed stacks for .folded/.txt files, JSON otherwise"""
+        with open(path, "w") as output:
+            if path.endswith((".folded", ".txt")):
+                output.write("\n".join(self.collapsed_stacks()) + "\n")
+            else:
+                json.dump(self.report(), output, indent=2)
+
+    def format_table(self):
+        """Human-readable summary, slowest methods first"""
+        methods = self.report()["methods"]
+        lines = [f"{'method':28} {'calls':>10} {'total ms':>10} {'mean us':>9} {'p50 us':>8} "
+                 f"{'p99 us':>8} {'moves/call':>10}"]
+        for name, entry in sorted(methods.items(), key=lambda item: -item[1]["total_ms"]):
+            moves = f"{entry['moves_per_call']:.1f}" if "moves_per_call" in entry else ""
+            lines.append(f"{name:28} {entry['calls']:10} {entry['total_ms']:10.1f} {entry['mean_us']:9.2f} "
+                         f"{entry['p50_us']:8.2f} {entry['p99_us']:8.2f} {moves:>10}")
+        return "\n".join(lines)
+
+
+_installed = {}  # Class -> {method name: original function}
+
+
+def install(cls, profiler, methods=HOOKED_METHODS):
+    """Replace the given methods of cls with timing wrappers"""
+    if cls in _installed:
+        raise RuntimeError(f"{cls.__name__} is already being profiled")
+    originals = {}
+    for name in methods:
+        function = cls.__dict__.get(name)
+        if function is not None:
+            originals[name] = function
+            setattr(cls, name, profiler.wrap(name, function))
+    _installed[cls] = originals
+
+
+def uninstall(cls):
+    """Restore the original methods of cls"""
+    for name, function in _installed.pop(cls, {}).items():
+        setattr(cls, name, function)
+
+
+@contextmanager
+def profiling(cls=None, output=None, **options):
+    """Profile the engine inside a with block and yield the Profiler
+
+    cls defaults to EnhancedOrbitalCaptureGame. With an output path the
+    report is written when the block exits.
+    """
+    if cls is None:
+        from Orbital_Capture_Advanced_version import EnhancedOrbitalCaptureGame
+        cls = EnhancedOrbitalCaptureGame
+    profiler = Profiler(**options)
+    install(cls, profiler)
+    try:
+        yield profiler
+    finally:
+        uninstall(cls)
+        if output:
+            profiler.write(output)
+
+
+def enable_from_environment(cls):
+    """Install process-wide profiling when ORBITAL_PROFILE names an output file"""
+    output = os.environ.get(PROFILE_ENV)
+    if not output or cls in _installed:
+        return None
+    profiler = Profiler()
+    install(cls, profiler)
+    atexit.register(profiler.write, output)
+    return profiler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profile engine hot paths over self-play games")
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--depth", type=int, default=2, help="Search depth of both players")
+    parser.add_argument("--max-moves", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write the JSON report here")
+    parser.add_argument("--folded", help="Write collapsed stacks for a flame graph here")
+    args = parser.parse_args(argv)
+
+    from Orbital_Capture_Advanced_version import EnhancedOrbitalCaptureGame
+    from orbital_search import SearchEngine
+
+    rng = random.Random(args.seed)
+    engine = SearchEngine(tt_size_bits=16)
+    with profiling(EnhancedOrbitalCaptureGame) as profiler:
+        for _ in range(args.games):
+            game = EnhancedOrbitalCaptureGame()
+            for _ in range(args.max_moves):
+                # A random opening move now and then keeps the games apart
+                moves = game.get_all_valid_moves()
+                if not moves:
+                    break
+                move = rng.choice(moves) if rng.random() < 0.2 else engine.search(game, args.depth).best_move
+                if game.move(*move)["victory"]:
+                    break
+    print(profiler.format_table())
+    if args.json:
+        profiler.write(args.json)
+    if args.folded:
+        profiler.write(args.folded)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+import argparse
+import random
+import time
+
+import numpy as np
+
+from orbital_search import WIN_SCORE, SearchEngine, position_hash
+
+# Proof and disproof numbers at or above this are infinite
+INFINITE = 10 ** 9
+
+# ProofResult.status values
+PROVEN = "proven"        # The side to move has a forced win
+DISPROVEN = "disproven"  # There is no forced win within the depth limit
+UNKNOWN = "unknown"      # The node budget or time ran out first
+
+# Positions where the side to move is this many moves (by race_distance)
+# from a threshold win are worth trying to prove. At 4 almost every
+# position of a game qualified (a reserve of 4 is enough), so the AI spent
+# its proof budget on nearly every move
+TACTICAL_DISTANCE = 2
+
+# The 1 + epsilon trick: a child is searched until its delta passes the
+# second-best sibling's by this fraction, so the search switches between
+# two similar children less often (each switch re-expands a position)
+EPSILON = 0.25
+
+
+class ProofBudgetExceeded(Exception):
+    """Raised inside the solver when the node budget is spent or it is told to stop"""
+
+
+class ProofResult:
+    def __init__(self, status=UNKNOWN, line=None, nodes=0, elapsed=0.0, entries=0):
+        self.status = status
+        self.line = line or []  # Main line of the proof: shortest win against the longest defence
+        self.nodes = nodes
+        self.elapsed = elapsed
+        self.entries = entries
+
+    def __repr__(self):
+        return (f"ProofResult(status={self.status}, line={self.line}, "
+                f"nodes={self.nodes}, elapsed={self.elapsed:.3f})")
+
+
+def race_distance(game, player):
+    """Fewest moves the player needs to reach the inner-circle or the energy threshold
+
+    Pieces need one move per ring to reach the centre; a jump point gives 2
+    reserve energy per move. Opposition is ignored, so this is a lower
+    bound of sorts, used to seed proof numbers.
+    """
+    inner = game.player1_inner_pieces if player == 1 else game.player2_inner_pieces
+    reserve = game.player1_energy if player == 1 else game.player2_energy
+    missing = max(game.inner_circle_threshold - inner, 0)
+    rings = np.sort(np.nonzero(game.board[1:] == player)[0]) + 1
+    inner_race = int(rings[:missing].sum()) if len(rings) >= missing else INFINITE
+    energy_race = max(1, -(-(game.energy_threshold - reserve) // 2))
+    return max(1, min(inner_race, energy_race))
+
+
+def is_tactical(game):
+    """True when the side to move is within TACTICAL_DISTANCE moves of a threshold win"""
+    return race_distance(game, game.current_player) <= TACTICAL_DISTANCE
+
+
+class ProofSolver:
+    """Depth-first proof-number search (df-pn) for forced wins of the side to move
+
+    Proof numbers suit the threshold races of check_victory: the search
+    follows the line that is cheapest to prove (or refute) instead of
+    searching every move to a fixed depth, so narrow forcing wins are
+    found at depths alpha-beta does not reach on the same node budget.
+    Both are counted the same way, one node per position made.
+
+    Entries are keyed by position, plies left and attacker (a line that
+    runs out of depth counts against the attacker, so a result only holds
+    for the player it was proved for), each holding
+    [phi, delta, work, distance] from the side to move's point of view:
+    phi is the proof number of a win for that side, delta the cost of
+    refuting it, and distance the plies to the end once solved. When the
+    table grows past max_entries the half holding the least work is
+    dropped, so memory stays bounded however long the solver runs.
+    Positions repeated on the current line, and lines longer than the
+    depth limit, count as failures for the attacker. Position keys do not
+    cover the rules, so the table is cleared whenever solve() is given a
+    game with other rules, thresholds or special points than the last one.
+    """
+
+    def __init__(self, max_entries=1 << 18, max_depth=11, max_nodes=20000):
+        self.max_entries = max_entries
+        self.max_depth = max_depth
+        self.max_nodes = max_nodes
+        self.table = {}
+        self.nodes = 0
+        self.node_limit = None
+        self.stop = None
+        self.attacker = None
+        self.rules = None  # rules_key() of the games the entries belong to
+
+    def clear(self):
+        """Remove all entries"""
+        self.table = {}
+
+    @staticmethod
+    def rules_key(game):
+        """Everything besides the position that decides a proof"""
+        return (game.geometry.shape, game.inner_circle_threshold, game.energy_threshold,
+                bool(game.allow_jumps), bool(game.allow_nimber), bool(game.energy_collection),
+                tuple(tuple(point) for point in game.special_points))
+
+    def find_win(self, game, stop=None):
+        """Winning line in a tactical position within max_nodes, otherwise None
+
+        Used by SearchEngine before its alpha-beta search; stop is a callable
+        that returns True when the caller wants the solver to give up.
+        """
+        self.nodes = 0
+        if not is_tactical(game):
+            return None
+        result = self.solve(game, stop=stop)
+        return result.line if result.status == PROVEN and result.line else None
+
+    def solve(self, game, max_nodes=None, max_depth=None, stop=None, attacker=None):
+        """Try to prove a forced win for the attacker (the side to move by default); returns a ProofResult
+
+        With the other player as attacker the question is whether every
+        move of the side to move loses, and the line starts with the
+        longest defence.
+        """
+        start_time = time.perf_counter()
+        max_depth = max_depth or self.max_depth
+        self.nodes = 0
+        self.node_limit = max_nodes or self.max_nodes
+        self.stop = stop
+        self.attacker = attacker or game.current_player
+        rules = self.rules_key(game)
+        if rules != self.rules:
+            self.clear()
+            self.rules = rules
+        root = game.copy()
+        root._legal = None
+        key = position_hash(root)
+        status = UNKNOWN
+        try:
+            self._mid(root, key, max_depth, INFINITE, INFINITE, set())
+        except ProofBudgetExceeded:
+            pass
+        nodes = self.nodes
+        entry = self.table.get((key, max_depth, self.attacker))
+        line = []
+        # entry is from the side to move's point of view
+        won, lost = (0, 1) if self.attacker == root.current_player else (1, 0)
+        if entry is not None and entry[won] == 0:
+            status = PROVEN
+            line = self.main_line(root, max_depth)
+        elif entry is not None and entry[lost] == 0:
+            status = DISPROVEN
+        return ProofResult(status, line, nodes, time.perf_counter() - start_time, len(self.table))
+
+    def _fails(self, mover):
+        """(phi, delta) of a line the attacker did not win, from the mover's point of view"""
+        return (INFINITE, 0) if mover == self.attacker else (0, INFINITE)
+
+    def _expand(self, game, depth, path):
+        """Children of a position as [move, child, key, fixed entry or None, initial entry]
+
+        Fixed entries are the children already decided without search: wins,
+        repetitions of the current line and children at the depth limit.
+        Unsearched children start from race distances instead of 1 and 1:
+        proving a win costs about the attacker's distance, refuting it about
+        the defender's.
+        """
+        unpack = game.geometry.unpack_move
+        player = game.current_player
+        opponent = 2 if player == 1 else 1
+        defender = 2 if self.attacker == 1 else 1
+        children = []
+        for move in game.generate_all_moves():
+            self.nodes += 1
+            child = game.copy()
+            victory = child.move(*unpack(move))["victory"]
+            if victory:
+                if victory["winner"] == player:
+                    fixed = [INFINITE, 0, 0, 0]  # The child's side to move has lost
+                elif victory["winner"] == opponent:
+                    fixed = [0, INFINITE, 0, 0]
+                else:
+                    fixed = list(self._fails(opponent)) + [0, 0]
+                children.append([move, None, None, fixed, None])
+                continue
+            key = position_hash(child)
+            if depth <= 1 or key in path:
+                children.append([move, child, key, list(self._fails(opponent)) + [0, 0], None])
+                continue
+            proof = race_distance(child, self.attacker)
+            disproof = race_distance(child, defender)
+            initial = (proof, disproof, 0, 0) if opponent == self.attacker else (disproof, proof, 0, 0)
+            children.append([move, child, key, None, initial])
+        return children
+
+    def _lookup(self, child, depth):
+        if child[3] is not None:
+            return child[3]
+        return self.table.get((child[2], depth, self.attacker), child[4])
+
+    def _store(self, key, depth, phi, delta, work, distance):
+        self.table[(key, depth, self.attacker)] = [phi, delta, work, distance]
+        if len(self.table) > self.max_entries:
+            self._collect_garbage()
+
+    def _collect_garbage(self):
+        """Keep the half of the table that cost the most work to compute"""
+        entries = sorted(self.table.items(), key=lambda item: item[1][2], reverse=True)
+        self.table = dict(entries[:self.max_entries // 2])
+
+    def _mid(self, game, key, depth, phi_threshold, delta_threshold, path):
+        """Search a position until its phi or delta reaches the threshold"""
+        if self.node_limit is not None and self.nodes >= self.node_limit:
+            raise ProofBudgetExceeded()
+        if self.stop is not None and self.stop():
+            raise ProofBudgetExceeded()
+
+        nodes_before = self.nodes
+        children = self._expand(game, depth, path)
+        if not children:
+            # A player who cannot move loses
+            self._store(key, depth, INFINITE, 0, 1, 0)
+            return
+
+        path.add(key)
+        while True:
+            # phi is the smallest child delta, delta the sum of child phis
+            phi = INFINITE
+            delta = 0
+            best = None
+            best_phi = 0
+            second_delta = INFINITE
+            for child in children:
+                child_phi, child_delta = self._lookup(child, depth - 1)[:2]
+                delta = min(delta + child_phi, INFINITE)
+                if child_delta < phi:
+                    second_delta = phi
+                    phi = child_delta
+                    best = child
+                    best_phi = child_phi
+                elif child_delta < second_delta:
+                    second_delta = child_delta
+            if phi >= phi_threshold or delta >= delta_threshold:
+                break
+            child_phi_threshold = min(delta_threshold - (delta - best_phi), INFINITE)
+            child_delta_threshold = min(phi_threshold, int(second_delta * (1 + EPSILON)) + 1)
+            self._mid(best[1], best[2], depth - 1, child_phi_threshold, child_delta_threshold, path)
+        path.discard(key)
+
+        distance = 0
+        if phi == 0:
+            # Won: the quickest win among the winning moves
+            distance = 1 + min(self._lookup(child, depth - 1)[3] for child in children
+                               if self._lookup(child, depth - 1)[1] == 0)
+        elif delta == 0:
+            # Lost: the longest defence
+            distance = 1 + max(self._lookup(child, depth - 1)[3] for child in children)
+        self._store(key, depth, phi, delta, self.nodes - nodes_before, distance)
+
+    def main_line(self, game, depth):
+        """Moves of a proven win: the quickest win against the longest defence"""
+        line = []
+        position = game.copy()
+        unpack = position.geometry.unpack_move
+        path = set()
+        while depth > 0:
+            key = position_hash(position)
+            entry = self.table.get((key, depth, self.attacker))
+            if entry is None or (entry[0] != 0 and entry[1] != 0):
+                break
+            path.add(key)
+            children = self._expand(position, depth, path)
+            if not children:
+                break  # The side to move cannot move and has lost
+            if entry[0] == 0:
+                winning = [child for child in children if self._lookup(child, depth - 1)[1] == 0]
+                if not winning:
+                    break  # The entry is out of date (or was dropped); return the line so far
+                choice = min(winning, key=lambda child: self._lookup(child, depth - 1)[3])
+            else:
+                choice = max(children, key=lambda child: self._lookup(child, depth - 1)[3])
+            line.append(unpack(choice[0]))
+            if choice[1] is None or choice[3] is not None:
+                break  # The game ended, or the line reached the depth limit
+            position = choice[1]
+            depth -= 1
+        return line
+
+
+def tactical_positions(count, seed=0, max_plies=80):
+    """Tactical positions from games between a shallow searcher and random moves"""
+    from Orbital_Capture_Advanced_version import EnhancedOrbitalCaptureGame
+
+    rng = random.Random(seed)
+    engine = SearchEngine(tt_size_bits=14)
+    positions = []
+    while len(positions) < count:
+        game = EnhancedOrbitalCaptureGame()
+        for _ in range(max_plies):
+            moves = game.get_all_valid_moves()
+            if not moves:
+                break
+            if is_tactical(game) and rng.random() < 0.5:
+                positions.append(game.copy())
+                break
+            move = rng.choice(moves) if rng.random() < 0.5 else engine.search(game, 1).best_move
+            if game.move(*move)["victory"]:
+                break
+    return positions
+
+
+def compare_with_alphabeta(positions, node_budget=20000, max_depth=11):
+    """Wins found by df-pn and by alpha-beta (iterative deepening) on the same node budget
+
+    Returns a summary plus one row per position; a win is an alpha-beta
+    score within 100 of WIN_SCORE or a df-pn proof.
+    """
+    solver = ProofSolver(max_depth=max_depth)
+    engine = SearchEngine(tt_size_bits=16)
+    rows = []
+    for game in positions:
+        solver.clear()
+        proof = solver.solve(game, max_nodes=node_budget)
+        engine.tt.clear()
+        start = time.perf_counter()
+        search = engine.search(game, max_depth=64, node_limit=node_budget)
+        rows.append({"proof": proof.status, "proof_line": len(proof.line), "proof_nodes": proof.nodes,
+                     "proof_time": proof.elapsed, "alphabeta_win": search.score >= WIN_SCORE - 100,
+                     "alphabeta_depth": search.depth, "alphabeta_nodes": search.nodes,
+                     "alphabeta_time": time.perf_counter() - start})
+    summary = {
+        "positions": len(rows),
+        "proven": sum(row["proof"] == PROVEN for row in rows),
+        "disproven": sum(row["proof"] == DISPROVEN for row in rows),
+        "alphabeta_wins": sum(row["alphabeta_win"] for row in rows),
+        "only_proof": sum(row["proof"] == PROVEN and not row["alphabeta_win"] for row in rows),
+        "only_alphabeta": sum(row["alphabeta_win"] and row["proof"] != PROVEN for row in rows),
+    }
+    return summary, rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare df-pn and alpha-beta on tactical positions")
+    parser.add_argument("--positions", type=int, default=30)
+    parser.add_argument("--nodes", type=int, default=20000, help="Node budget of both searches")
+    parser.add_argument("--depth", type=int, default=11, help="Depth limit of the proofs")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    summary, rows = compare_with_alphabeta(tactical_positions(args.positions, args.seed), args.nodes, args.depth)
+    for index, row in enumerate(rows):
+        print(f"{index:3} df-pn {row['proof']:9} line {row['proof_line']:2} {row['proof_nodes']:6} nodes "
+              f"{row['proof_time']:6.2f}s | alpha-beta {'win' if row['alphabeta_win'] else '-':3} "
+              f"depth {row['alphabeta_depth']:2} {row['alphabeta_nodes']:6} nodes {row['alphabeta_time']:6.2f}s")
+    print(f"{summary['proven']} of {summary['positions']} proven wins ({summary['disproven']} disproven), "
+          f"alpha-beta found {summary['alphabeta_wins']}; df-pn only: {summary['only_proof']}, "
+          f"alpha-beta only: {summary['only_alphabeta']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from orbital_db import PositionDatabase, unpack_occupancy
+from orbital_notation import from_notation, to_notation
+from orbital_proof import DISPROVEN, INFINITE, PROVEN, UNKNOWN, ProofSolver
+from orbital_symmetry import canonical_hash
+
+# Candidates: the side to move is at most this many moves (inner-circle or
+# energy race, see orbital_proof.race_distance) from a threshold win
+CANDIDATE_DISTANCE = 2
+
+# Puzzles shorter than this many plies (a win in one) are too easy to keep
+MIN_PLIES = 3
+
+# Rows read from a database per filter pass
+CHUNK_ROWS = 65536
+
+# Candidates sent to a worker per task
+TASK_POSITIONS = 16
+
+
+def race_distances(occupancy, reserves, inner, side, thresholds):
+    """Vectorized race_distance for the side to move of every row
+
+    occupancy is (N, rings, spokes); reserves and inner are (N, 2) and side
+    holds 1 or 2 per row.
+    """
+    inner_threshold, energy_threshold = thresholds
+    mover = side.astype(np.intp) - 1
+    rows = np.arange(len(side))
+    own = occupancy == side[:, None, None]
+    # Greedy: the pieces nearest the centre need one move per ring
+    missing = np.maximum(inner_threshold - inner[rows, mover].astype(np.int64), 0)
+    inner_race = np.zeros(len(side), dtype=np.int64)
+    for ring in range(1, occupancy.shape[1]):
+        taken = np.minimum(own[:, ring].sum(axis=1), missing)
+        inner_race += taken * ring
+        missing -= taken
+    inner_race[missing > 0] = INFINITE
+    energy_race = np.maximum(1, -(-(energy_threshold - reserves[rows, mover].astype(np.int64)) // 2))
+    return np.maximum(1, np.minimum(inner_race, energy_race))
+
+
+def capture_threats(occupancy, energy, reserves, side, energy_threshold, max_distance):
+    """Rows where one more piece next to an opponent piece would energy-capture it, and it would matter
+
+    The test of check_captures (neighbours' energy at least twice the
+    piece's and at least 4) with the side's strongest piece added to the
+    neighbours. A capture matters when it takes the opponent's last piece
+    or the transferred energy brings the reserve within max_distance - 1
+    moves of the energy threshold.
+    """
+    energy = energy.astype(np.int64)  # Database energies are uint8
+    own = occupancy == side[:, None, None]
+    opponent = (occupancy != 0) & ~own
+    own_energy = np.where(own, energy, 0)
+    # Sum over the 3 x 3 neighbourhood (spokes wrap, rings do not), then drop the centre
+    spokes = own_energy + np.roll(own_energy, 1, axis=2) + np.roll(own_energy, -1, axis=2)
+    around = spokes.copy()
+    around[:, 1:] += spokes[:, :-1]
+    around[:, :-1] += spokes[:, 1:]
+    around -= own_energy
+    strongest = own_energy.max(axis=(1, 2))[:, None, None]
+    threatened = opponent & (around + strongest >= np.maximum(2 * energy, 4))
+    transfer = np.where(threatened, np.maximum(1, energy // 2), 0).max(axis=(1, 2))
+    reserve = reserves[np.arange(len(side)), side.astype(np.intp) - 1].astype(np.int64)
+    near_energy_win = reserve + transfer + 2 * (max_distance - 1) >= energy_threshold
+    last_piece = opponent.sum(axis=(1, 2)) == 1
+    return threatened.any(axis=(1, 2)) & (near_energy_win | last_piece)
+
+
+def candidate_mask(occupancy, energy, reserves, inner, side, thresholds, max_distance=CANDIDATE_DISTANCE):
+    """Cheap filter over many positions: True where a forced win is worth trying to prove"""
+    near_race = race_distances(occupancy, reserves, inner, side, thresholds) <= max_distance
+    return near_race | capture_threats(occupancy, energy, reserves, side, thresholds[1], max_distance)
+
+
+def game_arrays(game):
+    """The arrays candidate_mask takes, for a single game"""
+    return (game.board[None], game.piece_values[None],
+            np.array([[game.player1_energy, game.player2_energy]]),
+            np.array([[game.player1_inner_pieces, game.player2_inner_pieces]]),
+            np.array([game.current_player]))
+
+
+def theme(game, line):
+    """How the solution wins: "inner", "energy" or "capture" """
+    position = game.copy()
+    victory = None
+    for move in line:
+        victory = position.move(*move)["victory"]
+    if victory is None:
+        return None
+    if "inner circle" in victory["reason"]:
+        return "inner"
+    if "energy" in victory["reason"]:
+        return "energy"
+    return "capture"
+
+
+def verify_puzzle(game, solver, nodes, depth, alternative_nodes, min_plies=MIN_PLIES):
+    """Return (puzzle dict, None) for a position with a unique forced win, else (None, rejection reason)
+
+    The proof deepens two plies at a time up to depth, so short wins are
+    found (and most positions refuted) before the expensive deep searches.
+    Unique means the first move of the solution is the only one: every
+    other move is disproven to the depth the win was proved at. The
+    solution is the solver's main line, the quickest win against the
+    longest defence.
+    """
+    spent = 0
+    for depth in range(1, depth + 1, 2):
+        result = solver.solve(game, max_nodes=nodes, max_depth=depth)
+        spent += result.nodes
+        if result.status != DISPROVEN:
+            break
+    if result.status != PROVEN:
+        return None, "no_win" if result.status == DISPROVEN else "budget"
+    if len(result.line) < min_plies:
+        return None, "short"
+    player = game.current_player
+    first = tuple(result.line[0])
+    for move in game.get_all_valid_moves():
+        if tuple(move) == first:
+            continue
+        child = game.copy()
+        victory = child.move(*move)["victory"]
+        if victory:
+            if victory["winner"] == player:
+                return None, "ambiguous"
+            continue
+        alternative = solver.solve(child, max_nodes=alternative_nodes, max_depth=depth - 1, attacker=player)
+        spent += alternative.nodes
+        if alternative.status == PROVEN:
+            return None, "ambiguous"
+        if alternative.status == UNKNOWN:
+            return None, "alternative_budget"
+    key = canonical_hash(game)[0]
+    return {"key": f"{key:016x}", "position": to_notation(game),
+            "solution": [list(move) for move in result.line], "plies": len(result.line),
+            "theme": theme(game, result.line), "nodes": spent}, None
+
+
+_worker = {}
+
+
+def verify_batch(source, items, settings):
+    """Verify candidates in a worker process; returns (puzzles, candidates checked, rejection counts)
+
+    source is ("db", directory), with items row indices, or ("notation",
+    path), with items (line number, text) pairs.
+    """
+    solver = _worker.get("solver")
+    if solver is None:
+        solver = _worker["solver"] = ProofSolver()
+    kind, path = source
+    puzzles = []
+    checked = 0
+    rejected = Counter()
+    for item in items:
+        if kind == "db":
+            database = _worker.get(path)
+            if database is None:
+                database = _worker[path] = PositionDatabase(path)
+            game = database.game(item)
+            origin = {"source": path, "row": int(item)}
+        else:
+            line_number, text = item
+            try:
+                game = from_notation(text)
+            except ValueError:
+                rejected["unreadable"] += 1
+                continue
+            thresholds = (game.inner_circle_threshold, game.energy_threshold)
+            if not candidate_mask(*game_arrays(game), thresholds, settings["max_distance"])[0]:
+                rejected["filtered"] += 1
+                continue
+            origin = {"source": path, "line": line_number}
+        checked += 1
+        if game.check_victory() or not game.get_all_valid_moves():
+            rejected["over"] += 1
+            continue
+        # Entries left by earlier candidates (or by positions under other
+        # rules) change which line and verdict the proof finds, so every
+        # candidate starts from an empty table
+        solver.clear()
+        puzzle, reason = verify_puzzle(game, solver, settings["nodes"], settings["depth"],
+                                       settings["alternative_nodes"], settings["min_plies"])
+        if puzzle is None:
+            rejected[reason] += 1
+        else:
+            puzzle.update(origin)
+            puzzles.append(puzzle)
+    return puzzles, checked, rejected
+
+
+def database_tasks(directory, stats, settings, chunk_rows=CHUNK_ROWS, limit=None):
+    """Filter a database chunk by chunk, yielding (source, row indices) tasks of candidates
+
+    Rows with identical positions (the same opening played again, say) are
+    only sent once.
+    """
+    database = PositionDatabase(directory)
+    rows = min(len(database), limit) if limit else len(database)
+    if not rows:
+        return
+    game = database.game(0)
+    thresholds = (game.inner_circle_threshold, game.energy_threshold)
+    seen = set()
+    for start in range(0, rows, chunk_rows):
+        indices = np.arange(start, min(start + chunk_rows, rows))
+        chunk = database.rows_at(indices)
+        occupancy = unpack_occupancy(chunk["occupancy"], database.geometry)
+        energy = chunk["energy"].reshape(occupancy.shape)
+        mask = candidate_mask(occupancy, energy, chunk["reserves"], chunk["inner"], chunk["side_to_move"],
+                              thresholds, settings["max_distance"])
+        stats["scanned"] += len(indices)
+        candidates = []
+        for index in np.nonzero(mask)[0]:
+            position = b"".join(chunk[name][index].tobytes() for name in
+                                ("occupancy", "energy", "reserves", "inner", "side_to_move", "rules"))
+            if position in seen:
+                stats["duplicate_rows"] += 1
+                continue
+            seen.add(position)
+            candidates.append(int(indices[index]))
+        for first in range(0, len(candidates), TASK_POSITIONS):
+            yield ("db", directory), candidates[first:first + TASK_POSITIONS]
+
+
+def notation_tasks(path, stats):
+    """Yield (source, (line number, text) pairs) tasks from a file of notation lines; workers filter them"""
+    with open(path) as source:
+        batch = []
+        for line_number, line in enumerate(source, 1):
+            text = line.strip()
+            if not text or text.startswith("#"):
+                continue
+            stats["scanned"] += 1
+            batch.append((line_number, text))
+            if len(batch) == TASK_POSITIONS:
+                yield ("notation", path), batch
+                batch = []
+        if batch:
+            yield ("notation", path), batch
+
+
+def mine_puzzles(tasks, output, settings, stats, workers=None, known=None):
+    """Verify tasks in a process pool, appending new puzzles to output as JSON lines
+
+    Tasks are drawn lazily with a few per worker in flight, so the scan
+    streams through sources of any size. A puzzle whose canonical key is
+    in known (or was written earlier in the run) is a duplicate up to the
+    board's symmetries and is skipped. Returns the number written.
+    """
+    workers = workers or os.cpu_count()
+    max_pending = 4 * workers
+    known = set() if known is None else known
+    pending = set()
+    written = 0
+
+    def collect(done):
+        nonlocal written
+        for future in done:
+            puzzles, checked, rejected = future.result()
+            stats["candidates"] += checked
+            stats["rejected"].update(rejected)
+            stats["verified"] += len(puzzles)
+            for puzzle in puzzles:
+                if puzzle["key"] in known:
+                    stats["duplicate_puzzles"] += 1
+                    continue
+                known.add(puzzle["key"])
+                output.write(json.dumps(puzzle) + "\n")
+                written += 1
+        output.flush()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for source, items in tasks:
+            pending.add(executor.submit(verify_batch, source, items, settings))
+            if len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+    return written
+
+
+def read_keys(path):
+    """Canonical keys of the puzzles already in an output file"""
+    keys = set()
+    if os.path.exists(path):
+        with open(path) as puzzles:
+            for line in puzzles:
+                if line.strip():
+                    keys.add(json.loads(line)["key"])
+    return keys
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mine forced-win puzzles from self-play databases")
+    parser.add_argument("--db", action="append", default=[], help="Position database directory (repeatable)")
+    parser.add_argument("--notation", action="append", default=[], help="File of notation lines (repeatable)")
+    parser.add_argument("--output", "-o", required=True, help="JSON lines file; new puzzles are appended")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--nodes", type=int, default=20000, help="Node budget of the proof")
+    parser.add_argument("--alternative-nodes", type=int, default=5000,
+                        help="Node budget for refuting each other first move")
+    parser.add_argument("--depth", type=int, default=7, help="Longest solution in plies")
+    parser.add_argument("--min-plies", type=int, default=MIN_PLIES)
+    parser.add_argument("--distance", type=int, default=CANDIDATE_DISTANCE,
+                        help="Largest race distance of a candidate")
+    parser.add_argument("--limit", type=int, help="Rows to scan per database")
+    args = parser.parse_args(argv)
+    if not args.db and not args.notation:
+        parser.error("give at least one --db or --notation source")
+
+    settings = {"nodes": args.nodes, "alternative_nodes": args.alternative_nodes, "depth": args.depth,
+                "min_plies": args.min_plies, "max_distance": args.distance}
+    stats = Counter(rejected=Counter())
+
+    def tasks():
+        for directory in args.db:
+            yield from database_tasks(directory, stats, settings, limit=args.limit)
+        for path in args.notation:
+            yield from notation_tasks(path, stats)
+
+    known = read_keys(args.output)
+    start = time.perf_counter()
+    with open(args.output, "a") as output:
+        written = mine_puzzles(tasks(), output, settings, stats, args.workers, known)
+    elapsed = time.perf_counter() - start
+    rejected = ", ".join(f"{reason} {count}" for reason, count in stats["rejected"].most_common())
+    print(f"{stats['scanned']} positions scanned, {stats['candidates']} candidates, "
+          f"{stats['verified']} unique wins, {written} new puzzles "
+          f"({stats['duplicate_puzzles']} already known), {stats['duplicate_rows']} repeated rows skipped "
+          f"in {elapsed:.1f}s ({stats['scanned'] / max(elapsed, 1e-9):.0f} positions/s)", file=sys.stderr)
+    if rejected:
+        print(f"rejected: {rejected}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
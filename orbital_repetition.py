@@ -0,0 +1,97 @@
+from collections import Counter
+
+
+class RepetitionRules:
+    """When a game that keeps cycling is stopped, and how it is decided
+
+    repetitions: the game ends when a position (with the same side to move)
+        occurs this often; None never ends it on repetition.
+    max_moves: the game ends after this many plies; None for no limit.
+    adjudicate_repetitions / adjudicate_move_cap: decide the ending by
+        calculate_score() (the higher ring-weighted score wins, equal scores
+        draw) instead of calling it a draw.
+    """
+
+    def __init__(self, repetitions=3, max_moves=None, adjudicate_repetitions=False, adjudicate_move_cap=True):
+        self.repetitions = repetitions
+        self.max_moves = max_moves
+        self.adjudicate_repetitions = adjudicate_repetitions
+        self.adjudicate_move_cap = adjudicate_move_cap
+
+
+def position_key(game):
+    """Hashable key of a position: its Zobrist key, or the board and counters for the simple variant"""
+    if hasattr(game, "piece_values"):
+        # Imported here so the simple variant starts without the search module
+        from orbital_search import position_hash
+        return position_hash(game)
+    return hash((game.board.tobytes(), game.current_player,
+                 game.player1_inner_pieces, game.player2_inner_pieces))
+
+
+def adjudicate(game):
+    """Winner by calculate_score(), or None when the scores are equal"""
+    scores = game.calculate_score()
+    if scores[1] == scores[2]:
+        return None
+    return 1 if scores[1] > scores[2] else 2
+
+
+class RepetitionTracker:
+    """Hash history of the positions of one game
+
+    Set as a game's `repetition` attribute, move() pushes every new
+    position and turns the verdict into the move's result; copies of the
+    game (the search's positions) do not carry the tracker. A SearchEngine
+    given the tracker treats positions of the game so far as repetitions
+    inside its tree.
+    """
+
+    def __init__(self, rules=None, game=None):
+        self.rules = rules or RepetitionRules()
+        self.reset(game)
+
+    def reset(self, game=None):
+        """Forget the history; the game, when given, is the start position"""
+        self.keys = []
+        self.counts = Counter()
+        if game is not None:
+            self.keys.append(position_key(game))
+            self.counts[self.keys[-1]] += 1
+
+    def plies(self):
+        """Moves played since the start position"""
+        return max(len(self.keys) - 1, 0)
+
+    def count(self, game):
+        """How often the position has occurred so far"""
+        return self.counts[position_key(game)]
+
+    def push(self, game):
+        """Record the position after a move; returns a {"winner", "reason"} verdict or None
+
+        The winner is None for a draw.
+        """
+        key = position_key(game)
+        self.keys.append(key)
+        self.counts[key] += 1
+        rules = self.rules
+        if rules.repetitions and self.counts[key] >= rules.repetitions:
+            return self.verdict(game, f"Position repeated {self.counts[key]} times",
+                                rules.adjudicate_repetitions)
+        if rules.max_moves is not None and self.plies() >= rules.max_moves:
+            return self.verdict(game, f"Move limit of {rules.max_moves} reached", rules.adjudicate_move_cap)
+        return None
+
+    def pop(self):
+        """Forget the last position (after an undo)"""
+        key = self.keys.pop()
+        self.counts[key] -= 1
+        if not self.counts[key]:
+            del self.counts[key]
+
+    def verdict(self, game, reason, adjudicated):
+        winner = adjudicate(game) if adjudicated else None
+        if winner is None:
+            return {"winner": None, "reason": f"{reason}: draw"}
+        return {"winner": winner, "reason": f"{reason}: Player {winner} wins on score"}
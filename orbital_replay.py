@@ -0,0 +1,143 @@
+import argparse
+import json
+import time
+
+# Plies between stored snapshots
+DEFAULT_INTERVAL = 16
+
+# Format 2 stores the start position in orbital_notation, which spells out
+# the board size and special points; format 1 used a compact state whose
+# layout id only meant something in the process that wrote it
+REPLAY_FORMAT = 2
+
+
+class GameReplay:
+    """Move list of a game plus a full state snapshot every `interval` plies
+
+    position(ply) restores the snapshot at or before the ply and replays at
+    most interval - 1 moves, so seeking costs the same at ply 10 as at ply
+    10000. Snapshots are independent game copies; nothing recorded is ever
+    modified by seeking.
+    """
+
+    def __init__(self, start, interval=DEFAULT_INTERVAL):
+        self.interval = interval
+        self.moves = []
+        self.keyframes = [start.copy()]  # keyframes[i] is the position at ply i * interval
+
+    def __len__(self):
+        """Number of plies recorded"""
+        return len(self.moves)
+
+    def append(self, move, game=None):
+        """Record a played (from_ring, from_spoke, to_ring, to_spoke) move
+
+        game is the position after the move, when the caller has it; it is
+        only copied when this ply is due a snapshot.
+        """
+        self.moves.append(tuple(move))
+        ply = len(self.moves)
+        if ply % self.interval == 0:
+            if game is None:
+                game = self.position(ply - 1)
+                game.move(*move)
+            else:
+                game = game.copy()
+            self.keyframes.append(game)
+
+    def truncate(self, ply):
+        """Forget everything after a ply (for example after an undo)"""
+        del self.moves[ply:]
+        del self.keyframes[ply // self.interval + 1:]
+
+    def position(self, ply):
+        """Return a new game at the given ply (0 is the start, len(self) the last position)"""
+        if not 0 <= ply <= len(self.moves):
+            raise IndexError(f"ply {ply} is outside 0-{len(self.moves)}")
+        keyframe = ply // self.interval
+        game = self.keyframes[keyframe].copy()
+        game._legal = None
+        for move in self.moves[keyframe * self.interval:ply]:
+            game.move(*move)
+        return game
+
+    def to_dict(self):
+        """JSON-ready form: the start position as a notation line and the moves"""
+        from orbital_notation import to_notation
+
+        return {"format": REPLAY_FORMAT, "interval": self.interval,
+                "start": to_notation(self.keyframes[0]),
+                "moves": [list(move) for move in self.moves]}
+
+    @classmethod
+    def from_dict(cls, data, interval=None):
+        """Rebuild a replay, taking the snapshots in one pass over the moves"""
+        from orbital_notation import from_notation
+
+        if data.get("format") != REPLAY_FORMAT:
+            raise ValueError("Not a replay this version can read")
+        game = from_notation(data["start"])
+        replay = cls(game, interval or data["interval"])
+        for move in data["moves"]:
+            game.move(*move)
+            replay.append(move, game)
+        return replay
+
+    def save(self, path):
+        with open(path, "w") as output:
+            json.dump(self.to_dict(), output)
+
+    @classmethod
+    def load(cls, path, interval=None):
+        with open(path) as replay_file:
+            return cls.from_dict(json.load(replay_file), interval)
+
+
+def benchmark_seeks(plies=2000, interval=DEFAULT_INTERVAL, seeks=200, seed=0):
+    """Average seek time in a long random game: keyframes versus replaying from the start"""
+    import random
+    from Orbital_Capture_Advanced_version import EnhancedOrbitalCaptureGame
+
+    rng = random.Random(seed)
+    game = EnhancedOrbitalCaptureGame()
+    replay = GameReplay(game, interval)
+    from_start = GameReplay(game, plies + 1)
+    while len(replay) < plies:
+        # Shuffle pieces around without captures or a win, so the game lasts
+        moves = game.get_all_valid_moves()
+        rng.shuffle(moves)
+        for move in moves:
+            child = game.copy()
+            result = child.move(*move)
+            if not result["victory"] and not result["captured"]:
+                break
+        else:
+            break
+        game = child
+        replay.append(move, game)
+        from_start.append(move, game)
+
+    targets = [rng.randrange(len(replay) + 1) for _ in range(seeks)]
+    timings = {}
+    for name, source in (("keyframes", replay), ("from_start", from_start)):
+        start = time.perf_counter()
+        for ply in targets:
+            source.position(ply)
+        timings[name] = (time.perf_counter() - start) * 1000 / seeks
+    return {"plies": len(replay), "interval": interval, "keyframe_ms": timings["keyframes"],
+            "from_start_ms": timings["from_start"]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure replay seek times on a long game")
+    parser.add_argument("--plies", type=int, default=2000)
+    parser.add_argument("--interval", type=int, default=DEFAULT_INTERVAL)
+    parser.add_argument("--seeks", type=int, default=200)
+    args = parser.parse_args(argv)
+    result = benchmark_seeks(args.plies, args.interval, args.seeks)
+    print(f"{result['plies']} plies, snapshot every {result['interval']}: "
+          f"{result['keyframe_ms']:.3f} ms per seek, {result['from_start_ms']:.3f} ms replaying from the start")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,730 @@
+import threading
+import time
+import numpy as np
+from orbital_eval import evaluate_position
+
+# Scores are always from the point of view of the side to move
+WIN_SCORE = 100000
+DRAW_SCORE = 0
+INFINITY = 10 ** 9
+
+# Transposition table entry flags
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+# Energies above this value share a hash key (they are practically never reached)
+MAX_HASHED_ENERGY = 63
+
+# Share of a search's time limit the proof solver may spend before alpha-beta starts
+PROOF_TIME_SHARE = 0.25
+
+
+
+class ZobristTables:
+    """Random keys for one board shape"""
+
+    def __init__(self, rings=4, spokes=8):
+        # The standard board keeps its original seed so stored keys stay valid
+        seed = 20240521 if (rings, spokes) == (4, 8) else [20240521, rings, spokes]
+        rng = np.random.default_rng(seed)
+        self.pieces = rng.integers(1, 2 ** 63, size=(3, rings, spokes), dtype=np.uint64)
+        self.pieces[0] = 0  # Empty intersections do not change the key
+        self.energy = rng.integers(1, 2 ** 63, size=(MAX_HASHED_ENERGY + 1, rings, spokes), dtype=np.uint64)
+        self.energy[0] = 0
+        self.reserve = rng.integers(1, 2 ** 63, size=(2, MAX_HASHED_ENERGY + 1), dtype=np.uint64)
+        self.side = int(rng.integers(1, 2 ** 63, dtype=np.uint64))
+        self.rings = np.arange(rings)[:, None]
+        self.spokes = np.arange(spokes)[None, :]
+
+
+_zobrist_tables = {}
+
+
+def zobrist_tables(shape):
+    """Return the shared Zobrist tables for a (rings, spokes) board shape"""
+    tables = _zobrist_tables.get(shape)
+    if tables is None:
+        tables = _zobrist_tables[shape] = ZobristTables(*shape)
+    return tables
+
+
+_standard_tables = zobrist_tables((4, 8))
+ZOBRIST_PIECES = _standard_tables.pieces
+ZOBRIST_ENERGY = _standard_tables.energy
+ZOBRIST_RESERVE = _standard_tables.reserve
+ZOBRIST_SIDE = _standard_tables.side
+
+
+def position_hash(game):
+    """Compute a 64-bit Zobrist key for the game position"""
+    tables = zobrist_tables(game.board.shape)
+    energy = np.minimum(game.piece_values, MAX_HASHED_ENERGY)
+    key = np.bitwise_xor.reduce(tables.pieces[game.board, tables.rings, tables.spokes], axis=None)
+    key ^= np.bitwise_xor.reduce(tables.energy[energy, tables.rings, tables.spokes], axis=None)
+    key = int(key)
+    key ^= int(tables.reserve[0, min(game.player1_energy, MAX_HASHED_ENERGY)])
+    key ^= int(tables.reserve[1, min(game.player2_energy, MAX_HASHED_ENERGY)])
+    if game.current_player == 2:
+        key ^= tables.side
+    return key
+
+
+class SearchAborted(Exception):
+    """Raised inside the search when it runs out of time or is stopped"""
+    pass
+
+
+class TranspositionTable:
+    def __init__(self, size_bits=18):
+        # Fixed-size table indexed by the low bits of the key
+        self.size = 1 << size_bits
+        self.mask = self.size - 1
+        self.entries = [None] * self.size
+
+    def probe(self, key):
+        """Return (depth, flag, score, move) for the key, or None"""
+        entry = self.entries[key & self.mask]
+        if entry is not None and entry[0] == key:
+            return entry[1:]
+        return None
+
+    def store(self, key, depth, flag, score, move):
+        """Store an entry, preferring deeper results for the same position"""
+        index = key & self.mask
+        entry = self.entries[index]
+        if entry is not None and entry[0] == key and entry[1] > depth:
+            return
+        self.entries[index] = (key, depth, flag, score, move)
+
+    def clear(self):
+        """Remove all entries"""
+        self.entries = [None] * self.size
+
+
+# Move ordering categories, in the order they are tried
+ORDER_TT = "tt"
+ORDER_CAPTURE = "capture"
+ORDER_INNER = "inner"
+ORDER_KILLER = "killer"
+ORDER_HISTORY = "history"
+ORDER_CATEGORIES = [ORDER_TT, ORDER_CAPTURE, ORDER_INNER, ORDER_KILLER, ORDER_HISTORY]
+
+
+def is_capture_move(game, move):
+    """Cheaply guess whether a move captures an opponent piece next to its destination
+
+    Only for move ordering: move costs, reserve energy, energy collection
+    and special points are ignored. EnhancedOrbitalCaptureGame.move_captures
+    gives the exact answer.
+    """
+    from_ring, from_spoke, to_ring, to_spoke = move
+    player = game.current_player
+    opponent = 2 if player == 1 else 1
+    geometry = game.geometry
+    board = game.board.tolist()
+    values = game.piece_values
+
+    # Look at the position as it will be after the move
+    board[from_ring][from_spoke] = 0
+    board[to_ring][to_spoke] = player
+    moved_energy = int(values[from_ring][from_spoke]) + geometry.ring_energy[to_ring]
+
+    destination = (to_ring, to_spoke)
+    for check_ring, check_spoke in geometry.neighbours[destination] + (destination,):
+        if board[check_ring][check_spoke] != opponent:
+            continue
+
+        # Classic three-point surround
+        (left_ring, left_spoke), (right_ring, right_spoke), inner = geometry.surround_points[(check_ring, check_spoke)]
+        if (inner is not None and board[inner[0]][inner[1]] == player and
+                board[left_ring][left_spoke] == player and
+                board[right_ring][right_spoke] == player):
+            return True
+
+        # Energy-based capture
+        surrounding_energy = 0
+        for r, s in geometry.neighbours[(check_ring, check_spoke)]:
+            if board[r][s] != player:
+                continue
+            if r == to_ring and s == to_spoke:
+                surrounding_energy += moved_energy
+            else:
+                surrounding_energy += int(values[r][s])
+        if surrounding_energy >= max(4, int(values[check_ring][check_spoke]) * 2):
+            return True
+    return False
+
+
+class MoveOrderer:
+    """Orders moves for the search and keeps killer, history and cutoff statistics"""
+
+    def __init__(self, max_ply=64):
+        self.max_ply = max_ply
+        self.killers = [[None, None] for _ in range(max_ply)]
+        self.spokes = 8
+        self.history = np.zeros((32, 32), dtype=np.int64)  # [from cell][to cell]
+        self.reset_statistics()
+
+    def set_geometry(self, geometry):
+        """Size the history table for a board, dropping it if the board changed"""
+        if self.history.shape[0] != geometry.cells or self.spokes != geometry.spokes:
+            self.spokes = geometry.spokes
+            self.history = np.zeros((geometry.cells, geometry.cells), dtype=np.int64)
+            self.killers = [[None, None] for _ in range(self.max_ply)]
+
+    def reset_statistics(self):
+        """Clear the cutoff counters"""
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.cutoffs_by_category = {category: 0 for category in ORDER_CATEGORIES}
+        self.moves_searched_before_cutoff = 0
+
+    def new_search(self):
+        """Prepare for a new search: forget killers and age the history table"""
+        self.killers = [[None, None] for _ in range(self.max_ply)]
+        self.history //= 2
+
+    def order_moves(self, game, moves, tt_move, ply):
+        """Yield (move, category) for packed moves with the most promising first
+
+        Ordering is staged: the transposition-table move is tried before the
+        remaining moves are scored, so a cutoff on it skips the scoring work.
+        """
+        if tt_move in moves:
+            yield tt_move, ORDER_TT
+
+        killers = self.killers[ply] if ply < self.max_ply else [None, None]
+        unpack = game.geometry.unpack_move
+        spokes = self.spokes
+        history_table = self.history
+        scored = []
+        for move in moves:
+            if move == tt_move:
+                continue
+            from_cell = move & 0xFF
+            to_cell = move >> 8 & 0xFF
+            if is_capture_move(game, unpack(move)):
+                scored.append((2000000, move, ORDER_CAPTURE))
+            elif to_cell < spokes <= from_cell:
+                # Into the inner circle from outside it
+                scored.append((1500000, move, ORDER_INNER))
+            elif move == killers[0]:
+                scored.append((1000002, move, ORDER_KILLER))
+            elif move == killers[1]:
+                scored.append((1000001, move, ORDER_KILLER))
+            else:
+                history = int(history_table[from_cell, to_cell])
+                scored.append((min(history, 999999), move, ORDER_HISTORY))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        for _, move, category in scored:
+            yield move, category
+
+    def record_cutoff(self, move, category, move_index, depth, ply):
+        """Update killers, history and statistics after a beta cutoff"""
+        self.cutoffs += 1
+        self.cutoffs_by_category[category] += 1
+        self.moves_searched_before_cutoff += move_index + 1
+        if move_index == 0:
+            self.first_move_cutoffs += 1
+
+        # Only quiet moves become killers or earn history credit
+        if category in (ORDER_KILLER, ORDER_HISTORY):
+            if ply < self.max_ply and self.killers[ply][0] != move:
+                self.killers[ply][1] = self.killers[ply][0]
+                self.killers[ply][0] = move
+            self.history[move & 0xFF, move >> 8 & 0xFF] += depth * depth
+
+    def statistics(self):
+        """Return a dictionary describing how well the ordering worked"""
+        cutoffs = max(1, self.cutoffs)
+        return {
+            "cutoffs": self.cutoffs,
+            "first_move_cutoff_rate": self.first_move_cutoffs / cutoffs,
+            "average_moves_before_cutoff": self.moves_searched_before_cutoff / cutoffs,
+            "cutoffs_by_category": dict(self.cutoffs_by_category),
+        }
+
+
+def perft(game, depth):
+    """Count the move sequences of the given length (game-ending moves end a line early)
+
+    Used to check and time move generation: every node uses the packed
+    whole-side generator, as the search does.
+    """
+    if depth == 0:
+        return 1
+    moves = game.generate_all_moves()
+    if depth == 1:
+        return len(moves)
+    unpack = game.geometry.unpack_move
+    total = 0
+    for move in moves:
+        child = game.copy()
+        if child.move(*unpack(move))["victory"]:
+            total += 1
+        else:
+            total += perft(child, depth - 1)
+    return total
+
+
+class SearchResult:
+    def __init__(self, best_move=None, score=0, depth=0, pv=None, nodes=0, elapsed=0.0):
+        self.best_move = best_move
+        self.score = score
+        self.depth = depth
+        self.pv = pv or []
+        self.nodes = nodes
+        self.elapsed = elapsed
+        self.ordering_stats = {}
+
+    def __repr__(self):
+        return (f"SearchResult(best_move={self.best_move}, score={self.score}, "
+                f"depth={self.depth}, nodes={self.nodes})")
+
+
+class SearchEngine:
+    """Iterative deepening alpha-beta search with a persistent transposition table"""
+
+    def __init__(self, tt_size_bits=18, eval_cache=None, weights=None, value_model=None, symmetry=False):
+        self.tt = TranspositionTable(tt_size_bits)
+        self.eval_cache = eval_cache  # Optional orbital_cache.EvaluationCache for leaves and move lists
+        self.weights = weights  # Evaluation weights when there is no cache (the cache has its own)
+        self.value_model = value_model  # Optional orbital_model.ValueModel scoring the leaves instead
+        self.leaf_scores = {}  # id(child) -> model score of the leaves below the current frontier node
+        # With symmetry the TT and evaluation cache are keyed by orbital_symmetry
+        # canonical keys, so positions that are rotations or reflections of each
+        # other (under the rules and special point layout) share their entries
+        self.symmetry = symmetry
+        # Optional orbital_repetition.RepetitionTracker of the game being played:
+        # its positions count as repetitions and its rules (move cap,
+        # adjudication) apply inside the tree. Without one a position that
+        # repeats within the searched line is a draw.
+        self.repetition = None
+        self.seen = set()  # Keys of the game history and of the current line
+        self.plies_left = None
+        # Optional orbital_proof.ProofSolver: in tactical positions search()
+        # first tries to prove a forced win with it
+        self.proof_solver = None
+        self.node_limit = None
+        self.ordering = MoveOrderer()
+        self.stop_event = threading.Event()
+        self.prepared = False
+        self.nodes = 0
+        self.deadline = None
+
+    def stop(self):
+        """Ask a running search to return as soon as possible"""
+        self.stop_event.set()
+
+    def prepare(self):
+        """Clear earlier stop requests for the next search, on the caller's thread
+
+        Background searches are prepared before their thread starts: the
+        search then keeps the event as it is, so a stop() that comes before
+        the worker gets going still stops it.
+        """
+        self.stop_event.clear()
+        self.prepared = True
+
+    def _start_search(self, game, time_limit):
+        """Reset per-search state; returns the start time"""
+        if not self.prepared:
+            self.stop_event.clear()
+        self.prepared = False
+        self.nodes = 0
+        self.node_limit = None
+        self.leaf_scores = {}
+        self.ordering.set_geometry(game.geometry)
+        self.ordering.new_search()
+        self.ordering.reset_statistics()
+        start_time = time.perf_counter()
+        self.deadline = start_time + time_limit if time_limit else None
+
+        tracker = self.repetition
+        rules = tracker.rules if tracker is not None else None
+        self.seen = set(tracker.keys) if tracker is not None else set()
+        self.seen.add(position_hash(game))
+        self.detect_repetitions = rules is None or bool(rules.repetitions)
+        self.adjudicate_repetitions = rules is not None and rules.adjudicate_repetitions
+        self.plies_left = None
+        if rules is not None and rules.max_moves is not None:
+            self.plies_left = rules.max_moves - tracker.plies()
+        return start_time
+
+    def _ended_score(self, game, ply, adjudicated):
+        """Score of a position the repetition rules end: a draw or a win on calculate_score"""
+        if not adjudicated:
+            return DRAW_SCORE
+        scores = game.calculate_score()
+        if scores[1] == scores[2]:
+            return DRAW_SCORE
+        leader = 1 if scores[1] > scores[2] else 2
+        return WIN_SCORE - ply if leader == game.current_player else -(WIN_SCORE - ply)
+
+    def _keys(self, game):
+        """Return (position key, table key, symmetry into the table's frame or None)"""
+        if not self.symmetry:
+            key = position_hash(game)
+            return key, key, None
+        from orbital_symmetry import hash_with_symmetry
+        return hash_with_symmetry(game)
+
+    def _probe(self, game):
+        """TT entry of a position with its move in the position's own frame"""
+        _, tt_key, symmetry = self._keys(game)
+        entry = self.tt.probe(tt_key)
+        if entry is not None and symmetry is not None and entry[3] is not None:
+            entry = entry[:3] + (symmetry.inverse.packed_move(entry[3]),)
+        return entry
+
+    def _should_stop(self):
+        return self.stop_event.is_set() or (self.deadline is not None and time.perf_counter() > self.deadline)
+
+    def search(self, game, max_depth=4, time_limit=None, info_callback=None, node_limit=None):
+        """Search the position and return the best SearchResult found
+
+        node_limit stops the search, like time_limit, after about that many nodes.
+        """
+        start_time = self._start_search(game, time_limit)
+        self.node_limit = node_limit
+        root = game.copy()
+        result = SearchResult()
+
+        if self.proof_solver is not None:
+            stop = self._should_stop
+            if time_limit:
+                # The proof gets a share of the time; alpha-beta needs the rest
+                proof_deadline = start_time + PROOF_TIME_SHARE * time_limit
+                stop = lambda: self._should_stop() or time.perf_counter() > proof_deadline
+            line = self.proof_solver.find_win(root, stop)
+            self.nodes += self.proof_solver.nodes
+            if line:
+                result = SearchResult(line[0], WIN_SCORE - len(line), len(line), line,
+                                      self.nodes, time.perf_counter() - start_time)
+                if info_callback is not None:
+                    info_callback(result)
+                result.ordering_stats = self.ordering.statistics()
+                return result
+
+        # Reuse earlier work: a root already searched to some depth (for example
+        # while pondering) restarts iterative deepening just past that depth
+        start_depth = 1
+        entry = self._probe(root)
+        if entry is not None and entry[1] == EXACT and entry[3] is not None:
+            result = SearchResult(root.geometry.unpack_move(entry[3]), entry[2], entry[0],
+                                  self.extract_pv(root, entry[0]))
+            start_depth = min(entry[0] + 1, max_depth)
+
+        for depth in range(start_depth, max_depth + 1):
+            try:
+                score = self._negamax(root, depth, -INFINITY, INFINITY, 0)
+            except SearchAborted:
+                break
+            pv = self.extract_pv(root, depth)
+            result = SearchResult(pv[0] if pv else None, score, depth, pv,
+                                  self.nodes, time.perf_counter() - start_time)
+            if info_callback is not None:
+                info_callback(result)
+            if abs(score) >= WIN_SCORE - 100:
+                break  # A forced result was found, deeper search will not change it
+
+        result.nodes = self.nodes
+        result.elapsed = time.perf_counter() - start_time
+        result.ordering_stats = self.ordering.statistics()
+        if result.best_move is None:
+            # Not even depth 1 finished: fall back to any legal move
+            moves = root.get_all_valid_moves()
+            if moves:
+                result.best_move = moves[0]
+                result.pv = [moves[0]]
+        return result
+
+    def search_multipv(self, game, lines=3, max_depth=6, time_limit=None, info_callback=None):
+        """Search the best `lines` root moves; returns a list of SearchResult, best first
+
+        Every completed depth is passed to info_callback. Root moves are
+        searched with alpha set to the score of the current k-th best line,
+        so a move only costs a full-window search when it enters the top k.
+        """
+        start_time = self._start_search(game, time_limit)
+        root = game.copy()
+        unpack = root.geometry.unpack_move
+        root_moves = root.generate_all_moves()
+        results = []
+        for depth in range(1, max_depth + 1):
+            try:
+                scored = self._search_root_lines(root, root_moves, depth, lines)
+            except SearchAborted:
+                break
+            elapsed = time.perf_counter() - start_time
+            results = []
+            for score, move, child in scored[:lines]:
+                pv = [unpack(move)] + (self.extract_pv(child, depth - 1) if child is not None else [])
+                results.append(SearchResult(pv[0], score, depth, pv, self.nodes, elapsed))
+            # Search the best lines first at the next depth
+            best_moves = [move for _, move, _ in scored]
+            root_moves = best_moves + [move for move in root_moves if move not in best_moves]
+            if info_callback is not None:
+                info_callback(results)
+            if results and abs(results[0].score) >= WIN_SCORE - 100:
+                break
+        return results
+
+    def _search_root_lines(self, root, root_moves, depth, lines):
+        """Return (score, move, child) for the root moves in the top `lines`, best first"""
+        unpack = root.geometry.unpack_move
+        player = root.current_player
+        scored = []
+        for move in root_moves:
+            alpha = scored[lines - 1][0] if len(scored) >= lines else -INFINITY
+            child = root.copy()
+            victory = child.move(*unpack(move))["victory"]
+            if victory:
+                score = WIN_SCORE - 1 if victory["winner"] == player else -(WIN_SCORE - 1)
+                child = None
+            else:
+                score = -self._negamax(child, depth - 1, -INFINITY, -alpha, 1)
+            if score > alpha:
+                scored.append((score, move, child))
+                scored.sort(key=lambda line: line[0], reverse=True)
+                del scored[lines:]
+        return scored
+
+    def extract_pv(self, game, depth):
+        """Follow best moves through the transposition table"""
+        pv = []
+        position = game.copy()
+        for _ in range(depth):
+            entry = self._probe(position)
+            if entry is None or entry[3] is None:
+                break
+            if entry[3] not in position.generate_all_moves():
+                break
+            move = position.geometry.unpack_move(entry[3])
+            pv.append(move)
+            if position.move(*move)["victory"]:
+                break
+        return pv
+
+    def _score_leaves(self, game, ordered_moves):
+        """Play moves of a depth-1 node and score the leaves with one model call
+
+        Returns (child, victory) per move. The scores wait in leaf_scores
+        for the depth-0 calls, so the node pays the model's per-call
+        overhead (about ten times the per-position cost) once instead of
+        once per leaf.
+        """
+        unpack = game.geometry.unpack_move
+        children = []
+        for move, _ in ordered_moves:
+            child = game.copy()
+            children.append((child, child.move(*unpack(move))["victory"]))
+        leaves = [child for child, victory in children if not victory]
+        self.leaf_scores = dict(zip(map(id, leaves), self.value_model.scores(leaves)))
+        return children
+
+    def _negamax(self, game, depth, alpha, beta, ply):
+        self.nodes += 1
+        if self.nodes & 255 == 0:
+            if self.stop_event.is_set():
+                raise SearchAborted()
+            if self.deadline is not None and time.perf_counter() > self.deadline:
+                raise SearchAborted()
+            if self.node_limit is not None and self.nodes >= self.node_limit:
+                raise SearchAborted()
+
+        key, tt_key, symmetry = self._keys(game)
+        if ply:
+            # Cycles end the line before the table is consulted, since its
+            # scores do not depend on how the position was reached
+            if key in self.seen and self.detect_repetitions:
+                return self._ended_score(game, ply, self.adjudicate_repetitions)
+            if self.plies_left is not None and ply >= self.plies_left:
+                return self._ended_score(game, ply, self.repetition.rules.adjudicate_move_cap)
+        alpha_original = alpha
+        tt_move = None
+        entry = self.tt.probe(tt_key)
+        if entry is not None:
+            entry_depth, flag, entry_score, tt_move = entry
+            if symmetry is not None and tt_move is not None:
+                tt_move = symmetry.inverse.packed_move(tt_move)
+            if entry_depth >= depth and ply > 0:
+                if flag == EXACT:
+                    return entry_score
+                if flag == LOWER_BOUND and entry_score >= beta:
+                    return entry_score
+                if flag == UPPER_BOUND and entry_score <= alpha:
+                    return entry_score
+
+        cache = self.eval_cache
+        if depth == 0:
+            if self.value_model is not None:
+                score = self.leaf_scores.get(id(game))
+                return self.value_model.evaluate(game) if score is None else score
+            return evaluate_position(game, self.weights) if cache is None else cache.evaluate(game, tt_key)
+
+        # Moves are packed integers inside the search (the TT, killers and
+        # history all store them); only results are unpacked to tuples
+        moves = game.generate_all_moves() if cache is None else cache.legal_moves(game, key)
+        if not moves:
+            # A player who cannot move loses
+            return -WIN_SCORE + ply
+
+        unpack = game.geometry.unpack_move
+        player = game.current_player
+        best_score = -INFINITY
+        best_move = None
+        if ply:
+            self.seen.add(key)
+        ordered_moves = self.ordering.order_moves(game, moves, tt_move, ply)
+        children = None
+        batch_leaves = depth == 1 and self.value_model is not None
+        if batch_leaves:
+            ordered_moves = list(ordered_moves)
+        for move_index, (move, category) in enumerate(ordered_moves):
+            if batch_leaves and move_index == 1:
+                # The first move did not cut off, so the rest are likely all
+                # needed: score their leaves with one model call
+                children = self._score_leaves(game, ordered_moves[1:])
+            if children is None:
+                child = game.copy()
+                victory = child.move(*unpack(move))["victory"]
+            else:
+                child, victory = children[move_index - 1]
+            if victory:
+                score = WIN_SCORE - ply - 1
+                if victory["winner"] != player:
+                    score = -score
+            else:
+                score = -self._negamax(child, depth - 1, -beta, -alpha, ply + 1)
+
+            if score > best_score:
+                best_score = score
+                best_move = move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                self.ordering.record_cutoff(move, category, move_index, depth, ply)
+                break
+        if ply:
+            self.seen.discard(key)
+        if children is not None:
+            self.leaf_scores = {}
+
+        if best_score <= alpha_original:
+            flag = UPPER_BOUND
+        elif best_score >= beta:
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+        if symmetry is not None and best_move is not None:
+            best_move = symmetry.packed_move(best_move)
+        self.tt.store(tt_key, depth, flag, best_score, best_move)
+        return best_score
+
+
+class Analyzer:
+    """Runs a multi-PV search in the background until stopped
+
+    The engine, and so its transposition table, is kept from one position
+    to the next: after a move most of the new position's tree has already
+    been searched and the first lines come back within a few hundred
+    milliseconds.
+    """
+
+    def __init__(self, engine=None, lines=3, max_depth=12):
+        self.engine = engine or SearchEngine()
+        self.lines = lines
+        self.max_depth = max_depth
+        self.thread = None
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, game, callback):
+        """Analyze a position; callback(list of SearchResult) runs on the worker after each depth"""
+        self.stop()
+        position = game.copy()
+        self.engine.prepare()
+        self.thread = threading.Thread(
+            target=self.engine.search_multipv,
+            args=(position, self.lines, self.max_depth, None, callback), daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the analysis and wait for the worker to finish"""
+        if self.thread is not None:
+            self.engine.stop()
+            self.thread.join()
+            self.thread = None
+
+
+class Ponderer:
+    """Search on the opponent's time so the engine can answer quickly"""
+
+    def __init__(self, engine, ponder_depth=8):
+        self.engine = engine
+        self.ponder_depth = ponder_depth
+        self.thread = None
+        self.lock = threading.Lock()  # stop() can be called from the GUI and the AI worker
+        self.expected_move = None
+        self.result = None
+        self.hits = 0
+        self.misses = 0
+
+    def is_pondering(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, game, expected_move=None):
+        """Start pondering the position where the opponent is to move
+
+        With an expected reply the engine searches the position after that move
+        (a ponder hit can then be answered instantly), otherwise it searches the
+        opponent's position itself so every reply's subtree ends up in the table.
+        """
+        self.stop()
+        position = game.copy()
+        self.expected_move = None
+        if expected_move is not None and expected_move in position.get_all_valid_moves():
+            if not position.move(*expected_move)["victory"]:
+                self.expected_move = expected_move
+            else:
+                position = game.copy()
+        self.result = None
+        with self.lock:
+            self.engine.prepare()
+            self.thread = threading.Thread(target=self._run, args=(position,), daemon=True)
+            self.thread.start()
+
+    def _run(self, position):
+        self.result = self.engine.search(position, self.ponder_depth, info_callback=self._on_info)
+
+    def _on_info(self, result):
+        self.result = result
+
+    def stop(self):
+        """Stop pondering and wait for the search thread to finish"""
+        with self.lock:
+            if self.thread is not None:
+                self.engine.stop()
+                self.thread.join()
+                self.thread = None
+
+    def on_opponent_move(self, move, game, max_depth, time_limit=None):
+        """Return the reply to the opponent's move, reusing the ponder search
+
+        On a ponder hit that has already reached max_depth the stored result is
+        returned immediately; otherwise the position is searched with the table
+        still warm from pondering.
+        """
+        hit = self.expected_move is not None and tuple(move) == self.expected_move
+        self.stop()
+        if hit:
+            self.hits += 1
+            if self.result is not None and self.result.depth >= max_depth and self.result.best_move is not None:
+                return self.result
+        else:
+            self.misses += 1
+        self.expected_move = None
+        return self.engine.search(game, max_depth, time_limit)
@@ -0,0 +1,570 @@
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from Orbital_Capture_Advanced_version import EnhancedOrbitalCaptureGame, MOVE_ERROR_MESSAGES
+from orbital_geometry import DEFAULT_GEOMETRY, STANDARD_SIZES, get_geometry
+from orbital_search import SearchEngine
+from orbital_state import CompactGameState
+
+# Opponent kinds for new games
+OPPONENT_HUMAN = "human"      # A second connection joins as Player 2
+OPPONENT_AI = "ai"            # The server plays Player 2
+OPPONENT_HOTSEAT = "hotseat"  # The creating connection plays both sides
+
+# Rule settings a client may choose when creating a game: name -> (type,
+# lowest, highest). The inner-circle threshold is capped by the board's
+# pieces per player, the energy threshold by the compact state's 8 bits
+GAME_SETTINGS = {
+    "inner_circle_threshold": (int, 1, None),
+    "energy_threshold": (int, 1, 255),
+    "allow_jumps": (bool, None, None),
+    "allow_nimber": (bool, None, None),
+    "energy_collection": (bool, None, None),
+}
+
+# Seconds per move a client may ask for (null, or leaving it out, means no clock)
+TURN_TIME_RANGE = (1, 24 * 3600)
+
+_worker_engine = None
+
+
+def compute_ai_move(game, depth, time_limit):
+    """Search for the AI's move (runs in an executor, one engine per worker)"""
+    global _worker_engine
+    if _worker_engine is None:
+        _worker_engine = SearchEngine(tt_size_bits=16)
+    result = _worker_engine.search(game, depth, time_limit)
+    return result.best_move
+
+
+def game_state(game):
+    """JSON-friendly description of a game position"""
+    return {
+        "rings": game.geometry.rings,
+        "spokes": game.geometry.spokes,
+        "board": game.board.tolist(),
+        "piece_values": game.piece_values.tolist(),
+        "current_player": int(game.current_player),
+        "player1_pieces": int(game.player1_pieces),
+        "player2_pieces": int(game.player2_pieces),
+        "player1_energy": int(game.player1_energy),
+        "player2_energy": int(game.player2_energy),
+        "player1_inner_pieces": int(game.player1_inner_pieces),
+        "player2_inner_pieces": int(game.player2_inner_pieces),
+        "legal_moves": [list(move) for move in game.legal_moves()],
+    }
+
+
+class ProtocolError(Exception):
+    """A request that cannot be served; reported back to the client"""
+
+    def __init__(self, code, message, reason=None):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.reason = reason  # Finer-grained code, e.g. why a move was illegal
+
+
+def check_settings(settings, geometry):
+    """Raise ProtocolError unless settings is a dictionary of valid GAME_SETTINGS values"""
+    if not isinstance(settings, dict):
+        raise ProtocolError("bad_request", "settings must be a JSON object")
+    for name, value in settings.items():
+        if name not in GAME_SETTINGS:
+            raise ProtocolError("bad_request", f"Unknown setting: {name}")
+        kind, lowest, highest = GAME_SETTINGS[name]
+        # JSON true and false are bools, which Python also counts as ints
+        if type(value) is not kind:
+            expected = "true or false" if kind is bool else "a whole number"
+            raise ProtocolError("bad_request", f"{name} must be {expected}")
+        if kind is int:
+            highest = highest or geometry.pieces_per_player()
+            if not lowest <= value <= highest:
+                raise ProtocolError("bad_request", f"{name} must be between {lowest} and {highest}")
+
+
+def check_turn_time(turn_time):
+    """Raise ProtocolError unless turn_time is None or a number of seconds in TURN_TIME_RANGE"""
+    if turn_time is None:
+        return
+    lowest, highest = TURN_TIME_RANGE
+    # bool is an int subclass, and NaN fails every comparison below
+    if type(turn_time) not in (int, float) or not lowest <= turn_time <= highest:
+        raise ProtocolError("bad_request", f"turn_time must be a number of seconds between {lowest} and {highest}")
+
+
+class ClientConnection:
+    def __init__(self, writer):
+        self.writer = writer
+        self.sessions = set()
+
+    def send(self, message):
+        """Queue a JSON line for the client"""
+        if not self.writer.is_closing():
+            self.writer.write(json.dumps(message).encode() + b"\n")
+
+
+class GameSession:
+    __slots__ = ("game_id", "opponent", "turn_time", "players", "ai_player", "winner",
+                 "reason", "move_count", "timer", "_game", "_state")
+
+    def __init__(self, game_id, opponent, turn_time, geometry=None):
+        self.game_id = game_id
+        self._game = EnhancedOrbitalCaptureGame(geometry)
+        self._state = None
+        self.opponent = opponent
+        self.turn_time = turn_time
+        self.players = {1: None, 2: None}  # Player number -> ClientConnection
+        self.ai_player = 2 if opponent == OPPONENT_AI else None
+        self.winner = None
+        self.reason = None
+        self.move_count = 0
+        self.timer = None
+
+    @property
+    def game(self):
+        """The live game object, unpacked from the compact state if parked"""
+        if self._game is None:
+            self._game = self._state.to_game()
+            self._state = None
+        return self._game
+
+    def park(self):
+        """Pack the game into its compact form until the next request needs it"""
+        if self._game is not None:
+            self._state = CompactGameState.from_game(self._game)
+            self._game = None
+
+    def is_over(self):
+        return self.winner is not None
+
+    def describe(self):
+        state = game_state(self.game)
+        state.update({"game_id": self.game_id, "winner": self.winner,
+                      "reason": self.reason, "move_count": self.move_count})
+        return state
+
+
+class GameServer:
+    """Hosts many concurrent games over a line-delimited JSON protocol"""
+
+    def __init__(self, max_sessions=10000, turn_time=None, ai_depth=2, ai_time_limit=1.0,
+                 executor=None, park_idle=True):
+        self.max_sessions = max_sessions
+        self.park_idle = park_idle  # Keep idle games packed (less memory, a little more CPU)
+        self.turn_time = turn_time
+        self.ai_depth = ai_depth
+        self.ai_time_limit = ai_time_limit
+        self.executor = executor or ProcessPoolExecutor()
+        self.sessions = {}
+        self.game_ids = itertools.count(1)
+        self.moves_played = 0
+
+    async def start_tcp(self, host="127.0.0.1", port=8765):
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    async def start_unix(self, path):
+        return await asyncio.start_unix_server(self.handle_connection, path)
+
+    async def handle_connection(self, reader, writer):
+        """Read requests line by line until the client disconnects"""
+        connection = ClientConnection(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                response = await self.handle_line(connection, line)
+                connection.send(response)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for session in list(connection.sessions):
+                self.abandon(session, connection)
+            writer.close()
+
+    async def handle_line(self, connection, line):
+        """Decode one request and return the response message"""
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ProtocolError("bad_request", "Request must be a JSON object")
+            request_id = request.get("id")
+            handler = getattr(self, "cmd_" + str(request.get("cmd")), None)
+            if handler is None:
+                raise ProtocolError("unknown_command", f"Unknown command: {request.get('cmd')}")
+            response = await handler(connection, request)
+            response["ok"] = True
+        except ProtocolError as error:
+            response = {"ok": False, "error": error.code, "message": error.message}
+            if error.reason is not None:
+                response["reason"] = error.reason
+        except (ValueError, TypeError) as error:
+            response = {"ok": False, "error": "bad_request", "message": str(error)}
+        except Exception as error:
+            # A bug in a handler must not drop the connection (and the client's games with it)
+            response = {"ok": False, "error": "internal", "message": f"{type(error).__name__}: {error}"}
+        if request_id is not None:
+            response["id"] = request_id
+        return response
+
+    def get_session(self, request):
+        session = self.sessions.get(request.get("game_id"))
+        if session is None:
+            raise ProtocolError("unknown_game", f"No game with id {request.get('game_id')}")
+        return session
+
+    async def cmd_new_game(self, connection, request):
+        """Create a game; the creator plays Player 1"""
+        if len(self.sessions) >= self.max_sessions:
+            raise ProtocolError("server_full", "Too many games in progress")
+        opponent = request.get("opponent", OPPONENT_AI)
+        if opponent not in (OPPONENT_HUMAN, OPPONENT_AI, OPPONENT_HOTSEAT):
+            raise ProtocolError("bad_request", f"Unknown opponent: {opponent}")
+
+        geometry = None
+        if "board" in request:
+            # Only the standard sizes: every new size builds geometry tables that are cached for good
+            board = request["board"]
+            if not isinstance(board, list) or tuple(board) not in STANDARD_SIZES:
+                sizes = ", ".join(f"[{rings}, {spokes}]" for rings, spokes in STANDARD_SIZES)
+                raise ProtocolError("bad_request", f"Board must be one of {sizes}")
+            geometry = get_geometry(*board)
+
+        settings = request.get("settings", {})
+        # Checked before any is applied, so a bad value never reaches a game
+        check_settings(settings, geometry or DEFAULT_GEOMETRY)
+        turn_time = self.turn_time
+        if "turn_time" in request:
+            turn_time = request["turn_time"]
+            check_turn_time(turn_time)
+        session = GameSession(next(self.game_ids), opponent, turn_time, geometry)
+        for name, value in settings.items():
+            setattr(session.game, name, value)
+        if self.park_idle:
+            session.park()  # Rejects settings the compact state cannot hold
+        session.players[1] = connection
+        if opponent == OPPONENT_HOTSEAT:
+            session.players[2] = connection
+        response = {"game_id": session.game_id, "player": 1, "state": session.describe()}
+        # Registered last, so a request that fails above leaves no session behind
+        connection.sessions.add(session)
+        self.sessions[session.game_id] = session
+        self.start_turn_timer(session)
+        self.park(session)
+        return response
+
+    async def cmd_join(self, connection, request):
+        """Join a game waiting for a human Player 2"""
+        session = self.get_session(request)
+        if session.opponent != OPPONENT_HUMAN or session.players[2] is not None:
+            raise ProtocolError("game_full", "This game cannot be joined")
+        session.players[2] = connection
+        connection.sessions.add(session)
+        self.notify(session, {"event": "joined", "game_id": session.game_id, "player": 2}, connection)
+        response = {"game_id": session.game_id, "player": 2, "state": session.describe()}
+        self.park(session)
+        return response
+
+    async def cmd_state(self, connection, request):
+        session = self.get_session(request)
+        response = {"state": session.describe()}
+        self.park(session)
+        return response
+
+    async def cmd_move(self, connection, request):
+        """Validate and play a move for the connection's side"""
+        session = self.get_session(request)
+        if session.is_over():
+            raise ProtocolError("game_over", "The game has already finished")
+        player = session.game.current_player
+        if session.players[player] is not connection:
+            raise ProtocolError("not_your_turn", f"It is Player {player}'s turn")
+
+        move = request.get("move")
+        if not isinstance(move, list) or len(move) != 4:
+            raise ProtocolError("bad_request", "A move is [from_ring, from_spoke, to_ring, to_spoke]")
+        reason = session.game.validate_move(*move)
+        if reason is not None:
+            raise ProtocolError("illegal_move", f"Illegal move {move}: {MOVE_ERROR_MESSAGES[reason]}", reason)
+        move = tuple(move)
+
+        result = self.apply_move(session, move)
+        self.notify(session, {"event": "move", "game_id": session.game_id, "player": player,
+                              "move": list(move), "result": result}, connection)
+        if not session.is_over() and session.ai_player == session.game.current_player:
+            asyncio.get_running_loop().create_task(self.play_ai_move(session))
+        response = {"result": result, "state": session.describe()}
+        self.park(session)
+        return response
+
+    async def cmd_resign(self, connection, request):
+        session = self.get_session(request)
+        player = 1 if session.players[1] is connection else 2
+        if session.players[player] is not connection:
+            raise ProtocolError("not_a_player", "You are not playing in this game")
+        self.finish(session, 3 - player, f"Player {player} resigned")
+        return {"state": session.describe()}
+
+    async def cmd_close(self, connection, request):
+        """Forget a game this connection takes part in"""
+        session = self.get_session(request)
+        if connection not in session.players.values():
+            raise ProtocolError("not_a_player", "You are not playing in this game")
+        self.close_session(session)
+        return {"game_id": session.game_id}
+
+    async def cmd_stats(self, connection, request):
+        return {"sessions": len(self.sessions), "moves_played": self.moves_played}
+
+    def apply_move(self, session, move):
+        """Play a legal move and settle the game if it ended"""
+        result = session.game.move(*move)
+        session.move_count += 1
+        self.moves_played += 1
+        if result["victory"]:
+            self.finish(session, result["victory"]["winner"], result["victory"]["reason"])
+        elif not session.game.legal_moves():
+            player = session.game.current_player
+            self.finish(session, 3 - player, f"Player {player} has no legal moves")
+        else:
+            self.start_turn_timer(session)
+        return {
+            "energy_cost": int(result["energy_cost"]),
+            "energy_gained": int(result["energy_gained"]),
+            "special_point": result["special_point"],
+            "captured": [list(position) for position in result["captured"]],
+            "victory": result["victory"],
+        }
+
+    async def play_ai_move(self, session):
+        """Search the AI's reply in the executor so the event loop keeps running"""
+        loop = asyncio.get_running_loop()
+        move_count = session.move_count
+        try:
+            move = await loop.run_in_executor(self.executor, compute_ai_move, session.game.copy(),
+                                              self.ai_depth, self.ai_time_limit)
+        except Exception as error:
+            # E.g. a broken process pool: without a move the game could never go on
+            if not session.is_over() and session.game_id in self.sessions:
+                self.abort(session, f"The server could not play its move ({type(error).__name__})")
+            return
+        # The game may have ended or been closed while the AI was thinking
+        if session.is_over() or session.move_count != move_count or move is None:
+            return
+        result = self.apply_move(session, move)
+        self.notify(session, {"event": "ai_move", "game_id": session.game_id,
+                              "player": session.ai_player, "move": list(move),
+                              "result": result, "state": session.describe()})
+        self.park(session)
+
+    def park(self, session):
+        if self.park_idle:
+            session.park()
+
+    def start_turn_timer(self, session):
+        """(Re)start the clock for the side to move; AI turns are not timed"""
+        if session.timer is not None:
+            session.timer.cancel()
+            session.timer = None
+        if session.turn_time and session.game.current_player != session.ai_player:
+            loop = asyncio.get_running_loop()
+            session.timer = loop.call_later(session.turn_time, self.on_turn_timeout,
+                                            session, session.move_count)
+
+    def on_turn_timeout(self, session, move_count):
+        if session.is_over() or session.move_count != move_count:
+            return
+        player = session.game.current_player
+        self.finish(session, 3 - player, f"Player {player} ran out of time")
+
+    def finish(self, session, winner, reason):
+        session.winner = winner
+        session.reason = reason
+        if session.timer is not None:
+            session.timer.cancel()
+            session.timer = None
+        self.notify(session, {"event": "game_over", "game_id": session.game_id,
+                              "winner": winner, "reason": reason})
+
+    def abort(self, session, reason):
+        """End a game that cannot go on, with no winner, and close it"""
+        self.finish(session, None, reason)
+        self.close_session(session)
+
+    def abandon(self, session, connection):
+        """A player disconnected: the game is lost for them and closed"""
+        if not session.is_over():
+            for player, player_connection in session.players.items():
+                if player_connection is connection:
+                    self.finish(session, 3 - player, f"Player {player} disconnected")
+                    break
+        self.close_session(session)
+
+    def close_session(self, session):
+        if session.timer is not None:
+            session.timer.cancel()
+        self.sessions.pop(session.game_id, None)
+        for connection in session.players.values():
+            if connection is not None:
+                connection.sessions.discard(session)
+
+    def notify(self, session, message, exclude=None):
+        """Push an event to every connection in the game except one"""
+        for connection in set(session.players.values()):
+            if connection is not None and connection is not exclude:
+                connection.send(message)
+
+
+class LoadClient:
+    """Plays games against a server and records per-move latency"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.request_ids = itertools.count(1)
+        self.events = []
+
+    async def request(self, **request):
+        request["id"] = next(self.request_ids)
+        self.writer.write(json.dumps(request).encode() + b"\n")
+        await self.writer.drain()
+        while True:
+            message = await self.read_message()
+            if message.get("id") == request["id"]:
+                if not message["ok"]:
+                    raise ProtocolError(message["error"], message["message"])
+                return message
+            self.events.append(message)
+
+    async def read_message(self):
+        line = await self.reader.readline()
+        if not line:
+            raise ConnectionError("Server closed the connection")
+        return json.loads(line)
+
+    async def wait_for_event(self, game_id, kinds):
+        while True:
+            for index, message in enumerate(self.events):
+                if message.get("game_id") == game_id and message.get("event") in kinds:
+                    return self.events.pop(index)
+            self.events.append(await self.read_message())
+
+    async def play_game(self, opponent, max_moves, latencies, rng):
+        response = await self.request(cmd="new_game", opponent=opponent)
+        game_id = response["game_id"]
+        state = response["state"]
+        for _ in range(max_moves):
+            if state["winner"] is not None or not state["legal_moves"]:
+                break
+            move = rng.choice(state["legal_moves"])
+            start = time.perf_counter()
+            response = await self.request(cmd="move", game_id=game_id, move=move)
+            state = response["state"]
+            if opponent == OPPONENT_AI and state["winner"] is None:
+                # A full turn includes the AI's reply
+                event = await self.wait_for_event(game_id, ("ai_move", "game_over"))
+                if event["event"] == "ai_move":
+                    state = event["state"]
+                else:
+                    state["winner"] = event["winner"]
+            latencies.append(time.perf_counter() - start)
+        await self.request(cmd="close", game_id=game_id)
+        self.events = [message for message in self.events if message.get("game_id") != game_id]
+
+
+async def run_load_test(host="127.0.0.1", port=8765, unix_path=None, games=100, concurrency=20,
+                        max_moves=40, opponent=OPPONENT_HOTSEAT, seed=0):
+    """Play many games concurrently and report throughput and latency percentiles"""
+    latencies = []
+    remaining = iter(range(games))
+
+    async def worker(worker_id):
+        if unix_path:
+            reader, writer = await asyncio.open_unix_connection(unix_path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        client = LoadClient(reader, writer)
+        rng = random.Random(seed + worker_id)
+        for _ in remaining:
+            await client.play_game(opponent, max_moves, latencies, rng)
+        writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    report = {"games": games, "moves": len(latencies), "seconds": elapsed,
+              "moves_per_second": len(latencies) / elapsed if elapsed else 0.0}
+    if len(latencies) >= 2:
+        percentiles = statistics.quantiles(latencies, n=100)
+        for name, index in (("p50", 49), ("p90", 89), ("p99", 98)):
+            report[f"latency_{name}_ms"] = percentiles[index] * 1000
+        report["latency_max_ms"] = max(latencies) * 1000
+    return report
+
+
+async def serve(args):
+    if args.executor == "thread":
+        executor = ThreadPoolExecutor(args.workers)
+    else:
+        executor = ProcessPoolExecutor(args.workers)
+    server = GameServer(args.max_sessions, args.turn_time, args.ai_depth, args.ai_time, executor,
+                        park_idle=not args.keep_live)
+    if args.unix:
+        listener = await server.start_unix(args.unix)
+        print(f"Serving on unix socket {args.unix}")
+    else:
+        listener = await server.start_tcp(args.host, args.port)
+        print(f"Serving on {args.host}:{args.port}")
+    async with listener:
+        await listener.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Orbital Capture game server")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="Run the game server")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8765)
+    serve_parser.add_argument("--unix", help="Listen on a Unix socket instead of TCP")
+    serve_parser.add_argument("--max-sessions", type=int, default=10000)
+    serve_parser.add_argument("--turn-time", type=float, help="Seconds allowed per move")
+    serve_parser.add_argument("--ai-depth", type=int, default=2)
+    serve_parser.add_argument("--ai-time", type=float, default=1.0)
+    serve_parser.add_argument("--executor", choices=["process", "thread"], default="process")
+    serve_parser.add_argument("--workers", type=int, default=None)
+    serve_parser.add_argument("--keep-live", action="store_true",
+                              help="Keep idle games unpacked (faster moves, more memory)")
+
+    load_parser = commands.add_parser("load", help="Run the load generator against a server")
+    load_parser.add_argument("--host", default="127.0.0.1")
+    load_parser.add_argument("--port", type=int, default=8765)
+    load_parser.add_argument("--unix", help="Connect to a Unix socket instead of TCP")
+    load_parser.add_argument("--games", type=int, default=100)
+    load_parser.add_argument("--concurrency", type=int, default=20)
+    load_parser.add_argument("--max-moves", type=int, default=40)
+    load_parser.add_argument("--opponent", choices=[OPPONENT_HOTSEAT, OPPONENT_AI], default=OPPONENT_HOTSEAT)
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        asyncio.run(serve(args))
+    else:
+        report = asyncio.run(run_load_test(args.host, args.port, args.unix, args.games,
+                                           args.concurrency, args.max_moves, args.opponent))
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+import argparse
+import multiprocessing
+import os
+import queue
+import random
+import time
+import traceback
+from multiprocessing import shared_memory
+
+from orbital_search import INFINITY, SearchAborted, SearchEngine, SearchResult
+
+# Bit layout of the data word of a shared table entry
+_SCORE_OFFSET = 1 << 31  # Scores are stored offset into 32 unsigned bits
+_DEPTH_SHIFT = 32        # 8 bits
+_FLAG_SHIFT = 40         # 2 bits
+_MOVE_SHIFT = 42         # Packed move + 1 (0 means no move), 21 bits
+
+
+class SharedTranspositionTable:
+    """Transposition table in shared memory, usable by several processes without locks
+
+    Each slot is two 64-bit words: key ^ data and data. A reader accepts the
+    slot only when the two words XOR back to its key, so a slot torn by two
+    processes writing at once reads as a miss instead of a wrong entry.
+    probe and store match TranspositionTable, so a SearchEngine can use
+    either.
+    """
+
+    def __init__(self, size_bits=18, name=None):
+        self.size = 1 << size_bits
+        self.mask = self.size - 1
+        self.size_bits = size_bits
+        self.owner = name is None
+        if self.owner:
+            self.memory = shared_memory.SharedMemory(create=True, size=16 * self.size)
+            self.memory.buf[:] = bytes(16 * self.size)
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+        self.slots = self.memory.buf.cast("Q")
+
+    def __reduce__(self):
+        # Processes that do not inherit the table attach to it by name
+        return SharedTranspositionTable, (self.size_bits, self.memory.name)
+
+    def probe(self, key):
+        """Return (depth, flag, score, move) for the key, or None"""
+        index = (key & self.mask) << 1
+        slots = self.slots
+        data = slots[index + 1]
+        if slots[index] ^ data != key or not data:
+            return None
+        move = data >> _MOVE_SHIFT
+        return ((data >> _DEPTH_SHIFT) & 0xFF, (data >> _FLAG_SHIFT) & 3,
+                (data & 0xFFFFFFFF) - _SCORE_OFFSET, move - 1 if move else None)
+
+    def store(self, key, depth, flag, score, move):
+        """Store an entry, preferring deeper results for the same position"""
+        index = (key & self.mask) << 1
+        slots = self.slots
+        data = slots[index + 1]
+        if slots[index] ^ data == key and data and (data >> _DEPTH_SHIFT) & 0xFF > depth:
+            return
+        data = ((score + _SCORE_OFFSET) | min(depth, 255) << _DEPTH_SHIFT | flag << _FLAG_SHIFT |
+                (0 if move is None else move + 1) << _MOVE_SHIFT)
+        slots[index] = key ^ data
+        slots[index + 1] = data
+
+    def clear(self):
+        """Remove all entries"""
+        self.memory.buf[:] = bytes(16 * self.size)
+
+    def __del__(self):
+        # SharedMemory cannot unmap while the slot view still exists
+        slots = self.__dict__.get("slots")
+        if slots is not None:
+            slots.release()
+
+    def close(self):
+        """Detach from the shared memory, freeing it when this process created it"""
+        self.slots.release()
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+
+class WorkerError(RuntimeError):
+    """A Lazy SMP worker raised an exception or died during a search"""
+
+
+class _StopFlag:
+    """Cross-process stop signal for one search; stands in for SearchEngine.stop_event
+
+    The coordinator bumps a shared generation counter to stop every worker
+    still busy with an older search. clear() does nothing so that a helper
+    starting late cannot undo a stop that has already happened.
+    """
+
+    def __init__(self, generation, search_id):
+        self.generation = generation
+        self.search_id = search_id
+
+    def is_set(self):
+        return self.generation.value != self.search_id
+
+    def set(self):
+        pass
+
+    def clear(self):
+        pass
+
+
+def _worker_main(index, table, tasks, results, generation):
+    """Worker process loop: search each root it is sent until told to stop"""
+    engine = SearchEngine(tt_size_bits=1)
+    engine.tt = table
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        search_id, game, max_depth, time_limit = task
+        engine.stop_event = _StopFlag(generation, search_id)
+        start = time.perf_counter()
+        try:
+            if index == 0:
+                # The main worker does a normal search; its result is the answer
+                result = engine.search(game, max_depth, time_limit)
+                depth = result.depth
+            else:
+                # Helpers fill the shared table, odd ones a ply ahead of the main
+                # worker, until the main worker is done
+                result = None
+                depth = 0
+                engine._start_search(game, time_limit)
+                root = game.copy()
+                try:
+                    for depth_searched in range(1 + index % 2, max_depth + 2):
+                        engine._negamax(root, depth_searched, -INFINITY, INFINITY, 0)
+                        depth = depth_searched
+                except SearchAborted:
+                    pass
+        except Exception:
+            # Reported instead of raised, so the coordinator is not left waiting
+            results.put((index, search_id, None, {"error": traceback.format_exc()}))
+            continue
+        results.put((index, search_id, result, {"nodes": engine.nodes, "depth": depth,
+                                                "elapsed": time.perf_counter() - start}))
+
+
+class LazySMPSearch:
+    """Lazy SMP: worker processes search the same root and share one transposition table
+
+    Worker 0 runs an ordinary iterative deepening search and its result is
+    returned. The helpers search the same position at staggered depths
+    purely to fill the shared table, which lets the main worker cut off
+    earlier. Processes rather than threads are used because the GIL would
+    serialise the search. Call close() (or use a with block) to stop the
+    workers and free the table. A worker that raises or dies makes search()
+    stop the others and raise WorkerError.
+    """
+
+    # Seconds between checks that the workers still owing a result are alive
+    POLL_INTERVAL = 0.5
+
+    def __init__(self, workers=None, tt_size_bits=18):
+        self.workers = workers or os.cpu_count()
+        self.table = SharedTranspositionTable(tt_size_bits)
+        self.task_queues = []
+        self.processes = []
+        self.statistics = None
+        try:
+            context = multiprocessing.get_context()
+            self.generation = context.Value("q", 0)
+            self.results = context.Queue()
+            for index in range(self.workers):
+                tasks = context.Queue()
+                process = context.Process(target=_worker_main, daemon=True,
+                                          args=(index, self.table, tasks, self.results, self.generation))
+                process.start()
+                self.task_queues.append(tasks)
+                self.processes.append(process)
+        except BaseException:
+            self.close()
+            raise
+
+    def search(self, game, max_depth=4, time_limit=None):
+        """Search the position on all workers and return worker 0's SearchResult
+
+        Afterwards self.statistics holds the nodes, depth and nodes per
+        second of every worker and of the whole search.
+        """
+        search_id = self.generation.value
+        start = time.perf_counter()
+        for tasks in self.task_queues:
+            tasks.put((search_id, game, max_depth, time_limit))
+
+        reports = [None] * self.workers
+        result = SearchResult()
+        pending = self.workers
+        try:
+            while pending:
+                try:
+                    index, task_id, worker_result, report = self.results.get(timeout=self.POLL_INTERVAL)
+                except queue.Empty:
+                    for index, process in enumerate(self.processes):
+                        if reports[index] is None and not process.is_alive():
+                            raise WorkerError(f"Worker {index} died (exit code {process.exitcode})")
+                    continue
+                if task_id != search_id:
+                    continue
+                if "error" in report:
+                    raise WorkerError(f"Worker {index} failed:\n{report['error']}")
+                reports[index] = report
+                pending -= 1
+                if index == 0:
+                    result = worker_result
+                    self._stop_workers(search_id)
+        finally:
+            # Stops the helpers after the main worker's result, and every
+            # worker when the search is given up
+            self._stop_workers(search_id)
+        elapsed = time.perf_counter() - start
+
+        for report in reports:
+            report["nps"] = report["nodes"] / report["elapsed"] if report["elapsed"] else 0.0
+        nodes = sum(report["nodes"] for report in reports)
+        self.statistics = {"elapsed": elapsed, "nodes": nodes, "nps": nodes / elapsed if elapsed else 0.0,
+                           "workers": reports}
+        result.nodes = nodes
+        result.elapsed = elapsed
+        return result
+
+    def _stop_workers(self, search_id):
+        """Make every worker still busy with this search give up"""
+        with self.generation.get_lock():
+            if self.generation.value == search_id:
+                self.generation.value = search_id + 1
+
+    def close(self):
+        """Stop the worker processes and free the shared table"""
+        try:
+            for tasks in self.task_queues:
+                tasks.put(None)
+            for process in self.processes:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+        finally:
+            self.table.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def test_positions(count, seed=0, plies=8):
+    """Middle-game positions reached by random play from the start"""
+    from Orbital_Capture_Advanced_version import EnhancedOrbitalCaptureGame
+
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        game = EnhancedOrbitalCaptureGame()
+        for _ in range(plies):
+            moves = game.get_all_valid_moves()
+            if not moves or game.move(*rng.choice(moves))["victory"]:
+                break
+        else:
+            positions.append(game)
+    return positions
+
+
+def scaling_report(worker_counts, depth=5, positions=8, seed=0, tt_size_bits=18):
+    """Time to depth and nodes per second for each worker count
+
+    Speedup is the single-worker time divided by the time with n workers;
+    efficiency divides the total NPS by n times the single-worker NPS.
+    """
+    games = test_positions(positions, seed)
+    rows = []
+    for workers in worker_counts:
+        with LazySMPSearch(workers, tt_size_bits) as search:
+            elapsed = 0.0
+            nodes = 0
+            worker_nodes = [0] * workers
+            for game in games:
+                search.table.clear()
+                search.search(game, depth)
+                elapsed += search.statistics["elapsed"]
+                nodes += search.statistics["nodes"]
+                for index, report in enumerate(search.statistics["workers"]):
+                    worker_nodes[index] += report["nodes"]
+        rows.append({"workers": workers, "elapsed": elapsed, "nodes": nodes, "nps": nodes / elapsed,
+                     "nps_per_worker": [count / elapsed for count in worker_nodes]})
+    base = rows[0]
+    for row in rows:
+        row["speedup"] = base["elapsed"] / row["elapsed"]
+        row["efficiency"] = row["nps"] / (row["workers"] / base["workers"] * base["nps"])
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lazy SMP scaling report")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--depth", type=int, default=5)
+    parser.add_argument("--positions", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    print(f"{os.cpu_count()} CPUs, depth {args.depth}, {args.positions} positions")
+    print(f"{'workers':>7} {'time s':>8} {'nodes':>9} {'nps':>9} {'speedup':>8} {'efficiency':>10}  nps per worker")
+    for row in scaling_report(args.workers, args.depth, args.positions, args.seed):
+        per_worker = " ".join(f"{value:.0f}" for value in row["nps_per_worker"])
+        print(f"{row['workers']:7} {row['elapsed']:8.2f} {row['nodes']:9} {row['nps']:9.0f} "
+              f"{row['speedup']:8.2f} {row['efficiency']:10.2f}  {per_worker}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import os
+import sys
+import time
+
+# Kept free of heavy imports: the entry points import this module first, so
+# that the NumPy and PyQt5 imports after it are part of the measured startup
+IMPORTED_AT = time.perf_counter()
+
+# Time from process start to the first painted window the kiosk machines must stay under
+FIRST_PAINT_BUDGET = 1.0
+
+# Command line flags understood by both entry points
+TIMING_FLAG = "--startup-timing"  # Print the startup report after the first paint
+QUIT_FLAG = "--quit-after-startup"  # Exit once the window is up (for repeated measurements)
+
+ENTRY_POINTS = {
+    "advanced": "Orbital_Capture_Advanced_version.py",
+    "simple": "Orbital_Capture_SImple_Version.py",
+}
+
+
+def _process_age():
+    """Seconds since the process started, or None where /proc is not available"""
+    try:
+        with open("/proc/self/stat") as stat:
+            # Field 22 is the start time in clock ticks since boot; the command
+            # name in field 2 may contain spaces, so count from its ")"
+            start_ticks = int(stat.read().rsplit(")", 1)[1].split()[19])
+        return time.clock_gettime(time.CLOCK_BOOTTIME) - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, AttributeError, ValueError, IndexError):
+        return None
+
+
+class StartupTimer:
+    """Marks the phases of startup, from process start to the first paint
+
+    Time counts from the import of this module. mark(name) closes the
+    phase that started at the previous mark; the report also includes the
+    interpreter's own startup where the process start time can be read
+    from /proc.
+    """
+
+    def __init__(self, argv=None):
+        argv = sys.argv if argv is None else argv
+        self.start = IMPORTED_AT
+        self.enabled = TIMING_FLAG in argv
+        self.quit_after_startup = QUIT_FLAG in argv
+        self.before_start = None
+        if self.enabled:
+            age = _process_age()
+            if age is not None:
+                self.before_start = max(0.0, age - (time.perf_counter() - IMPORTED_AT))
+        self.marks = []
+
+    def mark(self, name):
+        self.marks.append((name, time.perf_counter()))
+
+    def phases(self):
+        """(phase, seconds) pairs in order, starting with the interpreter when known"""
+        phases = []
+        if self.before_start is not None:
+            phases.append(("interpreter", self.before_start))
+        previous = self.start
+        for name, moment in self.marks:
+            phases.append((name, moment - previous))
+            previous = moment
+        return phases
+
+    def elapsed(self, name):
+        """Seconds from process start (or the import of this module) to the named mark"""
+        moment = dict(self.marks)[name]
+        return moment - self.start + (self.before_start or 0.0)
+
+    def report(self, budget=FIRST_PAINT_BUDGET):
+        """One line of name=milliseconds fields; over_budget=1 when the first paint was too late"""
+        fields = [f"{name}={seconds * 1000:.1f}ms" for name, seconds in self.phases()]
+        first_paint = self.elapsed("first_paint")
+        fields.append(f"first_paint_total={first_paint * 1000:.1f}ms")
+        fields.append(f"budget={budget * 1000:.0f}ms")
+        fields.append(f"over_budget={int(first_paint > budget)}")
+        return "startup " + " ".join(fields)
+
+
+def strip_flags(argv):
+    """argv without the startup flags, for QApplication"""
+    return [arg for arg in argv if arg not in (TIMING_FLAG, QUIT_FLAG)]
+
+
+def after_first_paint(app, callback):
+    """Call callback once, on the event loop turn after the first widget paint"""
+    from PyQt5.QtCore import QEvent, QObject, QTimer
+
+    class FirstPaintFilter(QObject):
+        def eventFilter(self, watched, event):
+            if event.type() == QEvent.Paint:
+                app.removeEventFilter(self)
+                QTimer.singleShot(0, callback)
+            return False
+
+    paint_filter = FirstPaintFilter(app)
+    app.installEventFilter(paint_filter)
+    return paint_filter
+
+
+def parse_report(line):
+    """Return {field: milliseconds} from a report line, or None if it is not one"""
+    if not line.startswith("startup "):
+        return None
+    values = {}
+    for field in line.split()[1:]:
+        name, _, value = field.partition("=")
+        values[name] = float(value[:-2] if value.endswith("ms") else value)
+    return values
+
+
+def measure(entry, runs=5):
+    """Start an entry point `runs` times in fresh interpreters; returns the report of each run"""
+    import subprocess
+
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), ENTRY_POINTS[entry])
+    reports = []
+    for _ in range(runs):
+        completed = subprocess.run([sys.executable, script, TIMING_FLAG, QUIT_FLAG],
+                                   capture_output=True, text=True, timeout=60)
+        for line in completed.stderr.splitlines():
+            report = parse_report(line)
+            if report is not None:
+                reports.append(report)
+                break
+        else:
+            raise RuntimeError(f"{entry} printed no startup report:\n{completed.stderr}")
+    return reports
+
+
+def main(argv=None):
+    import argparse
+    import statistics
+
+    parser = argparse.ArgumentParser(description="Measure cold start of the game windows")
+    parser.add_argument("entries", nargs="*", help="advanced and/or simple (both by default)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=FIRST_PAINT_BUDGET, help="Seconds to first paint")
+    args = parser.parse_args(argv)
+    unknown = set(args.entries) - set(ENTRY_POINTS)
+    if unknown:
+        parser.error(f"unknown entry points: {', '.join(sorted(unknown))}")
+
+    over_budget = False
+    for entry in args.entries or sorted(ENTRY_POINTS):
+        reports = measure(entry, args.runs)
+        phases = [name for name in reports[0] if name not in ("budget", "over_budget")]
+        medians = {name: statistics.median(report[name] for report in reports) for name in phases}
+        print(f"{entry} (median of {len(reports)} runs): " +
+              ", ".join(f"{name} {value:.1f} ms" for name, value in medians.items()))
+        if medians["first_paint_total"] > args.budget * 1000:
+            print(f"{entry}: first paint {medians['first_paint_total']:.0f} ms is over the "
+                  f"{args.budget * 1000:.0f} ms budget")
+            over_budget = True
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
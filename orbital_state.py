@@ -0,0 +1,286 @@
+import struct
+import numpy as np
+
+from orbital_geometry import DEFAULT_GEOMETRY, DEFAULT_SPECIAL_POINTS, get_geometry
+
+# Serialized layout: format tag, rings and spokes, then the board and
+# energy bytes (their sizes follow from the shape), then reserves, packed
+# counters/rules and layout id. The length alone does not tell board sizes
+# apart (5 x 6 and 3 x 10 pack to as many bytes as 4 x 8), so the shape is
+# always written.
+STATE_FORMAT = 2
+STATE_HEADER = struct.Struct("<BBB")
+STATE_TRAILER = struct.Struct("<HHQH")
+
+# Bit fields of the packed meta word: (attribute, width in bits)
+META_FIELDS = [
+    ("current_player", 1),  # Stored as player - 1
+    ("allow_jumps", 1),
+    ("allow_nimber", 1),
+    ("energy_collection", 1),
+    ("inner_circle_threshold", 5),
+    ("energy_threshold", 8),
+    ("player1_pieces", 5),
+    ("player2_pieces", 5),
+    ("player1_inner_pieces", 4),
+    ("player2_inner_pieces", 4),
+]
+
+# Special point layouts are interned so every state shares the same tuple.
+# A layout id also fixes the board geometry the layout belongs to.
+_layouts = []
+_layout_geometries = []
+_layout_ids = {}
+
+
+def register_layout(points, geometry=DEFAULT_GEOMETRY):
+    """Return (layout_id, shared_tuple) for a special point layout on a board"""
+    layout = tuple(tuple(point) for point in points)
+    layout_id = _layout_ids.get((geometry.shape, layout))
+    if layout_id is None:
+        layout_id = len(_layouts)
+        _layouts.append(layout)
+        _layout_geometries.append(geometry)
+        _layout_ids[(geometry.shape, layout)] = layout_id
+    return layout_id, _layouts[layout_id]
+
+
+def get_layout(layout_id):
+    """Return the shared special point layout for an id"""
+    return _layouts[layout_id]
+
+
+def get_layout_geometry(layout_id):
+    """Return the board geometry a layout id was registered for"""
+    return _layout_geometries[layout_id]
+
+
+register_layout(DEFAULT_SPECIAL_POINTS)
+
+
+def board_bytes(geometry):
+    """Bytes needed for a packed board (2 bits per intersection)"""
+    return (geometry.cells + 3) // 4
+
+
+def state_size(geometry):
+    """Bytes of a serialized state on a board"""
+    return STATE_HEADER.size + board_bytes(geometry) + geometry.cells + STATE_TRAILER.size
+
+
+def pack_board(board):
+    """Pack an occupancy array into an integer (2 bits per intersection)"""
+    cells = np.asarray(board, dtype=np.uint8).ravel()
+    bits = np.stack([cells & 1, cells >> 1], axis=1).ravel()
+    return int.from_bytes(np.packbits(bits, bitorder="little").tobytes(), "little")
+
+
+def unpack_board(packed, geometry=DEFAULT_GEOMETRY):
+    """Inverse of pack_board"""
+    raw = np.frombuffer(packed.to_bytes(board_bytes(geometry), "little"), dtype=np.uint8)
+    bits = np.unpackbits(raw, bitorder="little")[:2 * geometry.cells].reshape(geometry.cells, 2)
+    return (bits[:, 0] + 2 * bits[:, 1]).reshape(geometry.shape).astype(int)
+
+
+def pack_energy(piece_values):
+    """Pack piece energies into an integer (one byte per intersection)"""
+    values = np.asarray(piece_values)
+    if values.min() < 0 or values.max() > 255:
+        raise ValueError("Piece energy out of range for the compact state")
+    return int.from_bytes(values.astype(np.uint8).tobytes(), "little")
+
+
+def unpack_energy(packed, geometry=DEFAULT_GEOMETRY):
+    """Inverse of pack_energy"""
+    raw = np.frombuffer(packed.to_bytes(geometry.cells, "little"), dtype=np.uint8)
+    return raw.reshape(geometry.shape).astype(int)
+
+
+class CompactGameState:
+    """A game position packed into a handful of integers
+
+    Occupancy takes 2 bits and energy 8 bits per intersection; counters and
+    rule settings share one packed word and the special point layout is a
+    shared tuple. An idle game costs a couple of hundred bytes this way
+    instead of two NumPy arrays and a dozen attributes.
+    """
+
+    __slots__ = ("board", "energy", "player1_energy", "player2_energy", "meta", "layout_id")
+
+    def __init__(self, board, energy, player1_energy, player2_energy, meta, layout_id=0):
+        self.board = board
+        self.energy = energy
+        self.player1_energy = player1_energy
+        self.player2_energy = player2_energy
+        self.meta = meta
+        self.layout_id = layout_id
+
+    @classmethod
+    def from_game(cls, game):
+        """Pack an EnhancedOrbitalCaptureGame"""
+        meta = 0
+        shift = 0
+        for name, width in META_FIELDS:
+            value = int(getattr(game, name))
+            if name == "current_player":
+                value -= 1
+            if value < 0 or value >= 1 << width:
+                raise ValueError(f"{name}={value} does not fit the compact state")
+            meta |= value << shift
+            shift += width
+        layout_id, _ = register_layout(game.special_points, game.geometry)
+        return cls(pack_board(game.board), pack_energy(game.piece_values),
+                   int(game.player1_energy), int(game.player2_energy), meta, layout_id)
+
+    def unpack_meta(self):
+        """Return the packed counters and rule settings as a dictionary"""
+        values = {}
+        meta = self.meta
+        for name, width in META_FIELDS:
+            values[name] = meta & ((1 << width) - 1)
+            meta >>= width
+        values["current_player"] += 1
+        for name in ("allow_jumps", "allow_nimber", "energy_collection"):
+            values[name] = bool(values[name])
+        return values
+
+    def to_game(self, game=None):
+        """Unpack into a game object (a new one unless one is given)"""
+        if game is None:
+            # Imported here so the GUI module can use this one without a cycle
+            from Orbital_Capture_Advanced_version import EnhancedOrbitalCaptureGame
+            game = EnhancedOrbitalCaptureGame.__new__(EnhancedOrbitalCaptureGame)
+        geometry = get_layout_geometry(self.layout_id)
+        game.geometry = geometry
+        game.board = unpack_board(self.board, geometry)
+        game.piece_values = unpack_energy(self.energy, geometry)
+        game.player1_energy = self.player1_energy
+        game.player2_energy = self.player2_energy
+        game.set_special_points(get_layout(self.layout_id))
+        game._legal = None
+        for name, value in self.unpack_meta().items():
+            setattr(game, name, value)
+        return game
+
+    def to_bytes(self):
+        """Serialize to state_size(geometry) bytes
+
+        The layout is stored as its id in this process's registry, so the
+        bytes are for in-memory use (StateHistory) only; files use
+        orbital_notation instead.
+        """
+        geometry = get_layout_geometry(self.layout_id)
+        return (STATE_HEADER.pack(STATE_FORMAT, geometry.rings, geometry.spokes) +
+                self.board.to_bytes(board_bytes(geometry), "little") +
+                self.energy.to_bytes(geometry.cells, "little") +
+                STATE_TRAILER.pack(self.player1_energy, self.player2_energy,
+                                   self.meta, self.layout_id))
+
+    @classmethod
+    def from_bytes(cls, data):
+        if len(data) < STATE_HEADER.size:
+            raise ValueError("Too short for a compact state")
+        state_format, rings, spokes = STATE_HEADER.unpack_from(data)
+        if state_format != STATE_FORMAT:
+            raise ValueError(f"Compact state format {state_format} is not {STATE_FORMAT}")
+        geometry = get_geometry(rings, spokes)
+        if len(data) != state_size(geometry):
+            raise ValueError(f"A {rings} x {spokes} state is {state_size(geometry)} bytes, not {len(data)}")
+        offset = STATE_HEADER.size
+        board = int.from_bytes(data[offset:offset + board_bytes(geometry)], "little")
+        offset += board_bytes(geometry)
+        energy = int.from_bytes(data[offset:offset + geometry.cells], "little")
+        offset += geometry.cells
+        player1_energy, player2_energy, meta, layout_id = STATE_TRAILER.unpack_from(data, offset)
+        if layout_id >= len(_layouts) or get_layout_geometry(layout_id) != geometry:
+            raise ValueError(f"Layout id {layout_id} is not a {rings} x {spokes} layout of this process")
+        return cls(board, energy, player1_energy, player2_energy, meta, layout_id)
+
+    def key(self):
+        """Hashable value identifying the exact state"""
+        return (self.board, self.energy, self.player1_energy, self.player2_energy,
+                self.meta, self.layout_id)
+
+    def __eq__(self, other):
+        return isinstance(other, CompactGameState) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+
+class StateHistory:
+    """Undo/redo history of serialized states in one preallocated ring buffer
+
+    Every position is stored as its CompactGameState bytes (57 bytes on the
+    standard board) in a single bytearray, so a long game costs tens of
+    bytes per ply and no Python objects. When the buffer is full the oldest
+    positions are dropped; pushing after an undo discards the redo states.
+    The states name their special point layout by a process-local id
+    (see CompactGameState.to_bytes), so a history lives and dies with its
+    window and is never saved.
+    """
+
+    def __init__(self, game, capacity=512):
+        self.capacity = capacity
+        self.reset(game)
+
+    def reset(self, game):
+        """Forget everything and start from this position"""
+        data = CompactGameState.from_game(game).to_bytes()
+        self.record_size = len(data)
+        self.buffer = bytearray(self.capacity * self.record_size)
+        self.start = 0  # Slot of the oldest stored position
+        self._write(0, data)
+        self.count = 1  # Positions stored
+        self.current = 0  # Index (from the oldest) of the position on the board
+
+    def _slot_offset(self, index):
+        return ((self.start + index) % self.capacity) * self.record_size
+
+    def _write(self, index, data):
+        offset = self._slot_offset(index)
+        self.buffer[offset:offset + self.record_size] = data
+
+    def push(self, game):
+        """Store the position after a move"""
+        data = CompactGameState.from_game(game).to_bytes()
+        if len(data) != self.record_size:
+            self.reset(game)  # The board size changed
+            return
+        self.count = self.current + 1  # Drop the redo positions
+        if self.count == self.capacity:
+            self.start = (self.start + 1) % self.capacity
+            self.count -= 1
+        self._write(self.count, data)
+        self.count += 1
+        self.current = self.count - 1
+
+    def can_undo(self):
+        return self.current > 0
+
+    def can_redo(self):
+        return self.current < self.count - 1
+
+    def undo(self, game):
+        """Restore the previous position into game; returns False when there is none"""
+        if not self.can_undo():
+            return False
+        self.current -= 1
+        self._restore(game)
+        return True
+
+    def redo(self, game):
+        """Restore the next position into game; returns False when there is none"""
+        if not self.can_redo():
+            return False
+        self.current += 1
+        self._restore(game)
+        return True
+
+    def _restore(self, game):
+        offset = self._slot_offset(self.current)
+        CompactGameState.from_bytes(bytes(self.buffer[offset:offset + self.record_size])).to_game(game)
+
+    def memory_bytes(self):
+        """Size of the ring buffer"""
+        return len(self.buffer)
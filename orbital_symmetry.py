@@ -0,0 +1,157 @@
+import numpy as np
+
+from orbital_search import MAX_HASHED_ENERGY, position_hash, zobrist_tables
+
+
+class Symmetry:
+    """One rotation or reflection of the spokes (rings never move)
+
+    Spoke s goes to (rotation + s) % spokes, or to (rotation - s) % spokes
+    for a reflection. Moves keep their class under every symmetry, so packed
+    moves are mapped by mapping their two cells.
+    """
+
+    __slots__ = ("rotation", "reflected", "spoke_map", "cell_map", "inverse")
+
+    def __init__(self, geometry, rotation, reflected):
+        spokes = geometry.spokes
+        self.rotation = rotation
+        self.reflected = reflected
+        self.spoke_map = tuple((rotation - spoke if reflected else rotation + spoke) % spokes
+                               for spoke in range(spokes))
+        self.cell_map = tuple(ring * spokes + self.spoke_map[spoke]
+                              for ring in range(geometry.rings) for spoke in range(spokes))
+        self.inverse = None  # Set by symmetry_group
+
+    def __repr__(self):
+        return f"Symmetry(rotation={self.rotation}, reflected={self.reflected})"
+
+    def is_identity(self):
+        return self.rotation == 0 and not self.reflected
+
+    def position(self, ring, spoke):
+        return ring, self.spoke_map[spoke]
+
+    def move(self, move):
+        """Map a (from_ring, from_spoke, to_ring, to_spoke) move"""
+        spoke_map = self.spoke_map
+        return move[0], spoke_map[move[1]], move[2], spoke_map[move[3]]
+
+    def packed_move(self, move):
+        """Map a packed move (from_cell | to_cell << 8 | class << 16)"""
+        cell_map = self.cell_map
+        return cell_map[move & 0xFF] | cell_map[move >> 8 & 0xFF] << 8 | move & ~0xFFFF
+
+    def board(self, array):
+        """Map a (rings, spokes) array: the value at spoke s moves to spoke_map[s]"""
+        return array[:, self.inverse.spoke_map]
+
+    def game(self, game):
+        """Return a transformed copy of an EnhancedOrbitalCaptureGame"""
+        clone = game.copy()
+        clone.board = self.board(game.board)
+        clone.piece_values = self.board(game.piece_values)
+        clone._legal = None
+        return clone
+
+
+_groups = {}
+
+
+def symmetry_group(geometry, special_points=()):
+    """Symmetries that leave the rules and a special point layout unchanged, identity first
+
+    Without special points this is every rotation and reflection of the
+    spokes (16 on the standard board); the default layout only survives a
+    rotation by half the spokes. Reflections are left out when the board
+    has an odd number of spokes, since they would not preserve opposite-spoke
+    (nimber) moves.
+    """
+    points = tuple(tuple(point) for point in special_points)
+    key = (geometry.shape, points)
+    group = _groups.get(key)
+    if group is not None:
+        return group
+
+    spokes = geometry.spokes
+    layout = set(points)
+    reflections = (False, True) if (2 * geometry.opposite_offset) % spokes == 0 else (False,)
+    group = []
+    for reflected in reflections:
+        for rotation in range(spokes):
+            symmetry = Symmetry(geometry, rotation, reflected)
+            if all((ring, symmetry.spoke_map[spoke], kind) in layout for ring, spoke, kind in points):
+                group.append(symmetry)
+    for symmetry in group:
+        symmetry.inverse = next(other for other in group
+                                if all(other.spoke_map[symmetry.spoke_map[spoke]] == spoke for spoke in range(spokes)))
+    group = _groups[key] = tuple(group)
+    return group
+
+
+def game_symmetries(game):
+    """symmetry_group for a game's board and special point layout"""
+    return symmetry_group(game.geometry, game.special_points)
+
+
+class _GroupIndex:
+    """Spoke index arrays for hashing every image of a position in one NumPy call"""
+
+    def __init__(self, group):
+        self.spokes = np.array([symmetry.spoke_map for symmetry in group])[:, None, :]
+
+
+_group_indices = {}
+
+
+def symmetric_hashes(game, group=None):
+    """Zobrist keys of every image of a position under its symmetry group, identity first"""
+    group = group or game_symmetries(game)
+    if len(group) == 1:
+        return [position_hash(game)]
+    index = _group_indices.get(group)
+    if index is None:
+        index = _group_indices[group] = _GroupIndex(group)
+    tables = zobrist_tables(game.board.shape)
+    # A piece at (ring, spoke) lands on (ring, spoke_map[spoke]) in each image
+    energy = np.minimum(game.piece_values, MAX_HASHED_ENERGY)
+    keys = np.bitwise_xor.reduce(tables.pieces[game.board[None], tables.rings[None], index.spokes], axis=(1, 2))
+    keys ^= np.bitwise_xor.reduce(tables.energy[energy[None], tables.rings[None], index.spokes], axis=(1, 2))
+    common = int(tables.reserve[0, min(game.player1_energy, MAX_HASHED_ENERGY)])
+    common ^= int(tables.reserve[1, min(game.player2_energy, MAX_HASHED_ENERGY)])
+    if game.current_player == 2:
+        common ^= tables.side
+    return [int(key) ^ common for key in keys]
+
+
+def canonical_hash(game, group=None):
+    """Return (key, symmetry): the smallest key over the position's images and the symmetry giving it
+
+    Symmetric positions share the key, so tables indexed by it store each
+    equivalence class once. Moves stored under the key should be mapped
+    with symmetry.packed_move and mapped back with symmetry.inverse.
+    """
+    return hash_with_symmetry(game, group)[1:]
+
+
+def hash_with_symmetry(game, group=None):
+    """Return (position_hash(game), canonical key, symmetry) from one pass over the images"""
+    group = group or game_symmetries(game)
+    keys = symmetric_hashes(game, group)
+    best = min(range(len(keys)), key=keys.__getitem__)
+    return keys[0], keys[best], group[best]
+
+
+def canonical_board(board, group):
+    """Return (board, symmetry) with the lexicographically smallest image of a board array
+
+    For positions without a Zobrist key, such as those of the simple
+    variant or tablebase generation, where the board is the whole state.
+    """
+    best = None
+    for symmetry in group:
+        image = symmetry.board(board)
+        data = image.tobytes()
+        if best is None or data < best[0]:
+            best = (data, image, symmetry)
+    return best[1], best[2]
@@ -0,0 +1,102 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+# ORBITAL_TRACE=<file.json> makes GameWindow record a latency trace and write
+# it on close; open the file in chrome://tracing or https://ui.perfetto.dev
+TRACE_ENV = "ORBITAL_TRACE"
+
+# Events and latencies kept; a long session keeps only the most recent ones
+MAX_EVENTS = 100000
+MAX_LATENCIES = 10000
+
+_no_trace = nullcontext()
+
+
+def trace_span(tracer, name, **args):
+    """tracer.span(name) when tracing is on, otherwise a shared no-op context"""
+    if tracer is None:
+        return _no_trace
+    return tracer.span(name, **args)
+
+
+class LatencyTracer:
+    """Records GUI interaction stages as Chrome trace events
+
+    Each stage (mouse press, signal handler, rules call, display update,
+    paint) becomes a complete ("X") event on the thread that ran it, so
+    nesting shows up directly in the viewer. An interaction starts at the
+    input event and ends with the next finished paint; its total latency
+    is recorded as an event of its own and summarised in the trace metadata.
+    Memory stays bounded: only the newest max_events events and
+    MAX_LATENCIES latencies are kept.
+    """
+
+    def __init__(self, path=None, max_events=MAX_EVENTS):
+        self.path = path
+        self.events = deque(maxlen=max_events)
+        self.pid = os.getpid()
+        self.origin_ns = time.perf_counter_ns()
+        self.pending = None  # (name, start_us, args) of the interaction awaiting a paint
+        self.latencies_ms = deque(maxlen=MAX_LATENCIES)
+
+    def now_us(self):
+        return (time.perf_counter_ns() - self.origin_ns) / 1000
+
+    @contextmanager
+    def span(self, name, **args):
+        start = self.now_us()
+        try:
+            yield
+        finally:
+            self.events.append({"name": name, "cat": "gui", "ph": "X", "ts": start,
+                                "dur": self.now_us() - start, "pid": self.pid,
+                                "tid": threading.get_ident(), "args": args})
+
+    def begin_interaction(self, name, **args):
+        """Start timing an input; the first one wins until a frame is presented"""
+        if self.pending is None:
+            self.pending = (name, self.now_us(), args)
+
+    def frame_presented(self):
+        """Close the pending interaction after a completed paint"""
+        if self.pending is None:
+            return
+        name, start, args = self.pending
+        self.pending = None
+        end = self.now_us()
+        latency_ms = (end - start) / 1000
+        self.latencies_ms.append(latency_ms)
+        self.events.append({"name": f"{name} to frame", "cat": "latency", "ph": "X", "ts": start,
+                            "dur": end - start, "pid": self.pid, "tid": threading.get_ident(),
+                            "args": dict(args, latency_ms=latency_ms)})
+
+    def summary(self):
+        """Interaction latency statistics in milliseconds"""
+        latencies = sorted(self.latencies_ms)
+        if not latencies:
+            return {"interactions": 0}
+        return {
+            "interactions": len(latencies),
+            "p50_ms": latencies[len(latencies) // 2],
+            "p95_ms": latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))],
+            "max_ms": latencies[-1],
+        }
+
+    def write(self, path=None):
+        """Write the trace in Chrome's JSON trace format"""
+        path = path or self.path
+        thread_names = [{"name": "thread_name", "ph": "M", "pid": self.pid, "tid": threading.get_ident(),
+                         "args": {"name": "GUI"}}]
+        with open(path, "w") as output:
+            json.dump({"traceEvents": thread_names + list(self.events), "displayTimeUnit": "ms",
+                       "otherData": self.summary()}, output)
+
+
+def tracer_from_environment():
+    """Return a LatencyTracer when ORBITAL_TRACE names an output file, otherwise None"""
+    path = os.environ.get(TRACE_ENV)
+    return LatencyTracer(path) if path else None
@@ -0,0 +1,231 @@
+import argparse
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from orbital_eval import DEFAULT_WEIGHTS
+from orbital_geometry import get_geometry
+
+# Weights the tuner adjusts: name -> (lowest, highest, perturbation step).
+# Mobility and capture threats are only scored by evaluate_batch, not by the
+# evaluate_position leaves the search uses, so tuning them would be noise.
+TUNED_WEIGHTS = {
+    "material": (20, 400, 20),
+    "placement": (0, 60, 4),
+    "piece_energy": (0, 20, 2),
+    "reserve_energy": (0, 60, 4),
+    "inner_pieces": (0, 240, 15),
+}
+
+# Format 2 stores every option that changes what an iteration does, so a
+# checkpoint only resumes under the options it was recorded with
+CHECKPOINT_FORMAT = 2
+
+
+def play_match(plus, minus, pairs, seed, shape=(4, 8), depth=2, random_plies=4, max_moves=150,
+               settings=None):
+    """Play game pairs between two weight sets and return plus's wins minus losses
+
+    Each pair replays the same random opening with the colours swapped, so
+    the opening luck cancels out. Runs in the worker processes of SPSATuner.
+    """
+    from Orbital_Capture_Advanced_version import EnhancedOrbitalCaptureGame
+    from orbital_search import SearchEngine
+
+    geometry = get_geometry(*shape)
+    engines = {"plus": SearchEngine(tt_size_bits=16, weights=plus),
+               "minus": SearchEngine(tt_size_bits=16, weights=minus)}
+    result = 0
+    for pair in range(pairs):
+        for plus_player in (1, 2):
+            rng = random.Random(seed * 1000 + pair)
+            game = EnhancedOrbitalCaptureGame(geometry)
+            for name, value in (settings or {}).items():
+                setattr(game, name, value)
+            for engine in engines.values():
+                engine.tt.clear()
+            winner = None
+            for ply in range(max_moves):
+                moves = game.get_all_valid_moves()
+                if not moves:
+                    winner = 2 if game.current_player == 1 else 1
+                    break
+                if ply < random_plies:
+                    move = rng.choice(moves)
+                else:
+                    engine = engines["plus" if game.current_player == plus_player else "minus"]
+                    move = engine.search(game, depth).best_move
+                victory = game.move(*move)["victory"]
+                if victory:
+                    winner = victory["winner"]
+                    break
+            if winner is not None:
+                result += 1 if winner == plus_player else -1
+    return result
+
+
+class SPSATuner:
+    """Simultaneous perturbation tuning of the evaluation weights by self-play
+
+    Every iteration perturbs all tuned weights at once by +-c_k steps, plays
+    the two perturbed weight sets against each other in a process pool and
+    moves the weights toward the side that scored better. The state after
+    each iteration is written to the checkpoint file, and a tuner created
+    with an existing checkpoint continues from it.
+
+    Perturbation directions come from the seed and the iteration number, so
+    a resumed run makes the same choices as an uninterrupted one. A
+    checkpoint recorded with other options (see run_options) is refused
+    rather than continued with a mix of both.
+    """
+
+    def __init__(self, checkpoint=None, weights=None, tuned=None, pairs=16, pairs_per_task=2,
+                 learning_rate=2.0, stability=10, shape=(4, 8), depth=2, random_plies=4,
+                 max_moves=150, settings=None, seed=0, workers=None):
+        self.checkpoint = checkpoint
+        self.tuned = tuned or TUNED_WEIGHTS
+        self.pairs = pairs
+        self.pairs_per_task = pairs_per_task
+        self.learning_rate = learning_rate
+        self.stability = stability  # SPSA's A: damps the step size of the first iterations
+        self.match_options = {"shape": tuple(shape), "depth": depth, "random_plies": random_plies,
+                              "max_moves": max_moves, "settings": settings}
+        self.seed = seed
+        self.workers = workers
+        self.iteration = 0
+        self.theta = {name: float(value) for name, value in (weights or DEFAULT_WEIGHTS).items()}
+        self.history = []
+        if checkpoint and os.path.exists(checkpoint):
+            self.load(checkpoint)
+
+    def weights(self, theta=None):
+        """Integer evaluation weights for a parameter vector (the current one by default)"""
+        theta = theta or self.theta
+        return {name: int(round(value)) for name, value in theta.items()}
+
+    def run_options(self):
+        """Options that change what an iteration does, in their JSON form
+
+        Everything but the workers: match settings, games per iteration,
+        step sizes, the seed and the tuned weights' ranges.
+        """
+        options = dict(self.match_options, pairs=self.pairs, pairs_per_task=self.pairs_per_task,
+                       learning_rate=self.learning_rate, stability=self.stability, seed=self.seed,
+                       tuned=self.tuned)
+        return json.loads(json.dumps(options))
+
+    def perturbation(self, iteration):
+        """Random +1/-1 direction for every tuned weight"""
+        rng = random.Random(self.seed * 1000003 + iteration)
+        return {name: rng.choice((-1, 1)) for name in self.tuned}
+
+    def step(self, executor):
+        """Run one SPSA iteration and return its history entry"""
+        k = self.iteration
+        c_scale = 1 / (k + 1) ** 0.101
+        a_k = self.learning_rate / (k + 1 + self.stability) ** 0.602
+        delta = self.perturbation(k)
+
+        plus = dict(self.theta)
+        minus = dict(self.theta)
+        for name, (low, high, step) in self.tuned.items():
+            plus[name] = min(high, max(low, plus[name] + c_scale * step * delta[name]))
+            minus[name] = min(high, max(low, minus[name] - c_scale * step * delta[name]))
+
+        futures = []
+        for start in range(0, self.pairs, self.pairs_per_task):
+            count = min(self.pairs_per_task, self.pairs - start)
+            futures.append(executor.submit(play_match, self.weights(plus), self.weights(minus), count,
+                                           self.seed + k * self.pairs + start, **self.match_options))
+        result = sum(future.result() for future in futures)
+        score = result / (2 * self.pairs)  # Net wins per game for plus, in [-1, 1]
+
+        for name, (low, high, step) in self.tuned.items():
+            value = self.theta[name] + a_k * c_scale * step * score * delta[name]
+            self.theta[name] = min(high, max(low, value))
+        self.iteration += 1
+        entry = {"iteration": k, "score": score, "weights": self.weights()}
+        self.history.append(entry)
+        if self.checkpoint:
+            self.save(self.checkpoint)
+        return entry
+
+    def run(self, iterations, callback=None):
+        """Tune until the given total iteration count; returns the final weights"""
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            while self.iteration < iterations:
+                entry = self.step(executor)
+                if callback is not None:
+                    callback(entry)
+        return self.weights()
+
+    def save(self, path):
+        """Write the tuner state as JSON (replaced atomically)"""
+        state = {"format": CHECKPOINT_FORMAT, "iteration": self.iteration, "theta": self.theta,
+                 "options": self.run_options(), "history": self.history}
+        temporary = path + ".tmp"
+        with open(temporary, "w") as output:
+            json.dump(state, output, indent=2)
+        os.replace(temporary, path)
+
+    def load(self, path):
+        with open(path) as checkpoint_file:
+            state = json.load(checkpoint_file)
+        if state.get("format") != CHECKPOINT_FORMAT:
+            raise ValueError(f"{path} is not a tuning checkpoint this version can read")
+        options = self.run_options()
+        changed = [f"{name} {state['options'].get(name)} (now {value})"
+                   for name, value in options.items() if state["options"].get(name) != value]
+        if changed:
+            raise ValueError(f"{path} was recorded with other options: {'; '.join(changed)}. "
+                             "Resume with the same options or start a new checkpoint")
+        self.iteration = state["iteration"]
+        self.theta.update(state["theta"])
+        self.history = state["history"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tune evaluation weights with SPSA self-play")
+    parser.add_argument("--iterations", type=int, default=100, help="Total iterations, including resumed ones")
+    parser.add_argument("--pairs", type=int, default=16, help="Game pairs per iteration")
+    parser.add_argument("--pairs-per-task", type=int, default=2)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--random-plies", type=int, default=4)
+    parser.add_argument("--max-moves", type=int, default=150)
+    parser.add_argument("--learning-rate", type=float, default=2.0)
+    parser.add_argument("--board", type=int, nargs=2, default=[4, 8], metavar=("RINGS", "SPOKES"))
+    parser.add_argument("--no-jumps", action="store_true")
+    parser.add_argument("--no-nimber", action="store_true")
+    parser.add_argument("--no-energy-collection", action="store_true")
+    parser.add_argument("--checkpoint", default="tuning.json", help="Resumed from when it exists")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    settings = {"allow_jumps": not args.no_jumps, "allow_nimber": not args.no_nimber,
+                "energy_collection": not args.no_energy_collection}
+    try:
+        tuner = SPSATuner(args.checkpoint, pairs=args.pairs, pairs_per_task=args.pairs_per_task,
+                          learning_rate=args.learning_rate, shape=args.board, depth=args.depth,
+                          random_plies=args.random_plies, max_moves=args.max_moves, settings=settings,
+                          seed=args.seed, workers=args.workers)
+    except ValueError as error:
+        parser.error(str(error))
+    if tuner.iteration:
+        print(f"Resuming {args.checkpoint} at iteration {tuner.iteration}")
+
+    start = time.perf_counter()
+
+    def report(entry):
+        weights = " ".join(f"{name}={entry['weights'][name]}" for name in tuner.tuned)
+        print(f"{entry['iteration'] + 1:4}  score {entry['score']:+.3f}  {weights}  "
+              f"({time.perf_counter() - start:.0f}s)", flush=True)
+
+    weights = tuner.run(args.iterations, report)
+    print(json.dumps(weights, indent=2))
+
+
+if __name__ == "__main__":
+    main()